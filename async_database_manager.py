@@ -0,0 +1,65 @@
+# async_database_manager.py
+"""
+Awaitable data-access layer for the FastAPI service
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncDatabaseManager:
+    """Runs DatabaseManager methods on a dedicated thread pool.
+
+    Every public DatabaseManager method is available as a coroutine with the
+    same name and arguments, so API handlers can ``await adb.get_all_classes()``
+    without blocking the event loop. The worker count matches the connection
+    pool size, so queued calls wait here rather than inside the pool.
+    """
+
+    def __init__(self, db_manager, max_workers=None):
+        self.db = db_manager
+        workers = max_workers or db_manager.connection_pool.maxconn
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db')
+        self.lock = threading.Lock()
+        self.waiting = 0  # submitted calls not yet picked up by a worker
+
+    async def run(self, func, *args, **kwargs):
+        """Run any blocking callable on the database executor"""
+        def job():
+            self._picked_up()
+            return func(*args, **kwargs)
+
+        with self.lock:
+            self.waiting += 1
+        try:
+            future = self.executor.submit(job)
+        except RuntimeError:  # executor shut down
+            self._picked_up()
+            raise
+        future.add_done_callback(lambda done: done.cancelled() and self._picked_up())  # never ran
+        return await asyncio.wrap_future(future)
+
+    def _picked_up(self):
+        with self.lock:
+            self.waiting -= 1
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return call
+
+    def queue_depth(self):
+        """Calls waiting for a free database worker"""
+        with self.lock:
+            return self.waiting
+
+    def close(self):
+        self.executor.shutdown(wait=False)
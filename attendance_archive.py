@@ -0,0 +1,252 @@
+# attendance_archive.py
+"""
+Cold-storage tier for closed months of AttendanceLog
+
+Each archived month is one compressed columnar file under
+<root>/year=YYYY/month=MM/. Parquet (zstd) is used when pyarrow is
+installed, otherwise a compressed NumPy archive with one array per column.
+The daily rollups are left in place as the summary of archived months and
+an AttendanceArchive row records where each month went.
+"""
+
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+ARCHIVE_COLUMNS = ('log_id', 'prn_no', 'subject_id', 'timestamp', 'status',
+                   'camera_id', 'direction', 'confidence')
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class AttendanceArchive:
+    def __init__(self, root, file_format='auto'):
+        self.root = Path(root)
+        if file_format == 'auto':
+            file_format = 'parquet' if _has_pyarrow() else 'npz'
+        if file_format not in ('parquet', 'npz'):
+            raise ValueError(f"Unknown archive format: {file_format}")
+        self.file_format = file_format
+
+    def month_path(self, month):
+        return self.root / f"year={month.year:04d}" / f"month={month.month:02d}" / f"attendance.{self.file_format}"
+
+    # -- writing -----------------------------------------------------------------
+
+    @staticmethod
+    def rows_to_columns(rows):
+        """Convert fetched rows (in ARCHIVE_COLUMNS order) to column arrays"""
+        if not rows:
+            return {
+                'log_id': np.zeros(0, dtype=np.int64),
+                'prn_no': np.zeros(0, dtype=str),
+                'subject_id': np.zeros(0, dtype=np.int32),
+                'timestamp': np.zeros(0, dtype='datetime64[us]'),
+                'status': np.zeros(0, dtype=str),
+                'camera_id': np.zeros(0, dtype=str),
+                'direction': np.zeros(0, dtype=str),
+                'confidence': np.zeros(0, dtype=np.float32),
+            }
+        log_ids, prns, subjects, timestamps, statuses, cameras, directions, confidences = zip(*rows)
+        return {
+            'log_id': np.array(log_ids, dtype=np.int64),
+            'prn_no': np.array([p or '' for p in prns], dtype=str),
+            'subject_id': np.array([s if s is not None else -1 for s in subjects], dtype=np.int32),
+            'timestamp': np.array(timestamps, dtype='datetime64[us]'),
+            'status': np.array([s or '' for s in statuses], dtype=str),
+            'camera_id': np.array([c or '' for c in cameras], dtype=str),
+            'direction': np.array([d or '' for d in directions], dtype=str),
+            'confidence': np.array([c if c is not None else np.nan for c in confidences], dtype=np.float32),
+        }
+
+    @staticmethod
+    def concat_columns(chunks):
+        """Join column dicts (e.g. one per fetched chunk) into one"""
+        chunks = list(chunks)
+        if len(chunks) == 1:
+            return chunks[0]
+        return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in ARCHIVE_COLUMNS}
+
+    @staticmethod
+    def merge_columns(existing, late):
+        """Add late rows to an archived month, keeping (timestamp, log_id) order.
+
+        Rows already in the archive (same log_id) are not added twice, so a
+        merge that is retried after a failed transaction is harmless.
+        """
+        late_rows = ~np.isin(late['log_id'], existing['log_id'])
+        columns = {name: np.concatenate([existing[name], late[name][late_rows]]) for name in ARCHIVE_COLUMNS}
+        order = np.lexsort((columns['log_id'], columns['timestamp'].astype('datetime64[us]')))
+        return {name: values[order] for name, values in columns.items()}
+
+    def write_month(self, month, columns):
+        """Write one month atomically; returns (path, size in bytes)"""
+        path = self.month_path(month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+
+        if self.file_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_arrays([pa.array(columns[name]) for name in ARCHIVE_COLUMNS],
+                                         names=list(ARCHIVE_COLUMNS))
+            pq.write_table(table, tmp_path, compression='zstd')
+        else:
+            with open(tmp_path, 'wb') as fh:
+                np.savez_compressed(fh, **{name: columns[name] for name in ARCHIVE_COLUMNS})
+
+        os.replace(tmp_path, path)
+        return path, path.stat().st_size
+
+    # -- reading -----------------------------------------------------------------
+
+    def read_file(self, path):
+        """Load an archived month as a dict of column arrays"""
+        path = Path(path)
+        if path.suffix == '.parquet':
+            import pyarrow.parquet as pq
+            table = pq.read_table(path)
+            columns = {name: table.column(name).to_numpy() for name in ARCHIVE_COLUMNS
+                       if name in table.column_names}
+        else:
+            with np.load(path) as data:
+                columns = {name: data[name] for name in ARCHIVE_COLUMNS if name in data.files}
+
+        # Months archived before camera metadata was stored
+        count = len(columns['log_id'])
+        columns.setdefault('camera_id', np.full(count, '', dtype=str))
+        columns.setdefault('direction', np.full(count, '', dtype=str))
+        columns.setdefault('confidence', np.full(count, np.nan, dtype=np.float32))
+        return columns
+
+    def iter_rows(self, path, start_date=None, end_date=None, subject_id=None, prns=None,
+                  newest_first=True):
+        """Yield rows from one archived month as dicts, filtering with vectorized masks"""
+        columns = self.read_file(path)
+        timestamps = columns['timestamp'].astype('datetime64[us]')
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start_date is not None:
+            mask &= timestamps >= np.datetime64(start_date, 'us')
+        if end_date is not None:
+            mask &= timestamps < np.datetime64(end_date, 'D') + np.timedelta64(1, 'D')
+        if subject_id is not None:
+            mask &= columns['subject_id'] == subject_id
+        if prns is not None:
+            mask &= np.isin(columns['prn_no'], list(prns))
+
+        index = np.flatnonzero(mask)
+        order = np.lexsort((columns['log_id'][index], timestamps[index]))
+        if newest_first:
+            order = order[::-1]
+        for i in index[order]:
+            subject = int(columns['subject_id'][i])
+            confidence = float(columns['confidence'][i])
+            yield {
+                "log_id": int(columns['log_id'][i]),
+                "prn": str(columns['prn_no'][i]) or None,
+                "subject_id": subject if subject >= 0 else None,
+                "timestamp": str(timestamps[i].astype(datetime)),
+                "status": str(columns['status'][i]) or None,
+                "camera_id": str(columns['camera_id'][i]) or None,
+                "direction": str(columns['direction'][i]) or None,
+                "confidence": None if np.isnan(confidence) else confidence,
+            }
+
+
+def archive_month(db, archive, month, measure=False, chunk_rows=50000):
+    """Move one closed month of AttendanceLog into the archive.
+
+    Exports the rows in chunks of chunk_rows, writes and re-reads the file,
+    records it in AttendanceArchive and drops (or deletes) the month from the
+    live table in one transaction. Rows that arrived late for a month that is
+    already archived are merged into its file. Returns a stats dict.
+    """
+    month_end = next_month(month)
+    partition = f"attendancelog_{month:%Y_%m}"
+    stats = {'month': str(month), 'partition': partition}
+
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT file_path FROM AttendanceArchive WHERE month = %s", (month,))
+            row = cur.fetchone()
+            archived_path = row[0] if row else None
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (partition,))
+            is_partition = cur.fetchone()[0]
+            if is_partition:
+                cur.execute("SELECT pg_total_relation_size(to_regclass(%s))", (partition,))
+                stats['live_bytes'] = cur.fetchone()[0]
+
+        started = time.perf_counter()
+        chunks = []
+        with conn.cursor(name='archive_export') as cur:
+            cur.itersize = chunk_rows
+            cur.execute("""
+                SELECT log_id, prn_no, subject_id, timestamp, status, camera_id, direction, confidence
+                FROM AttendanceLog
+                WHERE timestamp >= %s AND timestamp < %s
+                ORDER BY timestamp, log_id
+            """, (month, month_end))
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                chunks.append(archive.rows_to_columns(rows))
+        columns = archive.concat_columns(chunks or [archive.rows_to_columns([])])
+        del chunks
+        stats['live_scan_ms'] = (time.perf_counter() - started) * 1000.0
+        stats['rows'] = len(columns['log_id'])
+
+        if archived_path is not None:
+            columns = archive.merge_columns(archive.read_file(archived_path), columns)
+            stats['merged'] = True
+        expected_rows = len(columns['log_id'])
+
+        path, size = archive.write_month(month, columns)
+        del columns
+        stats['archive_path'] = str(path)
+        stats['archive_bytes'] = size
+        if archived_path is not None and Path(archived_path) != path and Path(archived_path).exists():
+            os.remove(archived_path)  # re-archived in the currently configured format
+
+        started = time.perf_counter()
+        restored = archive.read_file(path)
+        stats['archive_scan_ms'] = (time.perf_counter() - started) * 1000.0
+        if len(restored['log_id']) != expected_rows:
+            raise RuntimeError(f"Archive verification failed for {month:%Y-%m}: "
+                               f"{len(restored['log_id'])} of {expected_rows} rows read back")
+        del restored
+        if measure:
+            started = time.perf_counter()
+            sum(1 for _ in archive.iter_rows(path))
+            stats['archive_rows_ms'] = (time.perf_counter() - started) * 1000.0
+
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO AttendanceArchive (month, file_path, file_format, row_count, file_bytes)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (month) DO UPDATE
+                SET file_path = EXCLUDED.file_path, file_format = EXCLUDED.file_format,
+                    row_count = EXCLUDED.row_count, file_bytes = EXCLUDED.file_bytes,
+                    archived_at = CURRENT_TIMESTAMP
+            """, (month, str(path), archive.file_format, expected_rows, size))
+            if is_partition:
+                cur.execute(f'ALTER TABLE AttendanceLog DETACH PARTITION "{partition}"')
+                cur.execute(f'DROP TABLE "{partition}"')
+            else:
+                cur.execute("DELETE FROM AttendanceLog WHERE timestamp >= %s AND timestamp < %s",
+                            (month, month_end))
+
+    return stats
@@ -1,14 +1,59 @@
 """Prototype configuration for the attendance system."""
 
+import json
 import os
 
 
+VECTOR_SEARCH_CONFIG = {
+    'enabled': os.getenv('ATTENDANCE_PGVECTOR', '1') == '1',
+    'dimension': 512,
+    'index_type': 'hnsw',  # 'hnsw' or 'ivfflat'
+    'hnsw_m': 16,
+    'hnsw_ef_construction': 64,
+    'hnsw_ef_search': 40,
+    'ivfflat_lists': 100,
+    'ivfflat_probes': 10,
+}
+
+ARCHIVE_CONFIG = {
+    'root': os.getenv('ATTENDANCE_ARCHIVE_DIR', 'archive'),
+    'format': 'auto',  # 'parquet' (needs pyarrow), 'npz', or 'auto'
+}
+
 DB_CONFIG = {
     'host': os.getenv('ATTENDANCE_DB_HOST', 'localhost'),
     'database': os.getenv('ATTENDANCE_DB_NAME', 'attendance2'),
     'user': os.getenv('ATTENDANCE_DB_USER', 'postgres'),
     'password': os.getenv('ATTENDANCE_DB_PASSWORD', 'Pass@123'),
     'port': int(os.getenv('ATTENDANCE_DB_PORT', '5432')),
+    'pool_min': 1,
+    'pool_max': int(os.getenv('ATTENDANCE_DB_POOL_MAX', '10')),
+    'pool_timeout': 10.0,  # seconds to wait for a free connection
+    'slow_query_ms': float(os.getenv('ATTENDANCE_SLOW_QUERY_MS', '100')),
+    'slow_query_thresholds': {  # per-statement overrides (ms)
+        'log_attendance': 20,
+        'get_student_names': 20,
+        'dashboard_counts': 200,
+    },
+    'slow_query_log': os.getenv('ATTENDANCE_SLOW_QUERY_LOG'),  # file path, or None for stderr
+    'partition_months_ahead': 3,  # monthly AttendanceLog partitions created in advance
+    'vector_search': VECTOR_SEARCH_CONFIG,
+    'archive': ARCHIVE_CONFIG,
+}
+
+# ONNX Runtime sessions and thread limits (see inference_runtime.py). With several engines
+# on one host (cameras in separate processes, bulk_enroll workers) set
+# ATTENDANCE_ENGINES_PER_HOST so each gets an equal share of the cores.
+INFERENCE_RUNTIME_CONFIG = {
+    'providers': [p for p in os.getenv('ATTENDANCE_ORT_PROVIDERS', '').split(',') if p] or None,
+    'ctx_id': int(os.getenv('ATTENDANCE_CTX_ID', '0')),  # -1 forces CPU in insightface
+    'intra_op_threads': int(os.getenv('ATTENDANCE_ORT_INTRA_THREADS', '0')),  # 0 = auto
+    'inter_op_threads': int(os.getenv('ATTENDANCE_ORT_INTER_THREADS', '0')),
+    'execution_mode': 'sequential',  # or 'parallel'
+    'graph_optimization': os.getenv('ATTENDANCE_ORT_GRAPH_OPT', 'all'),  # disable, basic, extended, all
+    'engines_per_host': int(os.getenv('ATTENDANCE_ENGINES_PER_HOST', '1')),
+    'torch_threads': None,  # None = auto (core share when engines_per_host > 1)
+    'opencv_threads': None,  # None = OpenCV default
 }
 
 FACE_RECOGNITION_CONFIG = {
@@ -20,10 +65,96 @@ FACE_RECOGNITION_CONFIG = {
     'det_size': (640, 640),
     'recognition_tolerance': 0.8,
     'detection_scale': 1.0,
+    'matcher': os.getenv('ATTENDANCE_MATCHER', 'memory'),  # 'memory' or 'pgvector'
+    'max_templates': 5,  # embeddings kept per student, pruned for diversity
+    'template_aggregate': 'max',  # 'max' or 'topk_mean' over a student's templates
+    'template_top_k': 2,
+    'class_shards': True,  # search only the classes timetabled for the session first
+    'shard_fallback': True,  # then the whole gallery, for visitors from other classes
+    'runtime': INFERENCE_RUNTIME_CONFIG,
+}
+
+# POST /recognize: concurrent requests are merged into one detection/embedding batch
+RECOGNITION_API_CONFIG = {
+    'max_batch_size': int(os.getenv('ATTENDANCE_RECOGNIZE_BATCH', '16')),
+    'max_wait_ms': float(os.getenv('ATTENDANCE_RECOGNIZE_WAIT_MS', '10')),
+    'max_queue': 256,
+    'max_image_bytes': 8 * 1024 * 1024,
+    'max_images_per_request': 16,
+}
+
+# Live detection events (GET /ws/detections). Headless camera workers are started by
+# the API for each entry in `cameras`, e.g. ATTENDANCE_LIVE_CAMERAS=
+# '[{"camera_id": "gate-1", "source": 0, "room": "A101"}]' (subject_id pins a subject,
+# otherwise the timetable slot running in `room` is used).
+LIVE_EVENTS_CONFIG = {
+    'subscriber_queue': 8,  # events buffered per viewer before the oldest is dropped
+    'process_every_n_frames': 3,
+    'cameras': json.loads(os.getenv('ATTENDANCE_LIVE_CAMERAS', '[]')),
+}
+
+# Who is inside now, from IN/OUT camera events. Camera rooms come from LIVE_EVENTS_CONFIG.
+OCCUPANCY_CONFIG = {
+    'debounce_s': 30,  # ignore a flip back within this many seconds of the last transition
+    'reset_hour': 4,  # everyone counts as outside from this local hour each day
+    'default_room': 'building',  # room for cameras without one
+}
+
+# Per-session present/absent/late bitmaps served by the API (/rosters/...)
+ROSTER_CONFIG = {
+    'late_after_minutes': 10,  # marked later than this after the timetabled start counts as late
+    'history_days': 60,  # sessions loaded from the log at startup and kept in memory
+}
+
+# HTTP camera preview: each frame is JPEG-encoded at most once per tier
+PREVIEW_CONFIG = {
+    'tiers': {
+        'full': {'width': None, 'quality': 80},
+        'thumb': {'width': 320, 'quality': 60},  # dashboards and grids
+    },
+    'default_fps': 5.0,
+    'max_fps': 15.0,
+}
+
+# Bulk event ingestion from edge devices (POST /attendance/bulk)
+INGEST_CONFIG = {
+    'max_body_bytes': 32 * 1024 * 1024,
+    'max_events': 100000,
+    'dedupe_window_s': 60,  # same student/subject/direction within the window counts once
+    'max_future_skew_s': 300,
+    'max_age_days': 30,  # older backlogs go through the migration scripts instead
 }
 
 ATTENDANCE_COOLDOWN = 300
 
+# Per-stage latency histograms (capture, enhance, detect, embed, match, db, render). Set
+# ATTENDANCE_TRACE=trace.json to also record a Chrome trace, written when the kiosk closes.
+PERF_TRACE_CONFIG = {
+    'enabled': os.getenv('ATTENDANCE_STAGE_TIMERS', '1') != '0',
+    'trace_path': os.getenv('ATTENDANCE_TRACE') or None,
+    'trace_max_events': 200000,
+}
+
+# GET /health/ready: readiness fails when any of these is breached
+HEALTH_CONFIG = {
+    'db_latency_ms': 250.0,  # SELECT 1 round trip, including the pool checkout
+    'min_available_connections': 1,  # or no thread waiting for one
+    'inference_ms': 2000.0,  # timed detection + embedding pass on the probe image
+    'probe_image': os.getenv('ATTENDANCE_HEALTH_PROBE_IMAGE', 'assets/health_probe.jpg'),
+    'probe_interval_s': 30.0,  # the probe result is reused this long between checks
+    'min_gallery': 1,  # known faces required (in-memory matcher only)
+    'frame_max_age_s': 10.0,  # every running camera worker must have produced a frame this recently
+}
+
+# Attendance cooldowns shared by the kiosk, camera workers and the API. The snapshot keeps
+# them across restarts; set ATTENDANCE_REDIS_URL to share them live between processes.
+DEDUP_CONFIG = {
+    'max_entries': 100000,
+    'snapshot_path': os.getenv('ATTENDANCE_COOLDOWN_SNAPSHOT', 'cooldowns.json') or None,
+    'snapshot_interval_s': 30.0,
+    'redis_url': os.getenv('ATTENDANCE_REDIS_URL') or None,
+}
+
 CAMERA_CONFIG = {
     'default_camera': 0,
     'frame_width': 1280,
@@ -0,0 +1,297 @@
+# attendance_ingest.py
+"""
+Bulk ingestion of attendance events from edge devices
+
+A batch arrives as NDJSON (one event object per line) or as the compact
+binary encoding below, optionally gzip/deflate compressed. Events are
+decoded into column arrays, validated and deduplicated with vectorized
+NumPy operations and written with a single COPY in one transaction.
+
+NDJSON event:
+    {"prn": "P001", "subject_id": 3, "timestamp": "2025-01-10T09:01:02" or epoch seconds,
+     "camera_id": "gate-1", "direction": "IN", "confidence": 91.5}
+timestamp defaults to the time the batch is received.
+
+Binary batch (little-endian): b"ATB1", uint32 event count, then packed records
+of BINARY_EVENT_DTYPE. Unused strings are zero-padded; direction is
+0 = unknown, 1 = IN, 2 = OUT; confidence is NaN when unknown.
+"""
+
+import gzip
+import io
+import json
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+BINARY_MAGIC = b"ATB1"
+BINARY_EVENT_DTYPE = np.dtype([
+    ('timestamp_us', '<i8'),  # microseconds since the Unix epoch (UTC); 0 = time received
+    ('prn', 'S20'),
+    ('subject_id', '<i4'),
+    ('camera_id', 'S24'),
+    ('direction', 'u1'),
+    ('confidence', '<f4'),
+])
+DIRECTIONS = np.array(['', 'IN', 'OUT'])
+EPOCH = datetime(1970, 1, 1)
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json')
+BINARY_TYPES = ('application/x-attendance-batch', 'application/octet-stream')
+
+
+COPY_NULL = '\\N'
+
+
+def _copy_text(values):
+    """Escape backslashes, tabs and newlines for COPY text format"""
+    for raw, escaped in (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r')):
+        values = np.char.replace(values, raw, escaped)
+    return values
+
+
+def decompress(body, content_encoding=None):
+    encoding = (content_encoding or '').lower()
+    try:
+        if encoding in ('gzip', 'x-gzip') or body[:2] == b'\x1f\x8b':
+            return gzip.decompress(body)
+        if encoding == 'deflate':
+            return zlib.decompress(body)
+    except (OSError, EOFError, zlib.error) as e:
+        raise ValueError(f"Corrupt {encoding or 'gzip'} body: {e}") from e
+    if encoding not in ('', 'identity'):
+        raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+    return body
+
+
+def encode_binary_batch(events):
+    """Pack event dicts into the binary batch format (for edge clients and benchmarks)"""
+    records = np.zeros(len(events), dtype=BINARY_EVENT_DTYPE)
+    for i, event in enumerate(events):
+        timestamp = event.get('timestamp')
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp).timestamp()
+        records[i] = (
+            int(round(timestamp * 1_000_000)) if timestamp else 0,
+            str(event['prn']).encode('utf-8'),
+            int(event['subject_id']),
+            str(event.get('camera_id') or '').encode('utf-8'),
+            {'IN': 1, 'OUT': 2}.get(event.get('direction'), 0),
+            np.nan if event.get('confidence') is None else float(event['confidence']),
+        )
+    return BINARY_MAGIC + np.uint32(len(records)).tobytes() + records.tobytes()
+
+
+class EventBatch:
+    """Columns of one batch: prn, subject_id, timestamp (datetime64[us]), camera_id, direction, confidence"""
+
+    def __init__(self, prn, subject_id, timestamp, camera_id, direction, confidence):
+        self.prn = prn
+        self.subject_id = subject_id
+        self.timestamp = timestamp
+        self.camera_id = camera_id
+        self.direction = direction
+        self.confidence = confidence
+
+    def __len__(self):
+        return len(self.prn)
+
+    def take(self, index):
+        return EventBatch(self.prn[index], self.subject_id[index], self.timestamp[index],
+                          self.camera_id[index], self.direction[index], self.confidence[index])
+
+
+def _received_at():
+    return np.datetime64(datetime.now(), 'us')
+
+
+def _local_times(epoch_us):
+    """Epoch microseconds (UTC) as naive local datetime64[us], exactly like datetime.fromtimestamp.
+
+    The UTC offset is looked up per 15-minute bucket (DST and zone changes
+    happen on those boundaries), so a batch costs a handful of lookups.
+    """
+    buckets, inverse = np.unique(epoch_us // (900 * 1_000_000), return_inverse=True)
+    offsets = np.empty(len(buckets), dtype=np.int64)
+    for i, bucket in enumerate(buckets.tolist()):
+        seconds = bucket * 900
+        try:
+            offsets[i] = round((datetime.fromtimestamp(seconds) - EPOCH).total_seconds()) - seconds
+        except (OverflowError, OSError, ValueError):  # far out of range; rejected as stale/future later
+            offsets[i] = int(datetime.now().astimezone().utcoffset().total_seconds())
+    return (epoch_us + offsets[inverse] * 1_000_000).astype('datetime64[us]')
+
+
+def decode_binary(body):
+    if body[:4] != BINARY_MAGIC or len(body) < 8:
+        raise ValueError("Not an ATB1 attendance batch")
+    count = int(np.frombuffer(body[4:8], dtype='<u4')[0])
+    payload = body[8:]
+    if len(payload) != count * BINARY_EVENT_DTYPE.itemsize:
+        raise ValueError(f"Batch header says {count} events but the payload has "
+                         f"{len(payload) / BINARY_EVENT_DTYPE.itemsize:.1f}")
+    records = np.frombuffer(payload, dtype=BINARY_EVENT_DTYPE)
+
+    # Epoch microseconds are UTC; AttendanceLog.timestamp is local time without a zone
+    timestamps = _local_times(records['timestamp_us'])
+    timestamps = np.where(records['timestamp_us'] == 0, _received_at(), timestamps)
+    codes = records['direction']
+    directions = np.where(codes < len(DIRECTIONS),
+                          DIRECTIONS[np.minimum(codes, len(DIRECTIONS) - 1)], 'BAD')
+    return EventBatch(
+        np.char.decode(records['prn'], 'utf-8', 'replace').astype('U20'),
+        records['subject_id'].astype(np.int64),
+        timestamps,
+        np.char.decode(records['camera_id'], 'utf-8', 'replace').astype('U24'),
+        directions,
+        records['confidence'].astype(np.float32),
+    )
+
+
+def _parse_timestamp(value, received):
+    if value is None or value == '':
+        return received
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def decode_ndjson(body):
+    received = datetime.now()
+    prns, subjects, timestamps, cameras, directions, confidences = [], [], [], [], [], []
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+            prns.append(str(event.get('prn') or ''))
+            subject = event.get('subject_id')
+            subjects.append(int(subject) if subject is not None else -1)
+            timestamps.append(_parse_timestamp(event.get('timestamp'), received))
+            cameras.append(str(event.get('camera_id') or ''))
+            directions.append(str(event.get('direction') or '').upper())
+            confidence = event.get('confidence')
+            confidences.append(np.nan if confidence is None else float(confidence))
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError(f"Line {line_number}: {e}") from e
+
+    return EventBatch(
+        np.array(prns, dtype=str),
+        np.array(subjects, dtype=np.int64),
+        np.array(timestamps, dtype='datetime64[us]'),
+        np.array(cameras, dtype=str),
+        np.array(directions, dtype=str),
+        np.array(confidences, dtype=np.float32),
+    )
+
+
+def decode_batch(body, content_type=None, content_encoding=None):
+    body = decompress(body, content_encoding)
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    if body[:4] == BINARY_MAGIC or media_type in BINARY_TYPES:
+        return decode_binary(body)
+    if media_type and media_type not in NDJSON_TYPES:
+        raise ValueError(f"Unsupported Content-Type: {content_type}")
+    return decode_ndjson(body)
+
+
+class AttendanceIngestor:
+    def __init__(self, db_manager, config=None, rosters=None):
+        self.db = db_manager
+        self.rosters = rosters  # RosterBitmaps to update with inserted events
+        config = config or {}
+        self.max_events = int(config.get('max_events', 100000))
+        self.dedupe_window_s = int(config.get('dedupe_window_s', 60))
+        self.max_future_skew_s = int(config.get('max_future_skew_s', 300))
+        self.max_age_days = int(config.get('max_age_days', 30))
+
+    def validate(self, batch, known_prns, known_subjects):
+        """Return a boolean keep-mask and rejected counts per reason"""
+        now = _received_at()
+        checks = {
+            'unknown_prn': ~np.isin(batch.prn, known_prns),
+            'unknown_subject': ~np.isin(batch.subject_id, known_subjects),
+            'bad_direction': ~np.isin(batch.direction, ('', 'IN', 'OUT')),
+            'bad_confidence': ~np.isnan(batch.confidence) &
+                              ((batch.confidence < 0) | (batch.confidence > 100)),
+            'future_timestamp': batch.timestamp > now + np.timedelta64(self.max_future_skew_s, 's'),
+            'stale_timestamp': batch.timestamp < now - np.timedelta64(self.max_age_days, 'D'),
+            'camera_id_too_long': np.char.str_len(batch.camera_id) > 50,
+        }
+        keep = np.ones(len(batch), dtype=bool)
+        rejected = {}
+        for reason, failed in checks.items():
+            failed = failed & keep  # count each event under its first failed check
+            if failed.any():
+                rejected[reason] = int(failed.sum())
+            keep &= ~failed
+        return keep, rejected
+
+    def dedupe(self, batch):
+        """Keep the earliest event per (prn, subject, direction, dedupe window)"""
+        order = np.argsort(batch.timestamp, kind='stable')
+        window = np.timedelta64(max(1, self.dedupe_window_s), 's')
+        bucket = (batch.timestamp[order] - np.datetime64(0, 'us')) // window
+        keys = np.rec.fromarrays([batch.prn[order], batch.subject_id[order],
+                                  batch.direction[order], bucket])
+        _, first = np.unique(keys, return_index=True)
+        return np.sort(order[first])
+
+    def _lookup(self, cur, batch):
+        unique_prns = np.unique(batch.prn).tolist()
+        cur.execute("SELECT prn_no FROM Students WHERE prn_no = ANY(%s)", (unique_prns,))
+        known_prns = np.array([row[0] for row in cur.fetchall()], dtype=str)
+        cur.execute("SELECT subject_id FROM Subjects")
+        known_subjects = np.array([row[0] for row in cur.fetchall()], dtype=np.int64)
+        return known_prns, known_subjects
+
+    @staticmethod
+    def _copy_buffer(batch):
+        """Tab-separated COPY text for a validated batch"""
+        columns = [
+            _copy_text(batch.prn),
+            batch.subject_id.astype(str),
+            np.char.replace(np.datetime_as_string(batch.timestamp, unit='us'), 'T', ' '),
+            np.full(len(batch), 'present'),
+            np.where(batch.camera_id == '', COPY_NULL, _copy_text(batch.camera_id)),
+            np.where(batch.direction == '', COPY_NULL, batch.direction),
+            np.where(np.isnan(batch.confidence), COPY_NULL,
+                     np.char.mod('%.2f', batch.confidence.astype(np.float64))),
+        ]
+        lines = columns[0]
+        for column in columns[1:]:
+            lines = np.char.add(np.char.add(lines, '\t'), column)
+        return io.StringIO('\n'.join(lines.tolist()) + '\n')
+
+    def ingest(self, body, content_type=None, content_encoding=None):
+        """Decode, validate, dedupe and COPY one batch; returns a summary dict"""
+        batch = decode_batch(body, content_type, content_encoding)
+        if len(batch) > self.max_events:
+            raise ValueError(f"Batch has {len(batch)} events, the limit is {self.max_events}")
+        summary = {'received': len(batch), 'inserted': 0, 'duplicates': 0, 'rejected': {}}
+        if not len(batch):
+            return summary
+
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                keep, summary['rejected'] = self.validate(batch, *self._lookup(cur, batch))
+                valid = batch.take(np.flatnonzero(keep))
+                unique = valid.take(self.dedupe(valid)) if len(valid) else valid
+                summary['duplicates'] = len(valid) - len(unique)
+                if len(unique):
+                    cur.copy_expert(
+                        "COPY AttendanceLog (prn_no, subject_id, timestamp, status, camera_id, "
+                        "direction, confidence) FROM STDIN",
+                        self._copy_buffer(unique),
+                    )
+                summary['inserted'] = len(unique)
+
+        if self.rosters is not None:
+            for prn, subject_id, at in zip(unique.prn.tolist(), unique.subject_id.tolist(),
+                                           unique.timestamp.tolist()):
+                self.rosters.mark(prn, subject_id, at)
+        return summary
@@ -12,6 +12,10 @@ import time
 from datetime import datetime
 from collections import deque
 
+from camera_pipeline import RecognitionPipeline
+from perf_trace import tracer
+from attendance_config import PERF_TRACE_CONFIG
+
 class AttendanceKiosk:
     def __init__(self, root, db_manager, face_engine, camera_manager):
         self.root = root
@@ -30,9 +34,10 @@ class AttendanceKiosk:
         self.subjects = {}
         self.selected_subject = tk.StringVar()
         self.selected_camera = tk.StringVar()
-        self.last_seen = {}  # Cooldown tracking
         self.cooldown_period = 300  # 5 minutes
+        self.pipeline = RecognitionPipeline(db_manager, face_engine, cooldown=self.cooldown_period)
         self.recent_logs = deque(maxlen=10)  # Recent attendance logs
+        self.camera_label = None  # stage timings are recorded under this camera
         
         self.setup_ui()
         self.load_data()
@@ -107,6 +112,7 @@ class AttendanceKiosk:
             width=30
         )
         self.subject_dropdown.pack(side='left', padx=5, fill='x', expand=True)
+        self.subject_dropdown.bind('<<ComboboxSelected>>', self.on_subject_selected)
         
         # Camera Selection
         camera_frame = tk.Frame(control_frame, bg='white')
@@ -207,6 +213,9 @@ class AttendanceKiosk:
         """Update date/time display"""
         now = datetime.now().strftime("%A, %B %d, %Y | %I:%M:%S %p")
         self.datetime_label.config(text=now)
+        if self.is_camera_running:
+            self.stats_label.config(
+                text=f"System Status: Running | {tracer.status_line(self.camera_label)}")
         self.root.after(1000, self.update_datetime)
         
     def load_data(self):
@@ -244,14 +253,23 @@ class AttendanceKiosk:
                 messagebox.showerror("Error", "Please select a camera")
                 return
             
-            # Load face encodings
+            # Load face encodings (or search them server-side with pgvector)
             try:
-                encodings, prns = self.db.get_all_face_encodings()
-                if not encodings:
-                    messagebox.showwarning("Warning", "No registered students found")
-                    return
-                
-                self.face_engine.load_known_faces(encodings, prns)
+                if self.face_engine.uses_database_matcher and self.db.vector_search_enabled:
+                    self.face_engine.attach_database_matcher(self.db)
+                else:
+                    class_ids = None
+                    if self.face_engine.config.get('class_shards', True):
+                        encodings, prns, class_ids = self.db.get_face_encodings_with_classes()
+                    else:
+                        encodings, prns = self.db.get_all_face_encodings()
+                    if not encodings:
+                        messagebox.showwarning("Warning", "No registered students found")
+                        return
+                    
+                    self.face_engine.load_known_faces(encodings, prns, class_ids)
+                    if class_ids is not None:
+                        self.activate_subject_shards()
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load face data: {e}")
                 return
@@ -273,6 +291,20 @@ class AttendanceKiosk:
             self.start_btn.config(text="▶ Start Attendance System", bg='#4CAF50')
             self.stats_label.config(text="System Status: Stopped")
     
+    def activate_subject_shards(self):
+        """Search the classes timetabled for the selected subject before the rest of the gallery"""
+        subject_id = self.subjects.get(self.selected_subject.get())
+        class_ids = self.db.get_classes_for_subject(subject_id, datetime.now()) if subject_id else []
+        self.face_engine.activate_shards(class_ids)
+    
+    def on_subject_selected(self, _event=None):
+        """Switch shards when the subject changes during a running session"""
+        if self.is_camera_running and self.face_engine.shard_members:
+            try:
+                self.activate_subject_shards()
+            except Exception as e:
+                print(f"⚠ Failed to switch gallery shards: {e}")
+    
     def video_loop(self, camera_index):
         """Main video processing loop"""
         cap = self.camera_manager.open_camera(camera_index)
@@ -283,9 +315,11 @@ class AttendanceKiosk:
         
         frame_count = 0
         process_every_n_frames = 3  # Process every 3rd frame for performance
+        self.camera_label = f"kiosk-{camera_index}"
+        tracer.set_camera(self.camera_label)
         
         while self.is_camera_running:
-            ret, frame = cap.read()
+            ret, frame = self.camera_manager.read_frame(cap)
             if not ret:
                 time.sleep(0.1)
                 continue
@@ -306,56 +340,32 @@ class AttendanceKiosk:
     
     def process_frame(self, frame):
         """Process frame for face recognition"""
-        # Detect and recognize faces
-        face_locations, face_encodings = self.face_engine.detect_and_encode_face(frame)
+        subject_id = self.subjects[self.selected_subject.get()]
+        faces = self.pipeline.process_frame(frame, subject_id)
         
-        if not face_encodings:
-            self.display_frame(frame, [])
-            return
-        
-        # Recognize faces
-        recognitions = self.face_engine.recognize_faces(face_encodings)
-        
-        # Process each recognition
         results = []
-        for i, (prn, confidence) in enumerate(recognitions):
-            face_location = face_locations[i]
-            
-            if prn:
-                # Check cooldown
-                current_time = time.time()
-                already_marked = (prn in self.last_seen and 
-                                (current_time - self.last_seen[prn]) < self.cooldown_period)
-                
-                if not already_marked:
-                    # Log attendance
-                    subject_id = self.subjects[self.selected_subject.get()]
-                    if self.db.log_attendance(prn, subject_id):
-                        self.last_seen[prn] = current_time
-                        
-                        # Get student name
-                        student_name = self.db.get_student_name(prn)
-                        
-                        # Add to recent logs
-                        self.add_to_log(student_name or prn, "Success", confidence)
-                        
-                        results.append((face_location, student_name or prn, 'success', confidence))
-                    else:
-                        results.append((face_location, prn, 'error', confidence))
-                else:
-                    # Already marked
-                    student_name = self.db.get_student_name(prn)
-                    results.append((face_location, f"{student_name or prn} (Already Marked)", 
-                                  'already_marked', confidence))
+        for face in faces:
+            label = face['name'] or face['prn']
+            if face['status'] == 'marked':
+                self.add_to_log(label, "Success", face['confidence'])
+                results.append((face['box'], label, 'success', face['confidence']))
+            elif face['status'] == 'already_marked':
+                results.append((face['box'], f"{label} (Already Marked)", 'already_marked',
+                                face['confidence']))
+            elif face['status'] == 'error':
+                results.append((face['box'], face['prn'], 'error', face['confidence']))
             else:
-                # Unknown face
-                results.append((face_location, "Unknown", 'unknown', confidence))
+                results.append((face['box'], "Unknown", 'unknown', face['confidence']))
         
         # Display frame with annotations
         self.display_frame(frame, results)
     
     def display_frame(self, frame, results):
         """Display frame with face annotations"""
+        with tracer.stage('render'):
+            self._render_frame(frame, results)
+
+    def _render_frame(self, frame, results):
         display_frame = frame.copy()
         
         for result in results:
@@ -452,6 +462,10 @@ class AttendanceKiosk:
         self.is_camera_running = False
         if self.video_thread:
             self.video_thread.join(timeout=1)
+        self.pipeline.cooldowns.close()  # keep cooldowns across a restart
+        if PERF_TRACE_CONFIG.get('trace_path'):
+            events = tracer.dump_trace(PERF_TRACE_CONFIG['trace_path'])
+            print(f"✓ Wrote {events} trace events to {PERF_TRACE_CONFIG['trace_path']}")
         self.root.destroy()
 
 
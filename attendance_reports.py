@@ -0,0 +1,266 @@
+# attendance_reports.py
+"""
+Vectorized attendance analytics and report exports
+
+Data is pulled from the daily rollup tables in bulk (binary COPY decoded
+straight into NumPy arrays) and every report is computed with array
+operations over a students x subjects x months cube.
+
+A session counts as held for a class on any day that at least one of its
+students was marked present for the subject.
+"""
+
+import csv
+import io
+import time
+from datetime import date
+
+import numpy as np
+
+PGCOPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+
+
+def copy_int_columns(cur, sql, params, n_columns):
+    """Run a query whose columns are all NOT NULL int4 through binary COPY.
+
+    Returns one int32 NumPy array per column, decoded without a Python-level loop.
+    """
+    query = cur.mogrify(sql, params).decode('utf-8')
+    buffer = io.BytesIO()
+    cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT binary)", buffer)
+    data = buffer.getvalue()
+
+    if not data.startswith(PGCOPY_SIGNATURE):
+        raise ValueError("Unexpected COPY BINARY header")
+    extension_length = int.from_bytes(data[15:19], 'big')
+    body = data[19 + extension_length:-2]  # strip header and the int16 -1 trailer
+
+    fields = [('count', '>i2')]
+    for index in range(n_columns):
+        fields += [(f'len{index}', '>i4'), (f'col{index}', '>i4')]
+    rows = np.frombuffer(body, dtype=np.dtype(fields))
+    return [rows[f'col{index}'].astype(np.int32) for index in range(n_columns)]
+
+
+def month_starts(start_date, end_date):
+    months = []
+    current = date(start_date.year, start_date.month, 1)
+    while current <= end_date:
+        months.append(current)
+        current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+    return months
+
+
+class AttendanceReport:
+    """Attended and held session counts as a students x subjects x months cube"""
+
+    def __init__(self, start_date, end_date, prns, names, class_ids,
+                 subject_ids, subject_names, months, attended, held, timings=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.prns = prns
+        self.names = names
+        self.class_ids = class_ids
+        self.subject_ids = subject_ids
+        self.subject_names = subject_names
+        self.months = months
+        self.attended = attended  # int32 [students, subjects, months]
+        self.held = held          # int32 [students, subjects, months]
+        self.timings = timings or {}  # how long build() took, per phase
+
+    @staticmethod
+    def _percent(attended, held):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(held > 0, attended * 100.0 / np.maximum(held, 1), np.nan)
+
+    def subject_percentages(self):
+        """[students, subjects] attendance % over the whole range (NaN where nothing held)"""
+        return self._percent(self.attended.sum(axis=2), self.held.sum(axis=2))
+
+    def overall_percentages(self):
+        """[students] attendance % across all subjects"""
+        return self._percent(self.attended.sum(axis=(1, 2)), self.held.sum(axis=(1, 2)))
+
+    def monthly_percentages(self):
+        """[students, subjects, months] attendance %"""
+        return self._percent(self.attended, self.held)
+
+    def defaulter_mask(self, threshold):
+        """Students below threshold overall or in any subject that was held"""
+        overall = self.overall_percentages()
+        per_subject = self.subject_percentages()
+        below_subject = np.any(np.nan_to_num(per_subject, nan=100.0) < threshold, axis=1)
+        return (np.nan_to_num(overall, nan=100.0) < threshold) | below_subject
+
+    # -- tabular views shared by the exporters -------------------------------------
+
+    def table(self, kind, threshold=75.0):
+        """Return (columns, row-index array, column-value arrays) for a report kind"""
+        student_columns = [self.prns, self.names, self.class_ids]
+        if kind == 'percentages':
+            percentages = self.subject_percentages()
+            columns = ['prn', 'name', 'class_id', 'overall_pct'] + [
+                f"{name}_pct" for name in self.subject_names]
+            values = student_columns + [self.overall_percentages()] + [
+                percentages[:, j] for j in range(len(self.subject_ids))]
+            return columns, np.arange(len(self.prns)), values
+
+        if kind == 'defaulters':
+            columns, _, values = self.table('percentages')
+            return columns, np.flatnonzero(self.defaulter_mask(threshold)), values
+
+        if kind == 'monthly':
+            monthly = self.monthly_percentages()
+            columns = ['prn', 'name', 'class_id']
+            values = list(student_columns)
+            for j, subject_name in enumerate(self.subject_names):
+                for m, month in enumerate(self.months):
+                    columns.append(f"{subject_name} {month:%Y-%m}")
+                    values.append(monthly[:, j, m])
+            return columns, np.arange(len(self.prns)), values
+
+        raise ValueError(f"Unknown report kind: {kind}")
+
+    def records(self, kind, threshold=75.0):
+        """Report rows as dicts (NaN percentages become None)"""
+        columns, index, values = self.table(kind, threshold)
+        for i in index:
+            row = {}
+            for column, array in zip(columns, values):
+                value = array[i]
+                if isinstance(value, (float, np.floating)):
+                    value = None if np.isnan(value) else round(float(value), 2)
+                elif isinstance(value, np.integer):
+                    value = int(value)
+                row[column] = value
+            yield row
+
+    def iter_csv(self, kind, threshold=75.0, chunk_rows=2000):
+        """Stream the report as CSV text chunks"""
+        columns, index, values = self.table(kind, threshold)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for start in range(0, len(index), chunk_rows):
+            rows = index[start:start + chunk_rows]
+            chunk_columns = []
+            for array in values:
+                chunk = np.asarray(array)[rows]
+                if chunk.dtype.kind == 'f':
+                    chunk = np.where(np.isnan(chunk), '', np.char.mod('%.2f', chunk))
+                chunk_columns.append(chunk.tolist())
+            writer.writerows(zip(*chunk_columns))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def write_parquet(self, target, kind, threshold=75.0):
+        """Write the report as Parquet (requires the optional pyarrow package)"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)") from e
+
+        columns, index, values = self.table(kind, threshold)
+        arrays = [pa.array(np.asarray(array)[index]) for array in values]
+        pq.write_table(pa.Table.from_arrays(arrays, names=columns), target, compression='zstd')
+
+    def write_npz(self, target):
+        """Write the raw cube and labels as a compressed NumPy archive"""
+        np.savez_compressed(
+            target,
+            prns=self.prns.astype(str), names=self.names.astype(str), class_ids=self.class_ids,
+            subject_ids=self.subject_ids, subject_names=self.subject_names.astype(str),
+            months=np.array([m.isoformat() for m in self.months]),
+            attended=self.attended, held=self.held,
+        )
+
+
+class AttendanceReportEngine:
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def build(self, start_date, end_date, class_id=None):
+        """Load rollups for [start_date, end_date] and build the report cube"""
+        if end_date < start_date:
+            raise ValueError("end_date must not be before start_date")
+        timings = {}
+        started = time.perf_counter()
+        months = month_starts(start_date, end_date)
+        class_filter = "" if class_id is None else "WHERE class_id = %(class_id)s"
+        params = {'start': start_date, 'end': end_date, 'class_id': class_id,
+                  'first_month': months[0]}
+
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                # Dense student ordinals are assigned server-side so only int columns are copied
+                cur.execute(f"""
+                    CREATE TEMP TABLE report_students ON COMMIT DROP AS
+                    SELECT (row_number() OVER (ORDER BY prn_no) - 1)::int AS ordinal,
+                           prn_no, name, COALESCE(class_id, 0) AS class_id
+                    FROM Students {class_filter}
+                """, params)
+                cur.execute("SELECT prn_no, name, class_id FROM report_students ORDER BY ordinal")
+                student_rows = cur.fetchall()
+                cur.execute("SELECT subject_id, subject_name FROM Subjects ORDER BY subject_id")
+                subject_rows = cur.fetchall()
+                timings['students_ms'] = (time.perf_counter() - started) * 1000.0
+
+                month_expr = ("((EXTRACT(YEAR FROM r.day) - EXTRACT(YEAR FROM %(first_month)s::date)) * 12"
+                              " + EXTRACT(MONTH FROM r.day) - EXTRACT(MONTH FROM %(first_month)s::date))::int")
+                copy_started = time.perf_counter()
+                ordinals, attended_subjects, attended_months = copy_int_columns(cur, f"""
+                    SELECT s.ordinal, r.subject_id, {month_expr}
+                    FROM AttendanceDailyRollup r
+                    JOIN report_students s ON s.prn_no = r.prn_no
+                    WHERE r.day >= %(start)s AND r.day <= %(end)s
+                """, params, 3)
+                held_classes, held_subjects, held_months = copy_int_columns(cur, f"""
+                    SELECT r.class_id, r.subject_id, {month_expr}
+                    FROM ClassDailyRollup r
+                    WHERE r.day >= %(start)s AND r.day <= %(end)s AND r.present_count > 0
+                    {"" if class_id is None else "AND r.class_id = %(class_id)s"}
+                """, params, 3)
+                timings['copy_ms'] = (time.perf_counter() - copy_started) * 1000.0
+                timings['rollup_rows'] = int(len(ordinals) + len(held_classes))
+
+        compute_started = time.perf_counter()
+        prns = np.array([r[0] for r in student_rows], dtype=object)
+        names = np.array([r[1] for r in student_rows], dtype=object)
+        class_ids = np.array([r[2] for r in student_rows], dtype=np.int32)
+        subject_ids = np.array([r[0] for r in subject_rows], dtype=np.int32)
+        subject_names = np.array([r[1] for r in subject_rows], dtype=object)
+
+        n_students, n_subjects, n_months = len(prns), len(subject_ids), len(months)
+        subject_index = np.full(int(subject_ids.max(initial=0)) + 1, -1, dtype=np.int64)
+        subject_index[subject_ids] = np.arange(n_subjects)
+
+        # attended[s, j, m] = number of days student s was present for subject j in month m
+        flat = (ordinals.astype(np.int64) * n_subjects + subject_index[attended_subjects]) * n_months \
+            + attended_months
+        attended = np.bincount(flat, minlength=n_students * n_subjects * n_months) \
+            .reshape(n_students, n_subjects, n_months).astype(np.int32)
+
+        # held per class, then broadcast to each student through their class
+        class_keys, class_of_student = np.unique(class_ids, return_inverse=True)
+        class_position = np.searchsorted(class_keys, held_classes)
+        if len(class_keys):
+            known = (class_position < len(class_keys)) & \
+                (class_keys[np.minimum(class_position, len(class_keys) - 1)] == held_classes)
+        else:
+            known = np.zeros(len(held_classes), dtype=bool)
+        held_flat = (class_position[known].astype(np.int64) * n_subjects
+                     + subject_index[held_subjects[known]]) * n_months + held_months[known]
+        held_by_class = np.bincount(held_flat, minlength=len(class_keys) * n_subjects * n_months) \
+            .reshape(len(class_keys), n_subjects, n_months).astype(np.int32)
+        held = held_by_class[class_of_student] if n_students else \
+            np.zeros((0, n_subjects, n_months), dtype=np.int32)
+
+        timings['compute_ms'] = (time.perf_counter() - compute_started) * 1000.0
+        timings['total_ms'] = (time.perf_counter() - started) * 1000.0
+
+        return AttendanceReport(start_date, end_date, prns, names, class_ids,
+                                subject_ids, subject_names, months, attended, held, timings)
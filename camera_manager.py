@@ -6,6 +6,8 @@ Manages multiple camera sources with auto-detection
 import cv2
 import threading
 
+from perf_trace import tracer
+
 class CameraManager:
     def __init__(self, config):
         self.config = config
@@ -55,6 +57,11 @@ class CameraManager:
         
         return cap
     
+    def read_frame(self, cap):
+        """Grab the next frame, timed as the 'capture' stage; returns (ok, frame)"""
+        with tracer.stage('capture'):
+            return cap.read()
+
     def get_camera_list(self):
         """Get list of camera names for UI dropdown"""
         return [f"{cam['name']} ({cam['resolution']})" 
@@ -0,0 +1,201 @@
+# camera_pipeline.py
+"""
+Recognition pipeline shared by the kiosk and headless camera workers
+
+RecognitionPipeline turns one frame into per-face results (detect, match,
+cooldown, log attendance) and optionally publishes them as live events.
+CameraWorker runs the pipeline on a camera in a background thread without
+any UI, for the API server or an edge daemon.
+
+Live event format (compact JSON, one object per processed frame):
+    {"t": "det", "cam": "<camera id>", "seq": 12, "ts": 1718000000.123,
+     "dir": "IN", "subject": 3,
+     "faces": [[top, right, bottom, left, "<prn or null>", <confidence>, "<status>"], ...]}
+status is one of marked, already_marked, recognized, unknown, error.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from attendance_config import ATTENDANCE_COOLDOWN, DEDUP_CONFIG
+from dedup_store import CooldownStore
+from perf_trace import traced, tracer
+
+
+class RecognitionPipeline:
+    def __init__(self, db_manager, face_engine, event_bus=None, cooldown=ATTENDANCE_COOLDOWN,
+                 cooldowns=None, occupancy=None, rosters=None):
+        self.db = db_manager
+        self.face_engine = face_engine
+        self.event_bus = event_bus
+        self.occupancy = occupancy  # OccupancyTracker fed with every IN/OUT sighting
+        self.rosters = rosters  # RosterBitmaps updated with every mark
+        self.cooldowns = cooldowns or CooldownStore.from_config(DEDUP_CONFIG, ttl=cooldown)
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    @traced('pipeline')
+    def process_frame(self, frame, subject_id=None, camera_id=None):
+        """Detect, recognize and log attendance for every face in a frame.
+
+        With subject_id None faces are only recognized, not logged. Returns a
+        list of dicts with box (top, right, bottom, left), prn, name, status
+        and confidence.
+        """
+        face_locations, face_encodings = self.face_engine.detect_and_encode_face(frame)
+        results = []
+        if face_encodings:
+            recognitions = self.face_engine.recognize_faces(face_encodings)
+
+            # Look up names for every recognized face in one query
+            student_names = self.db.get_student_names(prn for prn, _ in recognitions)
+
+            direction = self.face_engine.get_camera_direction(camera_id) if camera_id is not None else None
+            for face_location, (prn, confidence) in zip(face_locations, recognitions):
+                status = 'unknown'
+                if prn and self.occupancy is not None:
+                    self.occupancy.observe(prn, direction, camera_id)
+                if prn and subject_id is not None:
+                    # Claim the cooldown before writing so concurrent cameras log a student once;
+                    # IN and OUT cool down separately so the log keeps both crossings
+                    key = f"{prn}|{direction}" if direction in ('IN', 'OUT') else prn
+                    if not self.cooldowns.check_and_set(key):
+                        status = 'already_marked'
+                    elif self.db.log_attendance(prn, subject_id, camera_id, direction, confidence):
+                        status = 'marked'
+                        if self.rosters is not None:
+                            self.rosters.mark(prn, subject_id)
+                    else:
+                        self.cooldowns.discard(key)
+                        status = 'error'
+                elif prn:
+                    status = 'recognized'
+                results.append({
+                    'box': tuple(int(v) for v in face_location),
+                    'prn': prn,
+                    'name': student_names.get(prn) if prn else None,
+                    'status': status,
+                    'confidence': float(confidence),
+                })
+
+        self.publish(results, subject_id, camera_id)
+        return results
+
+    def publish(self, results, subject_id=None, camera_id=None):
+        if self.event_bus is None:
+            return
+        with self.lock:
+            self.sequence += 1
+            sequence = self.sequence
+        self.event_bus.publish({
+            't': 'det',
+            'cam': camera_id,
+            'seq': sequence,
+            'ts': round(time.time(), 3),
+            'dir': self.face_engine.get_camera_direction(camera_id) if camera_id is not None else None,
+            'subject': subject_id,
+            'faces': [[*r['box'], r['prn'], round(r['confidence'], 1), r['status']] for r in results],
+        })
+
+
+class CameraWorker:
+    """Run a RecognitionPipeline on one camera in a background thread"""
+
+    def __init__(self, pipeline, camera_manager, camera_id, source, subject_id=None,
+                 room=None, process_every_n_frames=3, session_refresh_s=60.0, frame_hub=None):
+        self.pipeline = pipeline
+        self.camera_manager = camera_manager
+        self.camera_id = str(camera_id)
+        self.source = source  # camera index or stream URL
+        self.fixed_subject_id = subject_id
+        self.room = room
+        self.process_every_n_frames = max(1, int(process_every_n_frames))
+        self.session_refresh_s = session_refresh_s
+        self.frame_hub = frame_hub  # receives every frame for the HTTP preview
+        self.subject_id = subject_id
+        self.last_session_check = 0.0
+        self.running = False
+        self.thread = None
+        self.frames = 0
+        self.processed = 0
+        self.last_frame_at = None
+        self.error = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"camera-{self.camera_id}", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+
+    def _refresh_subject(self):
+        """Without a fixed subject, log against the timetable slot running in this room"""
+        if self.fixed_subject_id is not None or self.room is None:
+            return
+        now = time.monotonic()
+        if now - self.last_session_check < self.session_refresh_s:
+            return
+        self.last_session_check = now
+        try:
+            sessions = self.pipeline.db.get_timetable_sessions(datetime.now(), room=self.room)
+        except Exception as e:
+            print(f"⚠ Camera {self.camera_id}: timetable lookup failed: {e}")
+            return
+        self.subject_id = sessions[0]['subject_id'] if sessions else None
+
+    def _run(self):
+        cap = self.camera_manager.open_camera(self.source)
+        if not cap:
+            self.error = f"Failed to open camera {self.source}"
+            self.running = False
+            print(f"✗ {self.error}")
+            return
+
+        print(f"✓ Camera worker {self.camera_id} started")
+        tracer.set_camera(self.camera_id)
+        try:
+            while self.running:
+                ret, frame = self.camera_manager.read_frame(cap)
+                if not ret:
+                    time.sleep(0.1)
+                    continue
+                self.frames += 1
+                self.last_frame_at = time.time()
+                if self.frames % self.process_every_n_frames:
+                    if self.frame_hub is not None:
+                        self.frame_hub.publish(self.camera_id, frame)
+                    continue
+
+                self._refresh_subject()
+                faces = None
+                try:
+                    enhanced = self.pipeline.face_engine.enhance_image_quality(frame)
+                    faces = self.pipeline.process_frame(enhanced, self.subject_id, self.camera_id)
+                    self.processed += 1
+                    self.error = None
+                except Exception as e:
+                    self.error = str(e)
+                    print(f"⚠ Camera {self.camera_id}: {e}")
+                if self.frame_hub is not None:
+                    self.frame_hub.publish(self.camera_id, frame, faces)
+        finally:
+            cap.release()
+
+    def status(self):
+        return {
+            'camera_id': self.camera_id,
+            'source': str(self.source),
+            'running': self.running,
+            'subject_id': self.subject_id,
+            'frames': self.frames,
+            'processed': self.processed,
+            'last_frame_at': self.last_frame_at,
+            'error': self.error,
+        }
@@ -0,0 +1,100 @@
+# connection_pool.py
+"""
+Thread-safe PostgreSQL connection pool with usage metrics
+"""
+
+import threading
+import time
+from psycopg2 import pool
+
+
+class PoolTimeoutError(pool.PoolError):
+    """Raised when no connection becomes free within the acquire timeout"""
+
+
+class MonitoredConnectionPool:
+    """Wraps ThreadedConnectionPool so callers wait for a free connection
+    instead of failing immediately, and records how long they waited."""
+
+    def __init__(self, minconn, maxconn, acquire_timeout=10.0, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = float(acquire_timeout)
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._stats_lock = threading.Lock()
+
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._waited_checkouts = 0
+        self._exhausted = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def getconn(self):
+        """Check out a connection, blocking up to acquire_timeout seconds"""
+        start = time.perf_counter()
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._stats_lock:
+                self._waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.acquire_timeout)
+            finally:
+                with self._stats_lock:
+                    self._waiting -= 1
+            if not acquired:
+                with self._stats_lock:
+                    self._exhausted += 1
+                raise PoolTimeoutError(
+                    f"No database connection available after {self.acquire_timeout:.1f}s"
+                )
+
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._stats_lock:
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            if waited > 0.001:
+                self._waited_checkouts += 1
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection; broken connections are discarded"""
+        try:
+            self._pool.putconn(conn, close=close or bool(conn.closed))
+        finally:
+            with self._stats_lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._stats_lock:
+            checkouts = self._checkouts
+            return {
+                'max_connections': self.maxconn,
+                'in_use': self._in_use,
+                'available': self.maxconn - self._in_use,
+                'peak_in_use': self._peak_in_use,
+                'waiting': self._waiting,
+                'checkouts': checkouts,
+                'waited_checkouts': self._waited_checkouts,
+                'exhausted': self._exhausted,
+                'total_wait_ms': self._total_wait * 1000.0,
+                'avg_wait_ms': (self._total_wait / checkouts * 1000.0) if checkouts else 0.0,
+                'max_wait_ms': self._max_wait * 1000.0,
+            }
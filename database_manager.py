@@ -4,27 +4,95 @@ Handles all database operations with connection pooling
 """
 
 import psycopg2
-from psycopg2 import pool
+import psycopg2.extensions
 from contextlib import contextmanager
 from pathlib import Path
+import base64
+import csv
+import io
 import json
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
 import numpy as np
+from face_matcher import normalize_embedding, distance_to_confidence
+from connection_pool import MonitoredConnectionPool
+from attendance_archive import AttendanceArchive, next_month
+from perf_trace import tracer
+
+slow_query_logger = logging.getLogger('attendance.db.slow_queries')
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers which statements it has prepared"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
 
 class DatabaseManager:
+    # Hot statements, prepared once per pooled connection on first use
+    PREPARED_STATEMENTS = {
+        'log_attendance': """
+            INSERT INTO AttendanceLog (prn_no, subject_id, camera_id, direction, confidence)
+            VALUES ($1, $2, $3, $4, $5)
+        """,
+        'get_student_name': "SELECT name FROM Students WHERE prn_no = $1",
+        'get_student_names': "SELECT prn_no, name FROM Students WHERE prn_no = ANY($1)",
+        'dashboard_counts': """
+            SELECT
+                (SELECT COUNT(*) FROM Students),
+                (SELECT COUNT(DISTINCT prn_no) FROM AttendanceDailyRollup
+                 WHERE day = CURRENT_DATE)
+        """,
+    }
+
     def __init__(self, config):
         self.config = config
         self.schema_path = Path(__file__).with_name('tables')
+        self.slow_query_ms = float(config.get('slow_query_ms', 100.0))
+        self.slow_query_thresholds = dict(config.get('slow_query_thresholds', {}))
+        self.query_stats = {}
+        self._query_stats_lock = threading.Lock()
+        self._configure_slow_query_log(config.get('slow_query_log'))
+        # Optional schema name so benchmarks can run against isolated tables
+        self.schema = config.get('schema')
+        self.vector_config = config.get('vector_search', {})
+        self.vector_search_enabled = False
+        archive_config = config.get('archive', {})
+        self.archive = AttendanceArchive(archive_config.get('root', 'archive'),
+                                         archive_config.get('format', 'auto'))
+        connect_kwargs = {}
+        if self.schema:
+            connect_kwargs['options'] = f"-c search_path={self.schema},public"
         try:
-            self.connection_pool = psycopg2.pool.SimpleConnectionPool(
-                1, 10,  # min and max connections
+            # Shared by the kiosk video thread, the Tk main thread and API workers
+            self.connection_pool = MonitoredConnectionPool(
+                int(config.get('pool_min', 1)),
+                int(config.get('pool_max', 10)),
+                acquire_timeout=float(config.get('pool_timeout', 10.0)),
                 host=config['host'],
                 database=config['database'],
                 user=config['user'],
                 password=config['password'],
-                port=config.get('port', 5432)
+                port=config.get('port', 5432),
+                connection_factory=PreparingConnection,
+                **connect_kwargs
             )
             print("✓ Database connection pool created successfully")
             self.initialize_schema()
+            self.ensure_attendance_partitions()
+            self.initialize_vector_search()
         except Exception as e:
             print(f"✗ Failed to create connection pool: {e}")
             raise
@@ -39,41 +107,223 @@ class DatabaseManager:
 
         with self.get_connection() as conn:
             with conn.cursor() as cur:
+                if self.schema:
+                    cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{self.schema}"')
                 cur.execute(schema_sql)
             conn.commit()
 
         print("✓ Prototype database schema verified")
 
+    def ensure_attendance_partitions(self, from_date=None, to_date=None):
+        """Create monthly AttendanceLog partitions covering [from_date, to_date].
+
+        Defaults to the current month plus `partition_months_ahead` months.
+        """
+        today = date.today()
+        if from_date is None:
+            from_date = today.replace(day=1)
+        if to_date is None:
+            months_ahead = int(self.config.get('partition_months_ahead', 3))
+            month_index = today.year * 12 + today.month - 1 + months_ahead
+            to_date = date(month_index // 12, month_index % 12 + 1, 1)
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT ensure_attendance_partitions(%s, %s)", (from_date, to_date))
+                created = cur.fetchone()[0]
+        if created:
+            print(f"✓ Created {created} AttendanceLog partition(s)")
+        return created
+
+    def initialize_vector_search(self):
+        """Add the pgvector embedding column and ANN index when the extension is available."""
+        if not self.vector_config.get('enabled', False):
+            return
+
+        dimension = int(self.vector_config.get('dimension', 512))
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("CREATE EXTENSION IF NOT EXISTS vector WITH SCHEMA public")
+                    cur.execute(
+                        f"ALTER TABLE FaceEncodings ADD COLUMN IF NOT EXISTS embedding vector({dimension})"
+                    )
+                    # Backfill rows written before the column existed
+                    cur.execute(
+                        """
+                        UPDATE FaceEncodings
+                        SET embedding = encoding_data::text::vector
+                        WHERE embedding IS NULL
+                          AND CASE WHEN jsonb_typeof(encoding_data) = 'array'
+                                   THEN jsonb_array_length(encoding_data) END = %s
+                        """,
+                        (dimension,)
+                    )
+                    self._create_vector_index(cur)
+        except psycopg2.Error as e:
+            print(f"⚠ pgvector search unavailable, using in-memory matching only: {e}")
+            return
+
+        self.vector_search_enabled = True
+        print(f"✓ pgvector search enabled ({self.vector_config.get('index_type', 'hnsw')} index)")
+
+    def _create_vector_index(self, cur):
+        index_type = self.vector_config.get('index_type', 'hnsw')
+        if index_type == 'ivfflat':
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS faceencodings_embedding_ivfflat_idx
+                ON FaceEncodings USING ivfflat (embedding vector_cosine_ops)
+                WITH (lists = %s)
+                """,
+                (int(self.vector_config.get('ivfflat_lists', 100)),)
+            )
+        elif index_type == 'hnsw':
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS faceencodings_embedding_hnsw_idx
+                ON FaceEncodings USING hnsw (embedding vector_cosine_ops)
+                WITH (m = %s, ef_construction = %s)
+                """,
+                (
+                    int(self.vector_config.get('hnsw_m', 16)),
+                    int(self.vector_config.get('hnsw_ef_construction', 64)),
+                )
+            )
+        else:
+            raise ValueError(f"Unknown vector index type: {index_type}")
+
+    def _vector_literal(self, embedding):
+        """Format an embedding as pgvector text input, or None if the dimension does not fit."""
+        values = np.asarray(embedding, dtype=np.float32).flatten()
+        if len(values) != int(self.vector_config.get('dimension', 512)):
+            return None
+        return json.dumps(values.tolist())
+
     @contextmanager
-    def get_connection(self):
-        """Context manager for database connections"""
+    def get_connection(self, readonly=False):
+        """Context manager for database connections
+
+        Read-only callers run in autocommit mode, so their SELECTs cost no
+        BEGIN/COMMIT round trips.
+        """
         conn = self.connection_pool.getconn()
         try:
-            yield conn
-            conn.commit()
+            if readonly:
+                conn.autocommit = True
+                yield conn
+            else:
+                yield conn
+                conn.commit()
         except Exception:
-            conn.rollback()
+            if not conn.autocommit:
+                conn.rollback()
             raise
         finally:
+            if readonly and not conn.closed:
+                conn.autocommit = False
             self.connection_pool.putconn(conn)
 
+    def _configure_slow_query_log(self, log_path):
+        if not log_path:
+            return
+        if any(getattr(h, 'baseFilename', None) == str(Path(log_path).resolve())
+               for h in slow_query_logger.handlers):
+            return
+        handler = logging.FileHandler(log_path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+
+    def _timed_execute(self, cur, name, sql, params=None):
+        """Execute a statement, recording its latency and logging it when slow"""
+        start = time.perf_counter()
+        try:
+            cur.execute(sql, params)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            self._record_query_time(name, elapsed_ms)
+
+    def _record_query_time(self, name, elapsed_ms):
+        tracer.record('db', elapsed_ms, f"db:{name}")
+        with self._query_stats_lock:
+            stats = self.query_stats.setdefault(
+                name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'slow_calls': 0}
+            )
+            stats['calls'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            threshold = float(self.slow_query_thresholds.get(name, self.slow_query_ms))
+            is_slow = elapsed_ms >= threshold
+            if is_slow:
+                stats['slow_calls'] += 1
+        if is_slow:
+            slow_query_logger.warning("slow query %s: %.1f ms (threshold %.1f ms)",
+                                      name, elapsed_ms, threshold)
+
+    def _execute_prepared(self, cur, name, params=()):
+        """Execute one of PREPARED_STATEMENTS, preparing it on this connection if needed"""
+        prepared = getattr(cur.connection, 'prepared_statements', None)
+        if prepared is None:
+            # Connection not created by the pool factory; fall back to plain SQL
+            sql = self.PREPARED_STATEMENTS[name]
+            for position in range(len(params), 0, -1):
+                sql = sql.replace(f"${position}", "%s")
+            self._timed_execute(cur, name, sql, params)
+            return
+
+        if name not in prepared:
+            cur.execute(f"PREPARE {name} AS {self.PREPARED_STATEMENTS[name]}")
+            prepared.add(name)
+
+        if params:
+            placeholders = ", ".join(["%s"] * len(params))
+            self._timed_execute(cur, name, f"EXECUTE {name} ({placeholders})", params)
+        else:
+            self._timed_execute(cur, name, f"EXECUTE {name}")
+
+    def get_query_stats(self):
+        """Per-statement call counts and timings"""
+        with self._query_stats_lock:
+            return {
+                name: dict(stats, avg_ms=stats['total_ms'] / stats['calls'] if stats['calls'] else 0.0)
+                for name, stats in self.query_stats.items()
+            }
+
     def get_all_classes(self):
         """Fetch all classes from database"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT class_id, class_name FROM Classes ORDER BY class_name")
+                self._timed_execute(cur, 'get_all_classes',
+                                    "SELECT class_id, class_name FROM Classes ORDER BY class_name")
                 return {name: cid for cid, name in cur.fetchall()}
 
     def get_all_subjects(self):
         """Fetch all subjects from database"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT subject_id, subject_name FROM Subjects ORDER BY subject_name")
+                self._timed_execute(cur, 'get_all_subjects',
+                                    "SELECT subject_id, subject_name FROM Subjects ORDER BY subject_name")
                 return {name: sid for sid, name in cur.fetchall()}
 
+    def _insert_face_encodings(self, cur, prn, face_encodings):
+        """Insert one FaceEncodings row per template"""
+        for encoding in face_encodings:
+            encoding_json = json.dumps(encoding.tolist())
+            if self.vector_search_enabled:
+                cur.execute(
+                    "INSERT INTO FaceEncodings (prn_no, encoding_data, embedding) VALUES (%s, %s, %s::vector)",
+                    (prn, encoding_json, self._vector_literal(encoding))
+                )
+            else:
+                cur.execute(
+                    "INSERT INTO FaceEncodings (prn_no, encoding_data) VALUES (%s, %s)",
+                    (prn, encoding_json)
+                )
+
     def register_student(self, prn, class_id, roll_no, name, email, face_encoding):
-        """Register a new student with face encoding"""
-        encoding_json = json.dumps(face_encoding.tolist())
+        """Register a new student with one face encoding, or several as rows of a 2-D array"""
+        face_encodings = np.atleast_2d(np.asarray(face_encoding, dtype=np.float32))
         
         with self.get_connection() as conn:
             with conn.cursor() as cur:
@@ -83,11 +333,8 @@ class DatabaseManager:
                         "INSERT INTO Students (prn_no, class_id, roll_no, name, email) VALUES (%s, %s, %s, %s, %s)",
                         (prn, class_id, int(roll_no), name, email)
                     )
-                    # Insert face encoding
-                    cur.execute(
-                        "INSERT INTO FaceEncodings (prn_no, encoding_data) VALUES (%s, %s)",
-                        (prn, encoding_json)
-                    )
+                    # Insert face encodings (one row per template)
+                    self._insert_face_encodings(cur, prn, face_encodings)
                     conn.commit()
                     return True, "Student registered successfully"
                 except psycopg2.IntegrityError as e:
@@ -101,11 +348,74 @@ class DatabaseManager:
                     else:
                         return False, str(e)
 
+    def add_face_encodings(self, prn, face_encodings):
+        """Add extra face templates for an existing student"""
+        face_encodings = np.atleast_2d(np.asarray(face_encodings, dtype=np.float32))
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM Students WHERE prn_no = %s", (prn,))
+                if cur.fetchone() is None:
+                    return False, f"PRN '{prn}' not found"
+                self._insert_face_encodings(cur, prn, face_encodings)
+        return True, f"Added {len(face_encodings)} face template(s)"
+
+    @staticmethod
+    def _csv_buffer(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        return buffer
+
+    def get_enrolled_prns(self):
+        """PRNs that already have a student row (bulk enrollment skips them on resume)"""
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT prn_no FROM Students")
+                return {row[0] for row in cur.fetchall()}
+
+    def bulk_register_students(self, students, face_encodings):
+        """Register many students and their templates with COPY in one transaction.
+
+        students: (prn, class_id, roll_no, name, email) tuples; face_encodings: prn -> 2-D array.
+        Rows that clash with an existing PRN, email or roll number are skipped.
+        Returns the set of PRNs that were inserted.
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TEMP TABLE enroll_students
+                        (prn_no VARCHAR(20), class_id INTEGER, roll_no INTEGER, name VARCHAR(100),
+                         email VARCHAR(100))
+                    ON COMMIT DROP
+                """)
+                cur.copy_expert("COPY enroll_students FROM STDIN WITH (FORMAT csv)",
+                                self._csv_buffer(students))
+                cur.execute("""
+                    INSERT INTO Students (prn_no, class_id, roll_no, name, email)
+                    SELECT prn_no, class_id, roll_no, name, email FROM enroll_students
+                    ON CONFLICT DO NOTHING
+                    RETURNING prn_no
+                """)
+                inserted = {row[0] for row in cur.fetchall()}
+
+                rows = []
+                for prn in inserted:
+                    for encoding in np.atleast_2d(face_encodings[prn]):
+                        row = [prn, json.dumps(encoding.tolist())]
+                        if self.vector_search_enabled:
+                            row.append(self._vector_literal(encoding))
+                        rows.append(row)
+                columns = "prn_no, encoding_data, embedding" if self.vector_search_enabled else "prn_no, encoding_data"
+                cur.copy_expert(f"COPY FaceEncodings ({columns}) FROM STDIN WITH (FORMAT csv)",
+                                self._csv_buffer(rows))
+        return inserted
+
     def get_all_face_encodings(self):
         """Fetch all face encodings from database (JSONB format for compatibility)"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT prn_no, encoding_data FROM FaceEncodings ORDER BY prn_no")
+                self._timed_execute(cur, 'get_all_face_encodings',
+                                    "SELECT prn_no, encoding_data FROM FaceEncodings ORDER BY prn_no")
                 results = cur.fetchall()
                 encodings = []
                 prns = []
@@ -115,15 +425,140 @@ class DatabaseManager:
                         prns.append(prn_no)
                 return encodings, prns
 
-    def log_attendance(self, prn_no, subject_id):
-        """Log attendance for a student"""
+    def get_face_encodings_with_classes(self):
+        """Fetch all face encodings with each student's class, for class-sharded galleries"""
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_face_encodings_with_classes', """
+                    SELECT f.prn_no, f.encoding_data, s.class_id
+                    FROM FaceEncodings f
+                    JOIN Students s ON s.prn_no = f.prn_no
+                    ORDER BY s.class_id, f.prn_no
+                """)
+                encodings, prns, class_ids = [], [], []
+                for prn_no, encoding_data, class_id in cur.fetchall():
+                    if encoding_data:
+                        encodings.append(np.array(encoding_data, dtype=np.float32))
+                        prns.append(prn_no)
+                        class_ids.append(class_id)
+                return encodings, prns, class_ids
+
+    def add_timetable_entry(self, class_id, subject_id, day_of_week, start_time, end_time, room=None):
+        """Add a timetable slot (day_of_week is ISO, 1 = Monday); returns its entry_id"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO Timetable (class_id, subject_id, day_of_week, start_time, end_time, room)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING entry_id
+                """, (class_id, subject_id, day_of_week, start_time, end_time, room))
+                return cur.fetchone()[0]
+
+    def get_classes_for_subject(self, subject_id, day=None):
+        """Class ids timetabled for a subject, preferring that day's slots when a day is given"""
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_classes_for_subject', """
+                    SELECT class_id, bool_or(day_of_week = %s) AS on_day
+                    FROM Timetable
+                    WHERE subject_id = %s
+                    GROUP BY class_id
+                    ORDER BY class_id
+                """, (day.isoweekday() if day else None, subject_id))
+                rows = cur.fetchall()
+        on_day = [class_id for class_id, scheduled in rows if scheduled]
+        return on_day or [class_id for class_id, _ in rows]
+
+    def get_timetable_sessions(self, at=None, lead_minutes=0, room=None):
+        """Timetable slots running at `at` (default now) or starting within lead_minutes"""
+        at = at or datetime.now()
+        # Clamped to the end of the day: time + interval would wrap round to 00:xx near midnight
+        horizon = min(at + timedelta(minutes=int(lead_minutes)), datetime.combine(at.date(), datetime.max.time()))
+        clauses = ["day_of_week = %s",
+                   "start_time <= %s::time",
+                   "end_time > %s::time"]
+        params = [at.isoweekday(), horizon.time(), at.time()]
+        if room is not None:
+            clauses.append("room = %s")
+            params.append(room)
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_timetable_sessions', f"""
+                    SELECT entry_id, class_id, subject_id, day_of_week, start_time, end_time, room
+                    FROM Timetable
+                    WHERE {" AND ".join(clauses)}
+                    ORDER BY start_time, class_id
+                """, params)
+                rows = cur.fetchall()
+        return [
+            {"entry_id": r[0], "class_id": r[1], "subject_id": r[2], "day_of_week": r[3],
+             "start_time": str(r[4]), "end_time": str(r[5]), "room": r[6]}
+            for r in rows
+        ]
+
+    def match_face_embeddings(self, face_encodings, tolerance):
+        """Nearest-neighbour search for every face in a frame in one round trip.
+
+        Uses cosine distance on the pgvector index and returns the same
+        (prn or None, confidence) tuples as the in-memory matcher.
+        """
+        if len(face_encodings) == 0:
+            return []
+
+        values = []
+        params = []
+        for ordinal, encoding in enumerate(face_encodings):
+            values.append("(%s, %s::vector)")
+            params.extend([ordinal, self._vector_literal(normalize_embedding(encoding))])
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                if self.vector_config.get('index_type', 'hnsw') == 'ivfflat':
+                    cur.execute("SET LOCAL ivfflat.probes = %s",
+                                (int(self.vector_config.get('ivfflat_probes', 10)),))
+                else:
+                    cur.execute("SET LOCAL hnsw.ef_search = %s",
+                                (int(self.vector_config.get('hnsw_ef_search', 40)),))
+                self._timed_execute(
+                    cur,
+                    'match_face_embeddings',
+                    f"""
+                    SELECT q.ordinal, m.prn_no, m.distance
+                    FROM (VALUES {", ".join(values)}) AS q(ordinal, embedding)
+                    LEFT JOIN LATERAL (
+                        SELECT f.prn_no, f.embedding <=> q.embedding AS distance
+                        FROM FaceEncodings f
+                        WHERE f.embedding IS NOT NULL
+                        ORDER BY f.embedding <=> q.embedding
+                        LIMIT 1
+                    ) m ON TRUE
+                    ORDER BY q.ordinal
+                    """,
+                    params
+                )
+                rows = cur.fetchall()
+
+        results = []
+        for _, prn_no, cosine_distance in rows:
+            if prn_no is None or cosine_distance is None:
+                results.append((None, 0.0))
+                continue
+            # Cosine distance d relates to L2 distance between unit vectors as L2 = sqrt(2d)
+            distance = float(np.sqrt(max(0.0, 2.0 * float(cosine_distance))))
+            confidence = distance_to_confidence(distance)
+            results.append((prn_no if distance <= tolerance else None, confidence))
+        return results
+
+    def log_attendance(self, prn_no, subject_id, camera_id=None, direction=None, confidence=None):
+        """Log attendance for a student, with the camera, direction (IN/OUT) and confidence if known"""
+        if direction not in ('IN', 'OUT'):
+            direction = None
         with self.get_connection() as conn:
             with conn.cursor() as cur:
                 try:
-                    cur.execute(
-                        "INSERT INTO AttendanceLog (prn_no, subject_id) VALUES (%s, %s)",
-                        (prn_no, subject_id)
-                    )
+                    self._execute_prepared(cur, 'log_attendance', (
+                        prn_no, subject_id, camera_id, direction,
+                        None if confidence is None else float(confidence)))
                     conn.commit()
                     return True
                 except Exception as e:
@@ -133,71 +568,228 @@ class DatabaseManager:
 
     def get_student_name(self, prn_no):
         """Get student name by PRN"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT name FROM Students WHERE prn_no = %s", (prn_no,))
+                self._execute_prepared(cur, 'get_student_name', (prn_no,))
                 result = cur.fetchone()
                 return result[0] if result else None
-    def get_all_students(self):
-        """Fetch all students"""
-        with self.get_connection() as conn:
+
+    def get_student_names(self, prns):
+        """Get names for several PRNs (e.g. every face in a frame) in one query"""
+        prns = list(dict.fromkeys(prn for prn in prns if prn))
+        if not prns:
+            return {}
+        with self.get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT prn_no, class_id, roll_no, name, email
-                    FROM Students
-                    ORDER BY roll_no
-                """)
-                rows = cur.fetchall()
+                self._execute_prepared(cur, 'get_student_names', (prns,))
+                return dict(cur.fetchall())
 
-                students = []
-                for row in rows:
-                    students.append({
-                        "prn": row[0],
-                        "class_id": row[1],
-                        "roll_no": row[2],
-                        "name": row[3],
-                        "email": row[4]
-                    })
+    STUDENT_COLUMNS = "s.prn_no, s.class_id, s.roll_no, s.name, s.email"
+    STUDENT_CURSOR = (int, str)  # roll_no, prn_no
+    ATTENDANCE_CURSOR = (datetime, int)  # timestamp, log_id
+    ATTENDANCE_COLUMNS = ("a.log_id, a.prn_no, a.subject_id, a.timestamp, a.status, "
+                          "a.camera_id, a.direction, a.confidence")
 
-                return students
+    @staticmethod
+    def encode_page_cursor(*values):
+        """Opaque keyset cursor for the last row of a page"""
+        raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
 
-    def get_attendance_logs(self):
-        """Fetch attendance logs"""
+    @staticmethod
+    def decode_page_cursor(cursor, types):
+        """Values of a keyset cursor, checked against `types` (datetime = ISO timestamp string)"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(types):
+                raise ValueError(f"expected a list of {len(types)} values")
+            for value, kind in zip(values, types):
+                if kind is datetime:
+                    datetime.fromisoformat(value)
+                elif isinstance(value, bool) or not isinstance(value, kind):
+                    raise ValueError(f"expected {kind.__name__}, got {value!r}")
+            return values
+        except (ValueError, TypeError, UnicodeError) as e:
+            raise ValueError(f"Invalid page cursor: {cursor}") from e
+
+    @staticmethod
+    def _student_row(row):
+        return {
+            "prn": row[0],
+            "class_id": row[1],
+            "roll_no": row[2],
+            "name": row[3],
+            "email": row[4]
+        }
+
+    @staticmethod
+    def _attendance_row(row):
+        return {
+            "log_id": row[0],
+            "prn": row[1],
+            "subject_id": row[2],
+            "timestamp": str(row[3]),
+            "status": row[4],
+            "camera_id": row[5],
+            "direction": row[6],
+            "confidence": row[7]
+        }
+
+    def _student_query(self, class_id=None, after=None, limit=None):
+        clauses, params = [], []
+        if class_id is not None:
+            clauses.append("s.class_id = %s")
+            params.append(class_id)
+        if after is not None:
+            clauses.append("(s.roll_no, s.prn_no) > (%s, %s)")
+            params.extend(after)
+        sql = f"SELECT {self.STUDENT_COLUMNS} FROM Students s"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY s.roll_no, s.prn_no"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return sql, params
+
+    def _attendance_query(self, start_date=None, end_date=None, subject_id=None,
+                          class_id=None, prn=None, after=None, limit=None):
+        """Build a filtered AttendanceLog query using range predicates only"""
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append("a.timestamp >= %s")
+            params.append(start_date)
+        if end_date is not None:
+            # end_date is inclusive
+            clauses.append("a.timestamp < %s::date + 1")
+            params.append(end_date)
+        if subject_id is not None:
+            clauses.append("a.subject_id = %s")
+            params.append(subject_id)
+        if prn is not None:
+            clauses.append("a.prn_no = %s")
+            params.append(prn)
+        if class_id is not None:
+            clauses.append("a.prn_no IN (SELECT prn_no FROM Students WHERE class_id = %s)")
+            params.append(class_id)
+        if after is not None:
+            clauses.append("(a.timestamp, a.log_id) < (%s::timestamp, %s)")
+            params.extend(after)
+        sql = f"SELECT {self.ATTENDANCE_COLUMNS} FROM AttendanceLog a"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY a.timestamp DESC, a.log_id DESC"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return sql, params
+
+    def _iter_server_side(self, name, sql, params, batch_size):
+        """Stream rows through a named (server-side) cursor, batch_size rows per fetch"""
         with self.get_connection() as conn:
+            with conn.cursor(name=f"{name}_stream") as cur:
+                cur.itersize = batch_size
+                start = time.perf_counter()
+                cur.execute(sql, params)
+                self._record_query_time(name, (time.perf_counter() - start) * 1000.0)
+                for row in cur:
+                    yield row
+
+    def iter_direction_events(self, since, batch_size=5000):
+        """Stream (prn, direction, camera_id, timestamp) of IN/OUT logs since a time, oldest first"""
+        sql = """
+            SELECT prn_no, direction, camera_id, timestamp
+            FROM AttendanceLog
+            WHERE timestamp >= %s AND direction IS NOT NULL
+            ORDER BY timestamp, log_id
+        """
+        return self._iter_server_side('iter_direction_events', sql, (since,), batch_size)
+
+    def get_student_classes(self):
+        """(prn, class_id) for every student, grouped by class"""
+        with self.get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT log_id, prn_no, subject_id, timestamp, status
-                    FROM AttendanceLog
-                    ORDER BY timestamp DESC
-                """)
+                self._timed_execute(cur, 'get_student_classes',
+                                    "SELECT prn_no, class_id FROM Students ORDER BY class_id, roll_no, prn_no")
+                return cur.fetchall()
+
+    def get_timetable_entries(self):
+        """(class_id, subject_id, day_of_week, start_time) for every timetable slot"""
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_timetable_entries',
+                                    "SELECT class_id, subject_id, day_of_week, start_time FROM Timetable")
+                return cur.fetchall()
 
+    def iter_first_marks(self, since, batch_size=5000):
+        """Stream (prn, subject_id, first timestamp) per student, subject and day since a date"""
+        sql = """
+            SELECT prn_no, subject_id, MIN(timestamp)
+            FROM AttendanceLog
+            WHERE timestamp >= %s AND subject_id IS NOT NULL
+            GROUP BY prn_no, subject_id, timestamp::date
+        """
+        return self._iter_server_side('iter_first_marks', sql, (since,), batch_size)
+
+    def get_all_students(self, class_id=None):
+        """Fetch all students"""
+        return list(self.iter_students(class_id=class_id))
+
+    def iter_students(self, class_id=None, cursor=None, batch_size=2000):
+        """Stream students in (roll_no, prn) order without loading them all"""
+        after = self.decode_page_cursor(cursor, self.STUDENT_CURSOR) if cursor else None
+        sql, params = self._student_query(class_id=class_id, after=after)
+        for row in self._iter_server_side('iter_students', sql, params, batch_size):
+            yield self._student_row(row)
+
+    def get_students_page(self, limit=100, cursor=None, class_id=None):
+        """One keyset page of students: {'items': [...], 'next_cursor': str | None}"""
+        after = self.decode_page_cursor(cursor, self.STUDENT_CURSOR) if cursor else None
+        sql, params = self._student_query(class_id=class_id, after=after, limit=limit)
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_students_page', sql, params)
                 rows = cur.fetchall()
 
-                logs = []
-                for row in rows:
-                    logs.append({
-                        "log_id": row[0],
-                        "prn": row[1],
-                        "subject_id": row[2],
-                        "timestamp": str(row[3]),
-                        "status": row[4]
-                    })
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = self.encode_page_cursor(rows[-1][2], rows[-1][0])
+        return {"items": [self._student_row(row) for row in rows], "next_cursor": next_cursor}
 
-                return logs
+    def get_attendance_logs(self, **filters):
+        """Fetch attendance logs"""
+        return list(self.iter_attendance_logs(**filters))
+
+    def iter_attendance_logs(self, start_date=None, end_date=None, subject_id=None,
+                             class_id=None, prn=None, cursor=None, batch_size=2000):
+        """Stream attendance logs, newest first, through a server-side cursor"""
+        after = self.decode_page_cursor(cursor, self.ATTENDANCE_CURSOR) if cursor else None
+        sql, params = self._attendance_query(start_date, end_date, subject_id, class_id, prn, after)
+        for row in self._iter_server_side('iter_attendance_logs', sql, params, batch_size):
+            yield self._attendance_row(row)
+
+    def get_attendance_page(self, limit=100, cursor=None, start_date=None, end_date=None,
+                            subject_id=None, class_id=None, prn=None):
+        """One keyset page of attendance logs: {'items': [...], 'next_cursor': str | None}"""
+        after = self.decode_page_cursor(cursor, self.ATTENDANCE_CURSOR) if cursor else None
+        sql, params = self._attendance_query(start_date, end_date, subject_id, class_id, prn,
+                                             after, limit)
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_attendance_page', sql, params)
+                rows = cur.fetchall()
+
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = self.encode_page_cursor(rows[-1][3], rows[-1][0])
+        return {"items": [self._attendance_row(row) for row in rows], "next_cursor": next_cursor}
 
     def get_dashboard_stats(self):
         """Get simple dashboard stats"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM Students")
-                total_students = cur.fetchone()[0]
-
-                cur.execute("""
-                    SELECT COUNT(DISTINCT prn_no)
-                    FROM AttendanceLog
-                    WHERE DATE(timestamp) = CURRENT_DATE
-                """)
-                present_today = cur.fetchone()[0]
+                self._execute_prepared(cur, 'dashboard_counts')
+                total_students, present_today = cur.fetchone()
 
             absent_today = total_students - present_today
 
@@ -207,6 +799,227 @@ class DatabaseManager:
                 "absent_today": absent_today
             }
     
+    @staticmethod
+    def _range_filter(column, start_date, end_date, is_timestamp):
+        """Inclusive [start_date, end_date] filter as sargable range predicates"""
+        clauses, params = ["TRUE"], []
+        if start_date is not None:
+            clauses.append(f"{column} >= %s")
+            params.append(start_date)
+        if end_date is not None:
+            clauses.append(f"{column} < %s::date + 1" if is_timestamp else f"{column} <= %s")
+            params.append(end_date)
+        return " AND ".join(clauses), params
+
+    def _live_start_date(self, start_date):
+        """Clamp a start date past archived months, whose raw rows no longer exist"""
+        archived = self.get_archived_months(start_date)
+        if not archived:
+            return start_date
+        first_live_day = next_month(archived[-1]["month"])
+        if start_date is None or _as_date(start_date) < first_live_day:
+            return first_live_day
+        return start_date
+
+    def backfill_attendance_rollups(self, start_date=None, end_date=None):
+        """Rebuild the daily rollups for [start_date, end_date] from the raw log.
+
+        Rollup writes from the trigger are blocked for the duration, so events
+        logged concurrently are neither lost nor double counted. Archived months
+        are skipped, since their rollups are the only summary left.
+        """
+        start_date = self._live_start_date(start_date)
+        raw_filter, raw_params = self._range_filter('timestamp', start_date, end_date, True)
+        day_filter, day_params = self._range_filter('day', start_date, end_date, False)
+        rollup_filter, rollup_params = self._range_filter('r.day', start_date, end_date, False)
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("LOCK TABLE AttendanceDailyRollup, ClassDailyRollup "
+                            "IN SHARE ROW EXCLUSIVE MODE")
+                cur.execute(f"DELETE FROM AttendanceDailyRollup WHERE {day_filter}", day_params)
+                cur.execute(f"DELETE FROM ClassDailyRollup WHERE {day_filter}", day_params)
+                self._timed_execute(cur, 'backfill_student_rollups', f"""
+                    INSERT INTO AttendanceDailyRollup
+                        (day, prn_no, subject_id, event_count, first_seen, last_seen)
+                    SELECT timestamp::date, prn_no, subject_id, COUNT(*), MIN(timestamp), MAX(timestamp)
+                    FROM AttendanceLog
+                    WHERE prn_no IS NOT NULL AND subject_id IS NOT NULL AND {raw_filter}
+                    GROUP BY 1, 2, 3
+                """, raw_params)
+                student_rows = cur.rowcount
+                self._timed_execute(cur, 'backfill_class_rollups', f"""
+                    INSERT INTO ClassDailyRollup (day, class_id, subject_id, present_count, event_count)
+                    SELECT r.day, s.class_id, r.subject_id, COUNT(*), SUM(r.event_count)
+                    FROM AttendanceDailyRollup r
+                    JOIN Students s ON s.prn_no = r.prn_no
+                    WHERE s.class_id IS NOT NULL AND {rollup_filter}
+                    GROUP BY 1, 2, 3
+                """, rollup_params)
+                class_rows = cur.rowcount
+
+        return {"student_rows": student_rows, "class_rows": class_rows}
+
+    def check_attendance_rollups(self, start_date=None, end_date=None, sample_limit=20):
+        """Compare the rollups with the raw log; returns mismatch counts and samples"""
+        start_date = self._live_start_date(start_date)
+        raw_filter, raw_params = self._range_filter('timestamp', start_date, end_date, True)
+        day_filter, day_params = self._range_filter('day', start_date, end_date, False)
+        rollup_filter, rollup_params = self._range_filter('r.day', start_date, end_date, False)
+
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'check_student_rollups', f"""
+                    WITH raw AS (
+                        SELECT timestamp::date AS day, prn_no, subject_id, COUNT(*) AS event_count
+                        FROM AttendanceLog
+                        WHERE prn_no IS NOT NULL AND subject_id IS NOT NULL AND {raw_filter}
+                        GROUP BY 1, 2, 3
+                    ), rolled AS (
+                        SELECT day, prn_no, subject_id, event_count
+                        FROM AttendanceDailyRollup WHERE {day_filter}
+                    )
+                    SELECT day, prn_no, subject_id, raw.event_count, rolled.event_count
+                    FROM raw FULL OUTER JOIN rolled USING (day, prn_no, subject_id)
+                    WHERE raw.event_count IS DISTINCT FROM rolled.event_count
+                    ORDER BY day, prn_no, subject_id
+                """, raw_params + day_params)
+                student_mismatches = cur.fetchall()
+
+                self._timed_execute(cur, 'check_class_rollups', f"""
+                    WITH expected AS (
+                        SELECT r.day, s.class_id, r.subject_id, COUNT(*) AS present_count
+                        FROM AttendanceDailyRollup r
+                        JOIN Students s ON s.prn_no = r.prn_no
+                        WHERE s.class_id IS NOT NULL AND {rollup_filter}
+                        GROUP BY 1, 2, 3
+                    ), rolled AS (
+                        SELECT day, class_id, subject_id, present_count
+                        FROM ClassDailyRollup WHERE {day_filter}
+                    )
+                    SELECT day, class_id, subject_id, expected.present_count, rolled.present_count
+                    FROM expected FULL OUTER JOIN rolled USING (day, class_id, subject_id)
+                    WHERE expected.present_count IS DISTINCT FROM rolled.present_count
+                    ORDER BY day, class_id, subject_id
+                """, rollup_params + day_params)
+                class_mismatches = cur.fetchall()
+
+        return {
+            "student_mismatches": len(student_mismatches),
+            "class_mismatches": len(class_mismatches),
+            "student_samples": [
+                {"day": str(r[0]), "prn": r[1], "subject_id": r[2], "raw_events": r[3], "rollup_events": r[4]}
+                for r in student_mismatches[:sample_limit]
+            ],
+            "class_samples": [
+                {"day": str(r[0]), "class_id": r[1], "subject_id": r[2], "expected": r[3], "rollup": r[4]}
+                for r in class_mismatches[:sample_limit]
+            ],
+        }
+
+    def get_class_daily_attendance(self, day=None, class_id=None):
+        """Present counts per class and subject for one day, from the rollups"""
+        clauses, params = ["c.day = COALESCE(%s, CURRENT_DATE)"], [day]
+        if class_id is not None:
+            clauses.append("c.class_id = %s")
+            params.append(class_id)
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_class_daily_attendance', f"""
+                    SELECT c.day, c.class_id, c.subject_id, c.present_count,
+                           (SELECT COUNT(*) FROM Students s WHERE s.class_id = c.class_id)
+                    FROM ClassDailyRollup c
+                    WHERE {" AND ".join(clauses)}
+                    ORDER BY c.class_id, c.subject_id
+                """, params)
+                rows = cur.fetchall()
+        return [
+            {"day": str(r[0]), "class_id": r[1], "subject_id": r[2],
+             "present": r[3], "enrolled": r[4], "absent": max(0, r[4] - r[3])}
+            for r in rows
+        ]
+
+    def get_student_attendance_summary(self, prn_no, start_date=None, end_date=None):
+        """Days attended per subject for one student, from the rollups"""
+        day_filter, params = self._range_filter('day', start_date, end_date, False)
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_student_attendance_summary', f"""
+                    SELECT subject_id, COUNT(*), SUM(event_count), MIN(day), MAX(day)
+                    FROM AttendanceDailyRollup
+                    WHERE prn_no = %s AND {day_filter}
+                    GROUP BY subject_id
+                    ORDER BY subject_id
+                """, [prn_no] + params)
+                rows = cur.fetchall()
+        return [
+            {"subject_id": r[0], "days_present": r[1], "events": r[2],
+             "first_day": str(r[3]), "last_day": str(r[4])}
+            for r in rows
+        ]
+
+    def get_archived_months(self, start_date=None, end_date=None):
+        """Archived months overlapping [start_date, end_date], oldest first"""
+        clauses, params = ["TRUE"], []
+        if start_date is not None:
+            clauses.append("month >= date_trunc('month', %s::date)")
+            params.append(start_date)
+        if end_date is not None:
+            clauses.append("month <= %s")
+            params.append(end_date)
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'get_archived_months', f"""
+                    SELECT month, file_path, file_format, row_count, file_bytes
+                    FROM AttendanceArchive
+                    WHERE {" AND ".join(clauses)}
+                    ORDER BY month
+                """, params)
+                rows = cur.fetchall()
+        return [
+            {"month": r[0], "file_path": r[1], "file_format": r[2], "row_count": r[3], "file_bytes": r[4]}
+            for r in rows
+        ]
+
+    def iter_historical_attendance(self, start_date=None, end_date=None, subject_id=None,
+                                   class_id=None, prn=None):
+        """Attendance logs newest first across the live table and archived months.
+
+        Archived rows are removed from AttendanceLog, so the two sources never
+        overlap; live rows come first because they are newer (late rows for an
+        archived month stay live until the next archive run merges them).
+        """
+        yield from self.iter_attendance_logs(start_date=start_date, end_date=end_date,
+                                             subject_id=subject_id, class_id=class_id, prn=prn)
+
+        archived = self.get_archived_months(start_date, end_date)
+        if not archived:
+            return
+
+        prns = None
+        if prn is not None:
+            prns = {prn}
+        if class_id is not None:
+            class_prns = {student["prn"] for student in self.iter_students(class_id=class_id)}
+            prns = class_prns if prns is None else prns & class_prns
+
+        for entry in reversed(archived):
+            yield from self.archive.iter_rows(entry["file_path"], start_date, end_date,
+                                              subject_id=subject_id, prns=prns)
+
+    def ping(self):
+        """Round-trip a trivial query; returns the latency in ms (including the pool checkout)"""
+        start = time.perf_counter()
+        with self.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                self._timed_execute(cur, 'ping', "SELECT 1")
+                cur.fetchone()
+        return (time.perf_counter() - start) * 1000.0
+
+    def get_pool_stats(self):
+        """Connection pool usage: in-use, waits and exhaustion counts"""
+        return self.connection_pool.stats()
+
     def close(self):
         """Close all connections in the pool"""
         self.connection_pool.closeall()
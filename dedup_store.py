@@ -0,0 +1,208 @@
+# dedup_store.py
+"""
+Bounded, thread-safe cooldown store for attendance deduplication
+
+check_and_set(key) answers "may this key fire now?" and, if so, starts its
+cooldown in the same step, so two cameras that see the same student at once
+cannot both log. Entries expire from a min-heap of (expiry, key); stale heap
+entries left behind by a refresh are skipped lazily and the heap is rebuilt
+when they pile up. When max_entries is reached the entries closest to
+expiry are dropped first.
+
+State can outlive the process in two ways:
+- snapshot_path: unexpired entries are merged into a JSON file every
+  snapshot_interval_s and on close(), and loaded on start, so a restarted
+  kiosk does not re-mark everyone. Processes pointing at the same file
+  pick up each other's entries at the next snapshot. A discarded key leaves
+  a tombstone until its old expiry, so the merge does not bring it back.
+- redis_url: a Redis server (or any server speaking its protocol) holds the
+  authoritative cooldowns with SET NX EX, shared by every camera and process.
+  Needs the optional `redis` package; without it the store stays local.
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+
+
+class CooldownStore:
+    def __init__(self, ttl=300, max_entries=100000, snapshot_path=None, snapshot_interval_s=30.0,
+                 redis_url=None, namespace='attendance:cooldown:'):
+        self.ttl = float(ttl)
+        self.max_entries = int(max_entries)
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval_s = float(snapshot_interval_s)
+        self.namespace = namespace
+        self.expiries = {}  # key -> expiry (epoch seconds)
+        self.heap = []  # (expiry, key); may hold stale entries for refreshed keys
+        self.discarded = {}  # key -> expiry it had when discarded; older snapshot entries are ignored
+        self.lock = threading.Lock()
+        self.snapshot_lock = threading.Lock()
+        self.dirty = False
+        self.last_snapshot = time.time()
+        self.stats = {'allowed': 0, 'suppressed': 0, 'expired': 0, 'evicted': 0,
+                      'snapshots': 0, 'redis_errors': 0}
+        self.redis = self._connect_redis(redis_url) if redis_url else None
+        if snapshot_path:
+            self.load_snapshot()
+
+    @classmethod
+    def from_config(cls, config, **overrides):
+        settings = {key: config[key] for key in ('max_entries', 'snapshot_path', 'snapshot_interval_s',
+                                                 'redis_url') if key in config}
+        settings.update(overrides)
+        return cls(**settings)
+
+    @staticmethod
+    def _connect_redis(url):
+        try:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.5)
+            client.ping()
+            print(f"✓ Cooldown store using Redis at {url}")
+            return client
+        except Exception as e:
+            print(f"⚠ Redis cooldown store unavailable ({e}); using local cooldowns")
+            return None
+
+    def __len__(self):
+        return len(self.expiries)
+
+    def _expire(self, now):
+        heap, expiries = self.heap, self.expiries
+        while heap and heap[0][0] <= now:
+            expiry, key = heapq.heappop(heap)
+            if expiries.get(key) == expiry:
+                del expiries[key]
+                self.stats['expired'] += 1
+
+    def _store(self, key, expiry):
+        self.expiries[key] = expiry
+        heapq.heappush(self.heap, (expiry, key))
+        self.dirty = True
+        while len(self.expiries) > self.max_entries:
+            old_expiry, old_key = heapq.heappop(self.heap)
+            if self.expiries.get(old_key) == old_expiry:
+                del self.expiries[old_key]
+                self.stats['evicted'] += 1
+        if len(self.heap) > 2 * len(self.expiries) + 1024:
+            self.heap = [(expiry, key) for key, expiry in self.expiries.items()]
+            heapq.heapify(self.heap)
+
+    def check_and_set(self, key, now=None, ttl=None):
+        """True if key is not cooling down (and start its cooldown), False to suppress it"""
+        now = time.time() if now is None else now
+        ttl = self.ttl if ttl is None else float(ttl)
+        with self.lock:
+            self._expire(now)
+            if key in self.expiries:
+                self.stats['suppressed'] += 1
+                return False
+
+        allowed, expiry = True, now + ttl
+        if self.redis is not None:
+            allowed, expiry = self._redis_check_and_set(key, now, ttl)
+
+        with self.lock:
+            if key in self.expiries:  # another thread claimed it meanwhile
+                allowed = False
+            else:
+                self._store(key, expiry)
+            self.stats['allowed' if allowed else 'suppressed'] += 1
+        self.maybe_snapshot(now)
+        return allowed
+
+    def _redis_check_and_set(self, key, now, ttl):
+        name = self.namespace + key
+        try:
+            if self.redis.set(name, now, nx=True, px=max(1, int(ttl * 1000))):
+                return True, now + ttl
+            remaining_ms = self.redis.pttl(name)
+            return False, now + (remaining_ms / 1000.0 if remaining_ms and remaining_ms > 0 else ttl)
+        except Exception:
+            with self.lock:
+                self.stats['redis_errors'] += 1
+            return True, now + ttl
+
+    def discard(self, key):
+        """Cancel a cooldown, e.g. when the attendance write it guarded failed"""
+        with self.lock:
+            expiry = self.expiries.pop(key, None)
+            if expiry is not None:
+                self.discarded[key] = max(expiry, self.discarded.get(key, 0.0))
+                self.dirty = True
+        if self.redis is not None:
+            try:
+                self.redis.delete(self.namespace + key)
+            except Exception:
+                with self.lock:
+                    self.stats['redis_errors'] += 1
+
+    def remaining(self, key, now=None):
+        """Seconds left on key's cooldown, 0 when it may fire"""
+        now = time.time() if now is None else now
+        with self.lock:
+            return max(0.0, self.expiries.get(key, now) - now)
+
+    def load_snapshot(self, now=None):
+        now = time.time() if now is None else now
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as fh:
+                entries = json.load(fh)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"⚠ Ignoring unreadable cooldown snapshot {self.snapshot_path}: {e}")
+            return 0
+
+        loaded = 0
+        with self.lock:
+            for key, expiry in entries.items():
+                if expiry <= self.discarded.get(key, 0.0):
+                    continue  # the cooldown discarded here, still in the file
+                if expiry > now and expiry > self.expiries.get(key, 0.0):
+                    self.expiries[key] = float(expiry)
+                    heapq.heappush(self.heap, (float(expiry), key))
+                    loaded += 1
+        return loaded
+
+    def maybe_snapshot(self, now=None):
+        now = time.time() if now is None else now
+        if self.snapshot_path and self.dirty and now - self.last_snapshot >= self.snapshot_interval_s:
+            self.snapshot(now)
+
+    def snapshot(self, now=None):
+        """Merge unexpired entries with the snapshot file and replace it atomically"""
+        if not self.snapshot_path:
+            return
+        now = time.time() if now is None else now
+        if not self.snapshot_lock.acquire(blocking=False):
+            return  # another thread is already writing one
+        try:
+            self.load_snapshot(now)  # pick up cooldowns written by other processes
+            with self.lock:
+                self._expire(now)
+                self.discarded = {key: expiry for key, expiry in self.discarded.items() if expiry > now}
+                entries = dict(self.expiries)
+                self.dirty = False
+                self.last_snapshot = now
+            temp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as fh:
+                json.dump(entries, fh, separators=(',', ':'))
+            os.replace(temp_path, self.snapshot_path)
+            with self.lock:
+                self.stats['snapshots'] += 1
+        except OSError as e:
+            print(f"⚠ Could not write cooldown snapshot: {e}")
+        finally:
+            self.snapshot_lock.release()
+
+    def close(self):
+        self.snapshot()
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.expiries), heap=len(self.heap),
+                        ttl_s=self.ttl, backend='redis' if self.redis is not None else 'local')
@@ -0,0 +1,97 @@
+# event_bus.py
+"""
+Fan-out of live recognition events to WebSocket subscribers
+
+Publishers (camera threads) encode each event once and hand it to the
+event loop with a single call_soon_threadsafe; they never wait on viewers.
+Every subscriber owns a small bounded queue that drops its oldest event
+when the viewer falls behind, so a slow client only loses stale frames.
+"""
+
+import asyncio
+import json
+import threading
+from collections import deque
+
+
+def encode_event(event):
+    """Compact JSON text for an event dict (no whitespace, encoded once per event)"""
+    return json.dumps(event, separators=(",", ":"))
+
+
+class Subscription:
+    def __init__(self, camera_id=None, queue_size=8):
+        self.camera_id = camera_id  # None = every camera
+        self.queue = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+
+    def push(self, payload):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(payload)
+        self.ready.set()
+
+    async def get(self):
+        """Wait for the next (newest surviving) encoded event"""
+        while not self.queue:
+            self.ready.clear()
+            await self.ready.wait()
+        self.delivered += 1
+        return self.queue.popleft()
+
+
+class EventBus:
+    def __init__(self, queue_size=8):
+        self.queue_size = queue_size
+        self.loop = None
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        # delivered/dropped hold the totals of subscribers that have already left
+        self.stats = {'published': 0, 'skipped': 0, 'delivered': 0, 'dropped': 0}
+
+    def bind_loop(self, loop):
+        """Deliver events on this asyncio loop (call once at application startup)"""
+        self.loop = loop
+
+    def subscribe(self, camera_id=None):
+        subscription = Subscription(camera_id, self.queue_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscribers:
+            self.subscribers.discard(subscription)
+            with self.lock:
+                self.stats['delivered'] += subscription.delivered
+                self.stats['dropped'] += subscription.dropped
+
+    def publish(self, event):
+        """Publish an event dict from any thread; returns immediately"""
+        if self.loop is None or not self.subscribers:
+            with self.lock:
+                self.stats['skipped'] += 1
+            return
+        payload = encode_event(event)
+        with self.lock:
+            self.stats['published'] += 1
+        try:
+            self.loop.call_soon_threadsafe(self._fan_out, event.get('cam'), payload)
+        except RuntimeError:  # loop closed during shutdown
+            pass
+
+    def _fan_out(self, camera_id, payload):
+        for subscription in list(self.subscribers):
+            if subscription.camera_id is None or subscription.camera_id == camera_id:
+                subscription.push(payload)
+
+    def get_stats(self):
+        """Counters since startup (delivered/dropped never go down when viewers leave)"""
+        subscribers = list(self.subscribers)
+        with self.lock:
+            stats = dict(self.stats)
+        stats['subscribers'] = len(subscribers)
+        stats['delivered'] += sum(s.delivered for s in subscribers)
+        stats['dropped'] += sum(s.dropped for s in subscribers)
+        return stats
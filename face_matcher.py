@@ -0,0 +1,151 @@
+# face_matcher.py
+"""
+In-memory embedding gallery used by the face recognition engine
+
+Each identity (PRN) keeps up to `max_templates` embeddings. Template rows are
+stored grouped by identity so a frame is scored with one matrix product and
+a segmented per-identity reduction (max, or mean of the top-k templates).
+"""
+
+import numpy as np
+
+
+def normalize_embedding(embedding):
+    """Return an L2-normalized float32 copy of an embedding"""
+    embedding = np.asarray(embedding, dtype=np.float32).flatten()
+    norm = np.linalg.norm(embedding)
+    if norm == 0:
+        return embedding
+    return (embedding / norm).astype(np.float32)
+
+
+def distance_to_confidence(distance):
+    """Map an L2 distance between unit vectors to the 0-100 confidence shown in the UI"""
+    return max(0.0, min(100.0, (1.2 - distance) / 1.2 * 100))
+
+
+def select_diverse_templates(embeddings, max_templates):
+    """Pick up to max_templates rows that cover the identity's appearance.
+
+    Starts from the template closest to the mean and then repeatedly adds the
+    one farthest from everything already chosen (farthest-point sampling), so
+    near-duplicate photos are dropped first. Stops early once only duplicates
+    of chosen rows are left. Returns sorted row indices.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if len(embeddings) <= max_templates:
+        return np.arange(len(embeddings))
+
+    centre = embeddings.mean(axis=0)
+    chosen = [int(np.argmax(embeddings @ centre))]
+    closest = 1.0 - embeddings @ embeddings[chosen[0]]  # cosine distance to the chosen set
+    closest[chosen[0]] = -np.inf
+    while len(chosen) < max_templates:
+        candidate = int(np.argmax(closest))
+        if closest[candidate] <= 1e-6:
+            break
+        chosen.append(candidate)
+        closest = np.minimum(closest, 1.0 - embeddings @ embeddings[candidate])
+        closest[candidate] = -np.inf
+    return np.sort(np.asarray(chosen))
+
+
+class InMemoryMatcher:
+    def __init__(self, tolerance=0.8, max_templates=5, aggregate='max', top_k=2):
+        if aggregate not in ('max', 'topk_mean'):
+            raise ValueError(f"Unknown template aggregate: {aggregate}")
+        self.tolerance = float(tolerance)
+        self.max_templates = max(1, int(max_templates))
+        self.aggregate = aggregate
+        self.top_k = max(1, int(top_k))
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)  # template rows grouped by identity
+        self.prns = []  # one entry per identity
+        self.offsets = np.zeros(0, dtype=np.int64)  # first template row of each identity
+        self.counts = np.zeros(0, dtype=np.int64)  # templates per identity
+
+    def __len__(self):
+        return len(self.prns)
+
+    @property
+    def template_count(self):
+        return len(self.embeddings)
+
+    def _set_templates(self, embeddings, prns, counts):
+        self.embeddings = embeddings
+        self.prns = list(prns)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)[:-1])).astype(np.int64) \
+            if len(self.counts) else np.zeros(0, dtype=np.int64)
+
+    def load(self, encodings, prns):
+        """Replace the gallery; repeated PRNs become extra templates of one identity"""
+        grouped = {}
+        for encoding, prn in zip(encodings, prns):
+            grouped.setdefault(prn, []).append(normalize_embedding(encoding))
+
+        rows, identities, counts = [], [], []
+        for prn, templates in grouped.items():
+            templates = np.vstack(templates)
+            templates = templates[select_diverse_templates(templates, self.max_templates)]
+            rows.append(templates)
+            identities.append(prn)
+            counts.append(len(templates))
+
+        embeddings = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        self._set_templates(embeddings, identities, counts)
+
+    def subset(self, indices):
+        """Return a matcher over the given identities (e.g. one class shard)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        matcher = InMemoryMatcher(self.tolerance, self.max_templates, self.aggregate, self.top_k)
+        if len(indices):
+            rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i] + self.counts[i])
+                                   for i in indices])
+            matcher._set_templates(self.embeddings[rows], [self.prns[i] for i in indices],
+                                   self.counts[indices])
+        return matcher
+
+    def _identity_scores(self, similarities):
+        """Reduce [queries, template rows] similarities to [queries, identities]"""
+        if self.aggregate == 'max' or self.top_k == 1:
+            return np.maximum.reduceat(similarities, self.offsets, axis=1)
+
+        # Scatter into a dense [queries, identities, max templates] block padded with -inf
+        width = int(self.counts.max())
+        identity_of_row = np.repeat(np.arange(len(self.counts)), self.counts)
+        slot_of_row = np.arange(len(identity_of_row)) - np.repeat(self.offsets, self.counts)
+        dense = np.full((len(similarities), len(self.counts), width), -np.inf, dtype=np.float32)
+        dense[:, identity_of_row, slot_of_row] = similarities
+
+        k = min(self.top_k, width)
+        top = -np.partition(-dense, k - 1, axis=2)[:, :, :k]
+        valid = np.isfinite(top)
+        return np.where(valid, top, 0.0).sum(axis=2) / np.maximum(valid.sum(axis=2), 1)
+
+    def match(self, face_encodings):
+        """Match a batch of encodings against the gallery.
+
+        Returns a list of (prn or None, confidence) in input order.
+        """
+        if len(face_encodings) == 0:
+            return []
+        if len(self.prns) == 0:
+            return [(None, 0.0) for _ in face_encodings]
+
+        queries = np.vstack([normalize_embedding(encoding) for encoding in face_encodings])
+
+        # For unit vectors ||a - b||^2 = 2 - 2 a.b, so one matrix product covers every face
+        scores = self._identity_scores(queries @ self.embeddings.T)
+        best_idx = np.argmax(scores, axis=1)
+        best_sim = scores[np.arange(len(queries)), best_idx]
+        best_dist = np.sqrt(np.clip(2.0 - 2.0 * best_sim, 0.0, None))
+
+        results = []
+        for idx, dist in zip(best_idx, best_dist):
+            dist = float(dist)
+            confidence = distance_to_confidence(dist)
+            if dist <= self.tolerance:
+                results.append((self.prns[int(idx)], confidence))
+            else:
+                results.append((None, confidence))
+        return results
@@ -1,22 +1,40 @@
 # face_recognition_engine.py - YOLOv8 + InsightFace Version
+import time
 import cv2
 import numpy as np
 from threading import Lock
 from ultralytics import YOLO
 from insightface import app
-import time
-from collections import defaultdict
+from insightface.utils import face_align
+from face_matcher import InMemoryMatcher, normalize_embedding
+from dedup_store import CooldownStore
+from perf_trace import traced, tracer
+from inference_runtime import (
+    apply_thread_limits, needs_custom_sessions, rebuild_sessions, select_providers, session_providers,
+)
 
 class FaceRecognitionEngine:
     def __init__(self, config):
         self.config = config
-        self.known_embeddings = []
-        self.known_prns = []
+        self.gallery = InMemoryMatcher(
+            config.get('recognition_tolerance', 0.8),
+            max_templates=config.get('max_templates', 5),
+            aggregate=config.get('template_aggregate', 'max'),
+            top_k=config.get('template_top_k', 2),
+        )
+        self.database_matcher = None  # DatabaseManager when matcher == 'pgvector'
+        self.shard_members = {}  # class_id -> gallery identity indices
+        self.active_class_ids = ()
+        self.active_gallery = None  # union of the active class shards, None = whole gallery
+        self.shard_stats = {'shard_matches': 0, 'fallback_matches': 0, 'unmatched': 0}
+        self.recognition_stats = {'faces': 0, 'matched': 0}
         self.lock = Lock()
         self.face_analyzer = None
         self.yolo_detector = None
-        self.last_detection = defaultdict(float)  # prn -> timestamp for deduplication
+        self.detection_cooldowns = CooldownStore(ttl=int(config.get('detection_cooldown', 300)))
         self.camera_directions = {}  # camera_id -> direction (IN/OUT/BOTH)
+        self.runtime = config.get('runtime', {})
+        self.threads = apply_thread_limits(self.runtime)  # before any model spins up its thread pools
 
         self._initialize_face_analyzer()
         self._initialize_yolo_detector()
@@ -24,16 +42,22 @@ class FaceRecognitionEngine:
 
     def _initialize_face_analyzer(self):
         model_name = self.config.get('insightface_model', 'buffalo_l')
+        providers = select_providers(self.runtime)
         self.face_analyzer = app.FaceAnalysis(
             name=model_name,
-            allowed_modules=['detection', 'recognition']
+            allowed_modules=['detection', 'recognition'],
+            **({'providers': providers} if providers else {})
         )
+        if needs_custom_sessions(self.runtime):
+            rebuild_sessions(self.face_analyzer, self.runtime, providers)
         self.face_analyzer.prepare(
-            ctx_id=0,
+            ctx_id=int(self.runtime.get('ctx_id', 0)),
             det_thresh=self.config.get('det_thresh', 0.5),
             det_size=tuple(self.config.get('det_size', (640, 640)))
         )
-        print(f"✓ InsightFace model loaded: {model_name}")
+        print(f"✓ InsightFace model loaded: {model_name} "
+              f"(providers: {', '.join(session_providers(self.face_analyzer).get('detection', []))}, "
+              f"intra-op threads: {self.threads['intra_op'] or 'auto'})")
 
     def _initialize_yolo_detector(self):
         if not self.config.get('use_yolo', False):
@@ -47,21 +71,81 @@ class FaceRecognitionEngine:
             print(f"⚠ Failed to load YOLO model '{model_path}': {exc}")
             self.yolo_detector = None
 
-    def load_known_faces(self, encodings, prns):
+    def apply_detection_settings(self, **settings):
+        """Change det_size, det_thresh, detection_scale, use_yolo, yolo_confidence or
+        recognition_tolerance at runtime; models are only re-prepared when their settings change.
+        """
+        changed = {key for key, value in settings.items() if self.config.get(key) != value}
+        self.config = dict(self.config, **settings)
+        if changed & {'det_size', 'det_thresh'}:
+            self.face_analyzer.prepare(
+                ctx_id=int(self.runtime.get('ctx_id', 0)),
+                det_thresh=self.config.get('det_thresh', 0.5),
+                det_size=tuple(self.config.get('det_size', (640, 640)))
+            )
+        if 'use_yolo' in changed:
+            self.yolo_detector = None
+            self._initialize_yolo_detector()
+        if 'recognition_tolerance' in changed:
+            with self.lock:
+                self.gallery.tolerance = float(self.config['recognition_tolerance'])
+                if self.active_gallery is not None:
+                    self.active_gallery.tolerance = self.gallery.tolerance
+
+    @property
+    def uses_database_matcher(self):
+        return self.config.get('matcher', 'memory') == 'pgvector'
+
+    def load_known_faces(self, encodings, prns, class_ids=None):
+        """Load the global gallery; with class_ids also split it into per-class shards.
+
+        Rows sharing a PRN become templates of one identity (capped at max_templates).
+        """
+        class_of_prn = dict(zip(prns, class_ids)) if class_ids is not None else {}
+
         with self.lock:
-            normalized_embeddings = []
-            for encoding in encodings:
-                embedding = np.asarray(encoding, dtype=np.float32).flatten()
-                normalized_embeddings.append(self._normalize_embedding(embedding))
-            self.known_embeddings = normalized_embeddings
-            self.known_prns = list(prns)
-        print(f"✓ Loaded {len(self.known_prns)} known face embeddings")
+            self.gallery.load(encodings, prns)
+            shard_members = {}
+            if class_ids is not None:
+                for index, prn in enumerate(self.gallery.prns):
+                    shard_members.setdefault(class_of_prn[prn], []).append(index)
+            self.shard_members = {class_id: np.asarray(rows, dtype=np.int64)
+                                  for class_id, rows in shard_members.items()}
+            self.active_gallery = self._build_active_gallery(self.active_class_ids)
+        print(f"✓ Loaded {len(self.gallery)} known faces ({self.gallery.template_count} templates)"
+              + (f" in {len(self.shard_members)} class shards" if self.shard_members else ""))
+
+    def _build_active_gallery(self, class_ids):
+        rows = [self.shard_members[class_id] for class_id in class_ids if class_id in self.shard_members]
+        if not rows:
+            return None
+        return self.gallery.subset(np.concatenate(rows))
+
+    def activate_shards(self, class_ids):
+        """Search only these classes first; pass None or () to search the whole gallery.
+
+        The shard gallery is built here so it is ready before the session starts.
+        """
+        class_ids = tuple(class_ids or ())
+        with self.lock:
+            active_gallery = self._build_active_gallery(class_ids)
+            self.active_class_ids = class_ids
+            self.active_gallery = active_gallery
+        if active_gallery is None:
+            print("✓ Matching against the full gallery")
+        else:
+            print(f"✓ Activated {len(class_ids)} class shard(s): "
+                  f"{len(active_gallery)} of {len(self.gallery)} known faces")
+
+    def attach_database_matcher(self, db_manager):
+        """Match against the server-side pgvector index instead of an in-memory gallery."""
+        if not db_manager.vector_search_enabled:
+            raise RuntimeError("pgvector search is not available on this database")
+        self.database_matcher = db_manager
+        print("✓ Using pgvector server-side matcher")
 
     def _normalize_embedding(self, embedding):
-        norm = np.linalg.norm(embedding)
-        if norm == 0:
-            return embedding.astype(np.float32)
-        return (embedding / norm).astype(np.float32)
+        return normalize_embedding(embedding)
 
     def detect_and_encode_face(self, frame, for_registration=False):
         scale = float(self.config.get('detection_scale', 1.0))
@@ -82,7 +166,8 @@ class FaceRecognitionEngine:
                     ]
                 return face_locations, face_encodings
 
-        faces = self.face_analyzer.get(detection_frame)
+        with tracer.stage('insightface'):
+            faces = self.face_analyzer.get(detection_frame)
         for face in faces:
             bbox = getattr(face, 'bbox', None)
             embedding = getattr(face, 'embedding', None)
@@ -102,6 +187,123 @@ class FaceRecognitionEngine:
 
         return face_locations, face_encodings
 
+    def _split_models(self):
+        """(detection model, recognition model), either None when the pack does not expose it"""
+        det_model = getattr(self.face_analyzer, 'det_model', None)
+        rec_model = getattr(self.face_analyzer, 'models', {}).get('recognition')
+        return det_model, rec_model
+
+    @property
+    def supports_aligned_batches(self):
+        return None not in self._split_models()
+
+    @traced('detect')
+    def detect_aligned_faces(self, frame):
+        """Detect faces and return [(location, aligned crop)] for embed_aligned_faces"""
+        det_model, rec_model = self._split_models()
+        scale = float(self.config.get('detection_scale', 1.0))
+        detection_frame = frame
+        if scale != 1.0:
+            detection_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+
+        faces = []
+        bboxes, kpss = det_model.detect(detection_frame, max_num=0, metric='default')
+        if kpss is not None:
+            for bbox, kps in zip(bboxes, kpss):
+                x1, y1, x2, y2 = [int(v / scale) for v in bbox[:4]]
+                # Align on the full-resolution frame for the best embedding
+                crop = face_align.norm_crop(frame, landmark=kps / scale, image_size=rec_model.input_size[0])
+                faces.append(((y1, x2, y2, x1), crop))
+        return faces
+
+    @traced('embed')
+    def embed_aligned_faces(self, crops):
+        """Embed aligned crops in one forward pass; returns normalized rows"""
+        _, rec_model = self._split_models()
+        if not len(crops):
+            return np.empty((0, 0), dtype=np.float32)
+        features = np.asarray(rec_model.get_feat(list(crops)), dtype=np.float32)
+        return features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+
+    def model_status(self):
+        """Which models are loaded, for readiness checks"""
+        det_model, rec_model = self._split_models()
+        return {
+            'face_analyzer': self.face_analyzer is not None,
+            'detection': det_model is not None or self.face_analyzer is not None,
+            'recognition': rec_model is not None or self.face_analyzer is not None,
+            'yolo': self.yolo_detector is not None if self.config.get('use_yolo', False) else None,
+            'providers': session_providers(self.face_analyzer),
+        }
+
+    def run_probe(self, frame):
+        """Time one detection and embedding pass over frame.
+
+        When no face is found a centre crop is embedded anyway, so both
+        models always run.
+        """
+        start = time.perf_counter()
+        if self.supports_aligned_batches:
+            detections = self.detect_aligned_faces(frame)
+            detected = time.perf_counter()
+            crops = [crop for _, crop in detections]
+            if not crops:
+                height, width = frame.shape[:2]
+                side = min(height, width)
+                top, left = (height - side) // 2, (width - side) // 2
+                crops = [cv2.resize(frame[top:top + side, left:left + side], (112, 112))]
+            self.embed_aligned_faces(crops)
+            faces = len(detections)
+        else:
+            locations, _ = self.detect_and_encode_face(frame)
+            detected = time.perf_counter()
+            faces = len(locations)
+        end = time.perf_counter()
+        return {'faces': faces, 'detect_ms': (detected - start) * 1000.0,
+                'embed_ms': (end - detected) * 1000.0, 'total_ms': (end - start) * 1000.0}
+
+    def detect_and_encode_batch(self, frames):
+        """Detect faces in several frames and embed every aligned crop in one batch.
+
+        Returns a (face_locations, face_encodings) pair per frame. Falls back to
+        detect_and_encode_face per frame when YOLO is enabled (so batches detect
+        exactly like the kiosk and camera workers) or when the model pack does
+        not expose separate detection and recognition models.
+        """
+        if self.yolo_detector is not None or not self.supports_aligned_batches:
+            return [self.detect_and_encode_face(frame) for frame in frames]
+
+        crops, owners, locations = [], [], []
+        for index, frame in enumerate(frames):
+            faces = self.detect_aligned_faces(frame)
+            locations.append([location for location, _ in faces])
+            crops.extend(crop for _, crop in faces)
+            owners.extend([index] * len(faces))
+
+        encodings = [[] for _ in frames]
+        for owner, feature in zip(owners, self.embed_aligned_faces(crops)):
+            encodings[owner].append(feature)
+        return list(zip(locations, encodings))
+
+    def recognize_batch(self, frames):
+        """Detect, embed and match the faces of several frames with one matcher call.
+
+        Returns, per frame, a list of {box, prn, confidence} dicts (box is top, right, bottom, left).
+        """
+        detections = self.detect_and_encode_batch(frames)
+        matches = iter(self.recognize_faces([encoding for _, encodings in detections
+                                             for encoding in encodings]))
+        results = []
+        for face_locations, face_encodings in detections:
+            faces = []
+            for location, _ in zip(face_locations, face_encodings):
+                prn, confidence = next(matches)
+                faces.append({"box": [int(v) for v in location], "prn": prn,
+                              "confidence": round(float(confidence), 2)})
+            results.append(faces)
+        return results
+
+    @traced('yolo')
     def _detect_with_yolo(self, frame):
         face_locations = []
         face_encodings = []
@@ -154,30 +356,38 @@ class FaceRecognitionEngine:
 
         return face_locations, face_encodings
 
+    @traced('match')
     def recognize_faces(self, face_encodings):
-        results = []
+        results = self._match_faces(face_encodings)
+        matched = sum(1 for prn, _ in results if prn is not None)
         with self.lock:
-            if len(self.known_embeddings) == 0:
-                return [(None, 0.0) for _ in face_encodings]
+            self.recognition_stats['faces'] += len(results)
+            self.recognition_stats['matched'] += matched
+        return results
 
-            known_stack = np.vstack(self.known_embeddings)
+    def _match_faces(self, face_encodings):
+        if self.database_matcher is not None:
             threshold = float(self.config.get('recognition_tolerance', 0.8))
+            return self.database_matcher.match_face_embeddings(face_encodings, threshold)
 
-            for face_encoding in face_encodings:
-                query = self._normalize_embedding(np.asarray(face_encoding, dtype=np.float32))
-                distances = np.linalg.norm(known_stack - query, axis=1)
-                best_idx = int(np.argmin(distances))
-                best_dist = float(distances[best_idx])
-
-                confidence = max(0.0, min(100.0, (1.2 - best_dist) / 1.2 * 100))
-                if best_dist <= threshold:
-                    prn = self.known_prns[best_idx]
-                    results.append((prn, confidence))
-                else:
-                    results.append((None, confidence))
-
-        return results
-
+        with self.lock:
+            if self.active_gallery is None:
+                return self.gallery.match(face_encodings)
+
+            results = self.active_gallery.match(face_encodings)
+            misses = [i for i, (prn, _) in enumerate(results) if prn is None]
+            if misses and self.config.get('shard_fallback', True):
+                # Visitors from other classes are still recognized through the global gallery
+                fallback = self.gallery.match([face_encodings[i] for i in misses])
+                for i, result in zip(misses, fallback):
+                    if result[0] is not None:
+                        results[i] = result
+                        self.shard_stats['fallback_matches'] += 1
+            self.shard_stats['shard_matches'] += len(results) - len(misses)
+            self.shard_stats['unmatched'] += sum(1 for prn, _ in results if prn is None)
+            return results
+
+    @traced('enhance')
     def enhance_image_quality(self, frame):
         lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
         l, a, b = cv2.split(lab)
@@ -226,16 +436,8 @@ class FaceRecognitionEngine:
         
         Returns: True if should skip (deduplicate), False if should process.
         """
-        cooldown_seconds = int(self.config.get('detection_cooldown', 300))
-        key = f"{prn}_{camera_id}" if camera_id else prn
-        now = time.time()
-        
-        last_time = self.last_detection.get(key, 0.0)
-        if now - last_time < cooldown_seconds:
-            return True
-        
-        self.last_detection[key] = now
-        return False
+        key = f"{prn}|{camera_id}" if camera_id else prn
+        return not self.detection_cooldowns.check_and_set(key)
 
     def set_camera_direction(self, camera_id, direction):
         """Set or update camera direction (IN/OUT/BOTH).
@@ -0,0 +1,146 @@
+# frame_hub.py
+"""
+Latest annotated frame per camera, JPEG-encoded once per quality tier
+
+Camera workers hand over every frame (a reference, no copy or encode) with
+the most recent detections. The first viewer that asks for a new frame in a
+tier annotates, resizes and encodes it; every other viewer of that tier
+gets the cached bytes, so encoding cost does not grow with the audience.
+"""
+
+import threading
+import time
+
+import cv2
+
+STATUS_COLORS = {
+    'marked': (0, 255, 0),
+    'already_marked': (255, 165, 0),
+    'recognized': (255, 255, 0),
+    'unknown': (0, 0, 255),
+}
+
+DEFAULT_TIERS = {
+    'full': {'width': None, 'quality': 80},
+    'thumb': {'width': 320, 'quality': 60},
+}
+
+
+def annotate_frame(frame, faces):
+    """Draw pipeline results (dicts with box, name/prn, status, confidence) on a copy of the frame"""
+    annotated = frame.copy()
+    for face in faces:
+        top, right, bottom, left = face['box']
+        color = STATUS_COLORS.get(face['status'], (128, 128, 128))
+        label = face.get('name') or face.get('prn') or 'Unknown'
+        cv2.rectangle(annotated, (left, top), (right, bottom), color, 2)
+        cv2.rectangle(annotated, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+        cv2.putText(annotated, f"{label} ({face['confidence']:.1f}%)", (left + 6, bottom - 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+    return annotated
+
+
+class _CameraFrames:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+        self.faces = []
+        self.sequence = 0
+        self.updated_at = None
+        self.encoded = {}  # tier -> (sequence, jpeg bytes)
+        self.encode_locks = {}  # tier -> lock held while one viewer encodes for everyone
+
+
+class FrameHub:
+    def __init__(self, tiers=None):
+        self.tiers = tiers or DEFAULT_TIERS
+        self.cameras = {}
+        self.lock = threading.Lock()
+        self.stats = {tier: {'encodes': 0, 'encode_ms': 0.0, 'served': 0, 'bytes': 0, 'viewers': 0}
+                      for tier in self.tiers}
+
+    def viewer_joined(self, tier):
+        with self.lock:
+            self.stats[tier]['viewers'] += 1
+
+    def viewer_left(self, tier):
+        with self.lock:
+            self.stats[tier]['viewers'] -= 1
+
+    def _camera(self, camera_id):
+        with self.lock:
+            return self.cameras.setdefault(camera_id, _CameraFrames())
+
+    def publish(self, camera_id, frame, faces=None):
+        """Store the newest frame; faces replaces the overlay when given"""
+        camera = self._camera(camera_id)
+        with camera.lock:
+            camera.frame = frame
+            if faces is not None:
+                camera.faces = faces
+            camera.sequence += 1
+            camera.updated_at = time.time()
+
+    def latest_sequence(self, camera_id):
+        camera = self.cameras.get(camera_id)
+        return camera.sequence if camera is not None else 0
+
+    def get_jpeg(self, camera_id, tier='full'):
+        """Return (sequence, jpeg bytes) for the newest frame, or (0, None) when there is none"""
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown preview tier: {tier}")
+        camera = self.cameras.get(camera_id)
+        if camera is None:
+            return 0, None
+
+        with camera.lock:
+            frame, faces, sequence = camera.frame, camera.faces, camera.sequence
+            cached = camera.encoded.get(tier)
+            encode_lock = camera.encode_locks.setdefault(tier, threading.Lock())
+        if frame is None:
+            return 0, None
+
+        if cached is None or cached[0] < sequence:
+            # Concurrent viewers of a new frame wait for one encode instead of each encoding it;
+            # the camera thread only ever takes camera.lock, so it is never held up here
+            with encode_lock:
+                cached = camera.encoded.get(tier)
+                if cached is None or cached[0] < sequence:
+                    cached = (sequence, self._encode(frame, faces, tier))
+                    camera.encoded[tier] = cached
+
+        stats = self.stats[tier]
+        with self.lock:
+            stats['served'] += 1
+            stats['bytes'] += len(cached[1])
+        return cached
+
+    def _encode(self, frame, faces, tier):
+        started = time.perf_counter()
+        settings = self.tiers[tier]
+        image = annotate_frame(frame, faces) if faces else frame
+        width = settings.get('width')
+        if width and image.shape[1] > width:
+            height = int(image.shape[0] * width / image.shape[1])
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(settings.get('quality', 80))])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+
+        stats = self.stats[tier]
+        with self.lock:
+            stats['encodes'] += 1
+            stats['encode_ms'] += (time.perf_counter() - started) * 1000.0
+        return buffer.tobytes()
+
+    def get_stats(self):
+        with self.lock:
+            tiers = {tier: dict(values) for tier, values in self.stats.items()}
+        for values in tiers.values():
+            values['avg_encode_ms'] = values['encode_ms'] / values['encodes'] if values['encodes'] else 0.0
+        return {
+            'process_cpu_s': time.process_time(),
+            'tiers': tiers,
+            'cameras': {camera_id: {'sequence': camera.sequence, 'updated_at': camera.updated_at}
+                        for camera_id, camera in list(self.cameras.items())},
+        }
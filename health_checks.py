@@ -0,0 +1,130 @@
+# health_checks.py
+"""
+Liveness and readiness checks for the API
+
+Liveness only says the process and its event loop are responsive; an
+orchestrator restarts the process when it fails. Readiness says whether the
+service can actually mark attendance right now, and reports why not:
+
+- database: SELECT 1 round trip and pool availability
+- models: detection/recognition (and YOLO when enabled) loaded
+- inference: a timed detection + embedding pass on the probe image, rerun
+  at most every probe_interval_s so frequent polling stays cheap
+- gallery: known faces loaded (skipped with the pgvector matcher)
+- cameras: age of the last frame of every running camera worker
+
+Each check returns {'ok': bool, ...measurements}; thresholds come from
+HEALTH_CONFIG.
+"""
+
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from perf_trace import tracer
+
+
+def load_probe_frame(path, size=(480, 640)):
+    """The probe image, or a fixed synthetic frame when it is missing"""
+    if path and os.path.exists(path):
+        frame = cv2.imread(path)
+        if frame is not None:
+            return frame
+        print(f"⚠ Could not read health probe image {path}; using a synthetic frame")
+    height, width = size
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+
+class HealthChecker:
+    def __init__(self, db, face_engine, config, camera_workers=None):
+        self.db = db
+        self.face_engine = face_engine
+        self.config = config
+        self.camera_workers = camera_workers if camera_workers is not None else {}
+        self.started_at = time.time()
+        self.probe_lock = threading.Lock()
+        self.probe_frame = None
+        self.last_probe = None
+        self.last_probe_at = 0.0
+
+    def liveness(self):
+        return {'status': 'alive', 'pid': os.getpid(), 'uptime_s': round(time.time() - self.started_at, 1)}
+
+    def check_database(self):
+        try:
+            latency_ms = self.db.ping()
+            pool = self.db.get_pool_stats()
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+        available = pool['available'] >= self.config['min_available_connections'] or not pool['waiting']
+        return {
+            'ok': latency_ms <= self.config['db_latency_ms'] and available,
+            'latency_ms': round(latency_ms, 2),
+            'pool_available': pool['available'],
+            'pool_waiting': pool['waiting'],
+            'pool_exhausted': pool['exhausted'],
+        }
+
+    def check_models(self):
+        status = self.face_engine.model_status()
+        return dict(status, ok=all(loaded is not False for loaded in status.values()))
+
+    def check_inference(self, now=None):
+        now = time.time() if now is None else now
+        with self.probe_lock:
+            if self.last_probe is None or now - self.last_probe_at >= self.config['probe_interval_s']:
+                if self.probe_frame is None:
+                    self.probe_frame = load_probe_frame(self.config.get('probe_image'))
+                tracer.set_camera('health')  # keep probe timings out of the real cameras' histograms
+                try:
+                    result = self.face_engine.run_probe(self.probe_frame)
+                    result = {key: round(value, 2) if isinstance(value, float) else value
+                              for key, value in result.items()}
+                except Exception as e:
+                    result = {'error': str(e)}
+                finally:
+                    tracer.set_camera(None)
+                self.last_probe, self.last_probe_at = result, now
+            result = dict(self.last_probe, age_s=round(now - self.last_probe_at, 1))
+        result['ok'] = 'error' not in result and result['total_ms'] <= self.config['inference_ms']
+        return result
+
+    def check_gallery(self):
+        if self.face_engine.uses_database_matcher:
+            return {'ok': True, 'matcher': 'pgvector'}
+        with self.face_engine.lock:
+            identities = len(self.face_engine.gallery)
+            templates = self.face_engine.gallery.template_count
+        return {'ok': identities >= self.config['min_gallery'], 'identities': identities,
+                'templates': templates}
+
+    def check_cameras(self, now=None):
+        now = time.time() if now is None else now
+        cameras = {}
+        for camera_id, worker in list(self.camera_workers.items()):
+            status = worker.status()
+            age = now - status['last_frame_at'] if status['last_frame_at'] else None
+            cameras[camera_id] = {
+                'running': status['running'],
+                'frame_age_s': round(age, 2) if age is not None else None,
+                'error': status['error'],
+                'ok': status['running'] and age is not None and age <= self.config['frame_max_age_s'],
+            }
+        return {'ok': all(camera['ok'] for camera in cameras.values()), 'cameras': cameras}
+
+    def readiness(self):
+        checks = {
+            'database': self.check_database(),
+            'models': self.check_models(),
+            'inference': self.check_inference(),
+            'gallery': self.check_gallery(),
+            'cameras': self.check_cameras(),
+        }
+        failed = [name for name, check in checks.items() if not check['ok']]
+        return {'status': 'not_ready' if failed else 'ready', 'failed': failed, 'checks': checks}
@@ -0,0 +1,114 @@
+# inference_runtime.py
+"""
+ONNX Runtime sessions and CPU thread limits for the recognition engine
+
+ONNX Runtime, torch (YOLO) and OpenCV each default to one thread per core.
+With several cameras or processes on one host this oversubscribes the CPU,
+so the engine applies INFERENCE_RUNTIME_CONFIG before loading models:
+
+- providers: ONNX Runtime execution providers in order of preference
+  (unavailable ones are skipped; None = CUDA first when installed, else CPU)
+- intra_op_threads / inter_op_threads: ONNX Runtime thread pools; 0 lets
+  ONNX Runtime decide, unless engines_per_host > 1, in which case the cores
+  are split evenly between the engines
+- execution_mode ('sequential' or 'parallel') and graph_optimization
+  ('disable', 'basic', 'extended' or 'all')
+- torch_threads / opencv_threads: limits for YOLO and OpenCV (None leaves
+  the library default; engines_per_host splits the cores for torch too)
+
+insightface only forwards providers to its sessions, so when any session
+option differs from the defaults the sessions are rebuilt with them.
+"""
+
+import os
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+
+
+def resolve_threads(runtime):
+    """{'intra_op', 'inter_op', 'torch', 'opencv'} thread counts; 0/None = library default"""
+    engines = max(1, int(runtime.get('engines_per_host') or 1))
+    share = max(1, (os.cpu_count() or 1) // engines) if engines > 1 else 0
+    torch_threads = runtime.get('torch_threads')
+    return {
+        'intra_op': int(runtime.get('intra_op_threads') or share),
+        'inter_op': int(runtime.get('inter_op_threads') or 0),
+        'torch': int(torch_threads) if torch_threads is not None else (share or None),
+        'opencv': runtime.get('opencv_threads'),
+    }
+
+
+def apply_thread_limits(runtime):
+    """Limit torch and OpenCV threads for this process; returns the resolved counts"""
+    threads = resolve_threads(runtime)
+    if threads['opencv'] is not None:
+        import cv2
+        cv2.setNumThreads(int(threads['opencv']))
+    if threads['torch']:
+        try:
+            import torch
+            torch.set_num_threads(threads['torch'])
+        except ImportError:
+            pass
+    return threads
+
+
+def select_providers(runtime):
+    """Requested providers that this onnxruntime build supports, or None for its default"""
+    requested = runtime.get('providers')
+    if not requested:
+        return None
+    import onnxruntime
+    available = set(onnxruntime.get_available_providers())
+    providers = [provider for provider in requested if provider in available]
+    skipped = [provider for provider in requested if provider not in available]
+    if skipped:
+        print(f"⚠ ONNX Runtime providers not available, skipped: {', '.join(skipped)}")
+    return providers or ['CPUExecutionProvider']
+
+
+def needs_custom_sessions(runtime):
+    threads = resolve_threads(runtime)
+    return bool(threads['intra_op'] or threads['inter_op']) or \
+        runtime.get('execution_mode', 'sequential') != 'sequential' or \
+        runtime.get('graph_optimization', 'all') != 'all'
+
+
+def session_options(runtime):
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    threads = resolve_threads(runtime)
+    if threads['intra_op']:
+        options.intra_op_num_threads = threads['intra_op']
+    if threads['inter_op']:
+        options.inter_op_num_threads = threads['inter_op']
+    if runtime.get('execution_mode', 'sequential') == 'parallel':
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+    level = runtime.get('graph_optimization', 'all')
+    if level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"Unknown graph_optimization '{level}', expected one of "
+                         f"{', '.join(GRAPH_OPTIMIZATION_LEVELS)}")
+    options.graph_optimization_level = getattr(onnxruntime.GraphOptimizationLevel,
+                                               GRAPH_OPTIMIZATION_LEVELS[level])
+    return options
+
+
+def rebuild_sessions(face_analyzer, runtime, providers=None):
+    """Recreate every insightface model session with the configured session options"""
+    import onnxruntime
+    options = session_options(runtime)
+    for model in face_analyzer.models.values():
+        model.session = onnxruntime.InferenceSession(model.model_file, sess_options=options,
+                                                     providers=providers or model.session.get_providers())
+
+
+def session_providers(face_analyzer):
+    """{model task: providers its session runs on}"""
+    return {task: model.session.get_providers()
+            for task, model in getattr(face_analyzer, 'models', {}).items()
+            if getattr(model, 'session', None) is not None}
@@ -0,0 +1,173 @@
+# metrics.py
+"""
+Prometheus text-format metrics without a client library
+
+Counters and histograms are updated in place by the code they measure.
+Everything else (pool usage, queue depths, gallery size, stage timings) is
+read on scrape by collectors, functions returning metric families, so the
+hot paths pay nothing for it:
+
+    (name, type, help, [(sample suffix, {labels}, value), ...])
+
+RequestMetricsMiddleware is a plain ASGI middleware (no per-request
+Request/Response objects) recording the count and latency of every HTTP
+request by method, route template and status.
+"""
+
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def histogram_samples(bounds, cumulative_counts, total, count, labels):
+    """Samples for one histogram series from upper bounds and cumulative bucket counts"""
+    samples = [('_bucket', dict(labels, le=_format_value(float(bound))), cumulative)
+               for bound, cumulative in zip(bounds, cumulative_counts)]
+    samples.append(('_bucket', dict(labels, le='+Inf'), count))
+    samples.append(('_sum', labels, total))
+    samples.append(('_count', labels, count))
+    return samples
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def collect(self):
+        with self.lock:
+            items = list(self.values.items())
+        return (self.name, 'counter', self.help,
+                [('', dict(zip(self.label_names, key)), value) for key, value in items])
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        with self.lock:
+            items = [(key, list(series)) for key, series in self.series.items()]
+        samples = []
+        for key, series in items:
+            cumulative, running = [], 0
+            for bucket_count in series[:len(self.buckets)]:
+                running += bucket_count
+                cumulative.append(running)
+            samples.extend(histogram_samples(self.buckets, cumulative, series[-2], series[-1],
+                                             dict(zip(self.label_names, key))))
+        return (self.name, 'histogram', self.help, samples)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help_text, label_names=()):
+        metric = Counter(name, help_text, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, label_names, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """Register a function returning metric families at scrape time (usable as a decorator)"""
+        self.collectors.append(func)
+        return func
+
+    def render(self):
+        families = [metric.collect() for metric in self.metrics]
+        errors = []
+        for collect in self.collectors:
+            try:
+                families.extend(collect())
+            except Exception as e:
+                # One broken source (e.g. the database being down) must not hide the rest
+                errors.append(('', {'collector': collect.__name__, 'error': type(e).__name__}, 1))
+        families.append(('attendance_metrics_collector_errors', 'gauge',
+                         'Collectors that failed during this scrape', errors))
+        lines = []
+        for name, metric_type, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware counting HTTP requests and timing them per route template"""
+
+    def __init__(self, app, requests, latency):
+        self.app = app
+        self.requests = requests
+        self.latency = latency
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            path = getattr(route, 'path', None) or 'unmatched'
+            method = scope.get('method', '')
+            self.latency.observe(time.perf_counter() - started, method, path)
+            self.requests.inc(method, path, str(status[0]))
@@ -0,0 +1,101 @@
+# micro_batcher.py
+"""
+Merge concurrent async requests into batches for a blocking batch function
+
+Requests wait at most `max_wait_ms` for company; a batch is run as soon as
+it reaches `max_batch_size`. Batches run one at a time on a dedicated
+worker thread, so the wrapped engine is never called concurrently and the
+event loop never blocks.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MicroBatcher:
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=10.0, max_queue=256):
+        self.process_batch = process_batch  # list of items -> list of results, same order
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='micro-batch')
+        self.queue = None
+        self.worker = None
+        self.stats = {'requests': 0, 'batches': 0, 'max_batch': 0,
+                      'rejected': 0, 'errors': 0, 'batch_ms_total': 0.0}
+
+    def start(self):
+        if self.worker is None:
+            self.queue = asyncio.Queue(maxsize=self.max_queue)
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        """Queue one item and wait for its result; raises RuntimeError when the queue is full"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            raise RuntimeError("Recognition queue is full")
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Anything that queued up while we waited rides along for free
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                self.stats['errors'] += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.stats['batches'] += 1
+                self.stats['requests'] += len(batch)
+                self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+                self.stats['batch_ms_total'] += (time.perf_counter() - started) * 1000.0
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def get_stats(self):
+        batches = self.stats['batches']
+        return dict(
+            self.stats,
+            queue_depth=self.queue.qsize() if self.queue is not None else 0,
+            avg_batch=self.stats['requests'] / batches if batches else 0.0,
+            avg_batch_ms=self.stats['batch_ms_total'] / batches if batches else 0.0,
+        )
+
+    async def close(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+        self.executor.shutdown(wait=False)
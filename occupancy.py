@@ -0,0 +1,194 @@
+# occupancy.py
+"""
+Who is inside right now, from IN/OUT recognition events
+
+Each person is either inside a room or outside. An event from an IN camera
+moves them inside the camera's room, an OUT event moves them out; cameras
+set to BOTH (or unknown) only refresh last_seen. Current totals and
+per-room counts are kept up to date on every transition, so reads never
+scan the attendance log.
+
+- Debouncing: a transition within debounce_s of the person's previous one
+  is ignored (someone lingering between a door's IN and OUT cameras), as
+  are events older than their last transition.
+- Day reset: at reset_hour (local time) everyone is considered outside.
+- rebuild(events) replays the day's logged IN/OUT events on startup. The
+  replay runs on a separate tracker and is swapped in at the end, so live
+  events keep being served meanwhile; those that arrive during the replay
+  are applied to the rebuilt state too.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+INSIDE = 'IN'
+OUTSIDE = 'OUT'
+
+
+class _Presence:
+    __slots__ = ('state', 'room', 'camera_id', 'changed_at', 'last_seen')
+
+    def __init__(self, state, room, camera_id, at):
+        self.state = state
+        self.room = room
+        self.camera_id = camera_id
+        self.changed_at = at
+        self.last_seen = at
+
+    def as_dict(self, prn):
+        return {'prn': prn, 'state': self.state, 'room': self.room, 'camera_id': self.camera_id,
+                'since': self.changed_at.isoformat(), 'last_seen': self.last_seen.isoformat()}
+
+
+class OccupancyTracker:
+    def __init__(self, config=None):
+        config = config or {}
+        self.debounce = timedelta(seconds=float(config.get('debounce_s', 30)))
+        self.reset_hour = int(config.get('reset_hour', 0))
+        self.default_room = config.get('default_room', 'building')
+        self.camera_rooms = dict(config.get('camera_rooms', {}))
+        self.lock = threading.Lock()
+        self.people = {}  # prn -> _Presence
+        self.inside = {}  # room -> set of prns currently inside
+        self.total = 0
+        self.day = None
+        self.stats = {'events': 0, 'transitions': 0, 'debounced': 0, 'out_of_order': 0, 'resets': 0}
+        self.pending = None  # live events seen while rebuild() replays, else None
+
+    def set_camera_room(self, camera_id, room):
+        with self.lock:
+            self.camera_rooms[str(camera_id)] = room
+
+    def _day_of(self, at):
+        return (at - timedelta(hours=self.reset_hour)).date()
+
+    def _roll_day(self, at):
+        day = self._day_of(at)
+        if day != self.day:
+            if self.day is not None and day < self.day:
+                return False  # event from a day already closed
+            self.people.clear()
+            self.inside.clear()
+            self.total = 0
+            if self.day is not None:
+                self.stats['resets'] += 1
+            self.day = day
+        return True
+
+    def _enter(self, prn, room):
+        self.inside.setdefault(room, set()).add(prn)
+        self.total += 1
+
+    def _leave(self, prn, presence):
+        members = self.inside[presence.room]
+        members.discard(prn)
+        if not members:
+            del self.inside[presence.room]
+        self.total -= 1
+
+    def observe(self, prn, direction, camera_id=None, at=None, room=None):
+        """Apply one recognition event; returns True when the person's state changed"""
+        at = at or datetime.now()
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((prn, direction, camera_id, at, room))
+            self.stats['events'] += 1
+            if not self._roll_day(at):
+                self.stats['out_of_order'] += 1
+                return False
+            room = room or self.camera_rooms.get(str(camera_id), self.default_room)
+            presence = self.people.get(prn)
+
+            if direction not in (INSIDE, OUTSIDE):
+                if presence is not None:
+                    presence.last_seen = max(presence.last_seen, at)
+                return False
+            if presence is None:
+                if direction == OUTSIDE:
+                    self.people[prn] = _Presence(OUTSIDE, room, camera_id, at)
+                    return False
+                self.people[prn] = _Presence(INSIDE, room, camera_id, at)
+                self._enter(prn, room)
+                self.stats['transitions'] += 1
+                return True
+
+            if at < presence.changed_at:
+                self.stats['out_of_order'] += 1
+                return False
+            presence.last_seen = max(presence.last_seen, at)
+            same = presence.state == direction and (direction == OUTSIDE or presence.room == room)
+            if same:
+                return False
+            if at - presence.changed_at < self.debounce:
+                self.stats['debounced'] += 1
+                return False
+
+            if presence.state == INSIDE:
+                self._leave(prn, presence)
+            presence.state, presence.room, presence.camera_id, presence.changed_at = direction, room, camera_id, at
+            if direction == INSIDE:
+                self._enter(prn, room)
+            self.stats['transitions'] += 1
+            return True
+
+    def rebuild(self, events):
+        """Replace the state with a replay of (prn, direction, camera_id, timestamp) events in time order"""
+        with self.lock:
+            replay = OccupancyTracker({'debounce_s': self.debounce.total_seconds(), 'reset_hour': self.reset_hour,
+                                       'default_room': self.default_room, 'camera_rooms': self.camera_rooms})
+            self.pending = []
+        try:
+            count = 0
+            for prn, direction, camera_id, at in events:
+                replay.observe(prn, direction, camera_id, at)
+                count += 1
+        except BaseException:
+            with self.lock:
+                self.pending = None
+            raise
+        with self.lock:
+            for key in self.stats:
+                self.stats[key] += replay.stats[key]
+            for prn, direction, camera_id, at, room in self.pending:
+                replay.observe(prn, direction, camera_id, at, room)
+            self.pending = None
+            self.people, self.inside, self.total, self.day = replay.people, replay.inside, replay.total, replay.day
+        return count
+
+    def day_start(self, now=None):
+        """Start of the current occupancy day (events from here on are replayed by rebuild)"""
+        now = now or datetime.now()
+        return datetime.combine(self._day_of(now), datetime.min.time()) + timedelta(hours=self.reset_hour)
+
+    def _current(self):
+        self._roll_day(datetime.now())
+
+    def summary(self):
+        with self.lock:
+            self._current()
+            return {
+                'day': self.day.isoformat() if self.day else None,
+                'total': self.total,
+                'rooms': {room: len(members) for room, members in self.inside.items()},
+            }
+
+    def room_count(self, room):
+        with self.lock:
+            self._current()
+            return len(self.inside.get(room, ()))
+
+    def people_inside(self, room=None):
+        with self.lock:
+            self._current()
+            rooms = [room] if room is not None else list(self.inside)
+            return [self.people[prn].as_dict(prn) for name in rooms for prn in self.inside.get(name, ())]
+
+    def presence(self, prn):
+        with self.lock:
+            self._current()
+            presence = self.people.get(prn)
+            return presence.as_dict(prn) if presence is not None else None
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, people=len(self.people))
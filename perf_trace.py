@@ -0,0 +1,220 @@
+# perf_trace.py
+"""
+Low-overhead stage timers for the recognition pipeline
+
+Code paths time themselves with the shared `tracer`:
+
+    with tracer.stage('capture'):
+        ret, frame = cap.read()
+
+    @traced('match')
+    def recognize_faces(...): ...
+
+Every sample goes into a log-bucketed histogram keyed by (camera, stage);
+the camera is a thread-local label set once by each camera thread
+(tracer.set_camera), so the engine and database code need not know which
+camera they serve. While a trace is recording, samples are also kept as
+Chrome trace events ("X" complete events) in a bounded buffer;
+dump_trace() writes a file that chrome://tracing or Perfetto opens as a
+flame chart per thread.
+"""
+
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from attendance_config import PERF_TRACE_CONFIG
+
+# Stages shown by status_line, in pipeline order (only those recorded appear)
+STATUS_STAGES = ('capture', 'enhance', 'yolo', 'insightface', 'detect', 'embed', 'match', 'db', 'render',
+                 'pipeline')
+
+# Bucket upper bounds in ms: 10 us doubling every two buckets up to ~100 s
+BUCKET_BOUNDS_MS = [0.01 * 2 ** (i / 2) for i in range(47)]
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, elapsed_ms):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the fraction-th sample (capped at the max seen)"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                bound = BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max_ms,
+        }
+
+
+class _Stage:
+    __slots__ = ('tracer', 'name', 'label', 'start_ns')
+
+    def __init__(self, tracer, name, label):
+        self.tracer = tracer
+        self.name = name
+        self.label = label
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end_ns = time.perf_counter_ns()
+        self.tracer._add(self.name, self.start_ns, end_ns, self.label)
+        return False
+
+
+class _Disabled:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+class StageTracer:
+    def __init__(self, enabled=True, trace_max_events=200000):
+        self.enabled = enabled
+        self.trace_max_events = int(trace_max_events)
+        self.histograms = {}  # (camera, stage) -> Histogram
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.trace = None  # deque of events while recording
+        self.thread_names = {}
+        self.origin_ns = time.perf_counter_ns()
+
+    def set_camera(self, camera_id):
+        """Label every stage timed on the calling thread with this camera"""
+        self.local.camera = None if camera_id is None else str(camera_id)
+
+    def stage(self, name, label=None):
+        """Context manager timing one stage; label names the trace event (default: the stage)"""
+        return _Stage(self, name, label) if self.enabled else _DISABLED
+
+    def record(self, name, elapsed_ms, label=None):
+        """Record a duration measured elsewhere (e.g. database query timings)"""
+        if self.enabled:
+            end_ns = time.perf_counter_ns()
+            self._add(name, end_ns - int(elapsed_ms * 1e6), end_ns, label)
+
+    def _add(self, name, start_ns, end_ns, label):
+        camera = getattr(self.local, 'camera', None)
+        elapsed_ms = (end_ns - start_ns) / 1e6
+        with self.lock:
+            histogram = self.histograms.get((camera, name))
+            if histogram is None:
+                histogram = self.histograms[(camera, name)] = Histogram()
+            histogram.add(elapsed_ms)
+            if self.trace is not None:
+                thread_id = threading.get_ident()
+                if thread_id not in self.thread_names:
+                    self.thread_names[thread_id] = threading.current_thread().name
+                self.trace.append((label or name, name, camera, thread_id,
+                                   (start_ns - self.origin_ns) // 1000, (end_ns - start_ns) // 1000))
+
+    def start_trace(self, max_events=None):
+        with self.lock:
+            self.trace = deque(maxlen=int(max_events or self.trace_max_events))
+
+    def stop_trace(self):
+        with self.lock:
+            events, self.trace = self.trace, None
+        return list(events or ())
+
+    def trace_events(self, events=None):
+        """Buffered samples as a Chrome trace JSON object"""
+        if events is None:
+            with self.lock:
+                events = list(self.trace or ())
+        pid = os.getpid()
+        trace_events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                        for tid, name in list(self.thread_names.items())]
+        trace_events.extend({
+            'name': label, 'cat': stage, 'ph': 'X', 'pid': pid, 'tid': tid, 'ts': ts, 'dur': dur,
+            'args': {'camera': camera} if camera is not None else {},
+        } for label, stage, camera, tid, ts, dur in events)
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def dump_trace(self, path, events=None):
+        """Write buffered samples to a Chrome trace file; returns the number of events"""
+        data = self.trace_events(events)
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh, separators=(',', ':'))
+        return len(data['traceEvents'])
+
+    def summary(self, camera=None):
+        """{camera: {stage: histogram summary}}, optionally for one camera"""
+        with self.lock:
+            items = [(key, histogram.summary()) for key, histogram in self.histograms.items()
+                     if camera is None or key[0] == camera]
+        result = {}
+        for (camera_id, stage), values in sorted(items, key=lambda item: (str(item[0][0]), item[0][1])):
+            result.setdefault(camera_id if camera_id is not None else 'default', {})[stage] = values
+        return result
+
+    def status_line(self, camera=None, stages=STATUS_STAGES):
+        """Compact p50 per stage for a status bar, e.g. 'capture 1.2 | detect 31.0 ms'"""
+        with self.lock:
+            parts = [f"{stage} {self.histograms[(camera, stage)].percentile(0.5):.1f}"
+                     for stage in stages if (camera, stage) in self.histograms]
+        return " | ".join(parts) + " ms p50" if parts else "no timings yet"
+
+    def snapshot(self):
+        """[(camera, stage, bucket counts, total_ms, count)] copied under the lock"""
+        with self.lock:
+            return [(camera, stage, list(h.counts), h.total_ms, h.count)
+                    for (camera, stage), h in self.histograms.items()]
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+def traced(stage, label=None):
+    """Decorator timing every call of a function as `stage`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.stage(stage, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+tracer = StageTracer(PERF_TRACE_CONFIG.get('enabled', True), PERF_TRACE_CONFIG.get('trace_max_events', 200000))
+if PERF_TRACE_CONFIG.get('trace_path'):
+    tracer.start_trace()
@@ -0,0 +1,217 @@
+# roster_bitmaps.py
+"""
+Per-session attendance rosters as bitmaps over a dense student ordinal
+
+Every student gets an ordinal (students of a class are contiguous), and a
+session, one subject on one day, keeps a Python int whose bit i is set
+when student i has been marked. Class rosters are bitmaps too, so:
+
+    absent      = expected & ~present
+    late        = bits of students first marked after start + late_after_minutes
+    absent in N = absent(s1) & absent(s2) & ... & absent(sN)
+
+The students expected at a session are the classes timetabled for that
+subject on that weekday or, without a timetable, the classes of the
+students who attended (the same rule as attendance_reports). Bitmaps are
+updated as attendance is marked and rebuilt from the log on startup; the
+rebuild happens on a separate instance that is swapped in when complete.
+With history_days, sessions older than that are dropped as days roll over.
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+
+
+def iter_bits(bits):
+    """Ordinals of the set bits, lowest first"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class _Session:
+    __slots__ = ('present', 'late', 'classes_seen')
+
+    def __init__(self):
+        self.present = 0
+        self.late = 0
+        self.classes_seen = set()
+
+
+class RosterBitmaps:
+    def __init__(self, late_after_minutes=10, history_days=None):
+        self.late_after = timedelta(minutes=late_after_minutes)
+        self.history_days = history_days
+        self.lock = threading.Lock()
+        self.prns = []  # ordinal -> prn
+        self.ordinals = {}  # prn -> ordinal
+        self.student_class = []  # ordinal -> class_id
+        self.class_bits = {}  # class_id -> bitmap of its students
+        self.all_bits = 0
+        self.start_times = {}  # (subject_id, class_id, iso weekday) -> earliest start time
+        self.timetabled = {}  # (subject_id, iso weekday) -> class ids
+        self.sessions = {}  # (day, subject_id) -> _Session
+        self.latest_day = None  # newest day marked, for pruning on roll-over
+        self.pending = None  # live marks seen while rebuild() replays, else None
+
+    def load_students(self, students):
+        """(prn, class_id) pairs, ideally ordered by class; resets all sessions"""
+        with self.lock:
+            self.prns, self.ordinals, self.student_class = [], {}, []
+            self.class_bits, self.all_bits, self.sessions = {}, 0, {}
+            for prn, class_id in students:
+                self._add_student(prn, class_id)
+
+    def _add_student(self, prn, class_id):
+        ordinal = len(self.prns)
+        self.prns.append(prn)
+        self.ordinals[prn] = ordinal
+        self.student_class.append(class_id)
+        bit = 1 << ordinal
+        self.class_bits[class_id] = self.class_bits.get(class_id, 0) | bit
+        self.all_bits |= bit
+        return ordinal
+
+    def load_timetable(self, entries):
+        """(class_id, subject_id, iso weekday, start_time) rows"""
+        with self.lock:
+            self.start_times, self.timetabled = {}, {}
+            for class_id, subject_id, weekday, start_time in entries:
+                key = (subject_id, class_id, weekday)
+                if key not in self.start_times or start_time < self.start_times[key]:
+                    self.start_times[key] = start_time
+                self.timetabled.setdefault((subject_id, weekday), set()).add(class_id)
+
+    def rebuild(self, students, timetable, marks):
+        """Reload students and timetable, then replay (prn, subject_id, first marked at) rows.
+
+        Everything is built on a fresh instance and swapped in at the end; live
+        marks made meanwhile are applied to it too.
+        """
+        replay = RosterBitmaps(self.late_after.total_seconds() / 60, self.history_days)
+        with self.lock:
+            self.pending = []
+        try:
+            replay.load_students(students)
+            replay.load_timetable(timetable)
+            count = 0
+            for prn, subject_id, at in marks:
+                replay.mark(prn, subject_id, at)
+                count += 1
+        except BaseException:
+            with self.lock:
+                self.pending = None
+            raise
+        with self.lock:
+            for prn, subject_id, at, class_id in self.pending:
+                replay.mark(prn, subject_id, at, class_id)
+            self.pending = None
+            self.prns, self.ordinals, self.student_class = replay.prns, replay.ordinals, replay.student_class
+            self.class_bits, self.all_bits = replay.class_bits, replay.all_bits
+            self.start_times, self.timetabled = replay.start_times, replay.timetabled
+            self.sessions, self.latest_day = replay.sessions, replay.latest_day
+        return count
+
+    def mark(self, prn, subject_id, at=None, class_id=None):
+        """Record that prn attended subject at `at`; unknown PRNs are added with class_id"""
+        at = at or datetime.now()
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((prn, subject_id, at, class_id))
+            if self.latest_day is None or at.date() > self.latest_day:
+                self.latest_day = at.date()
+                if self.history_days is not None:
+                    self._prune(self.latest_day - timedelta(days=self.history_days))
+            ordinal = self.ordinals.get(prn)
+            if ordinal is None:
+                ordinal = self._add_student(prn, class_id)
+            bit = 1 << ordinal
+            session = self.sessions.get((at.date(), subject_id))
+            if session is None:
+                session = self.sessions[(at.date(), subject_id)] = _Session()
+            if session.present & bit:
+                return False
+            session.present |= bit
+            student_class = self.student_class[ordinal]
+            session.classes_seen.add(student_class)
+            start = self.start_times.get((subject_id, student_class, at.isoweekday()))
+            if start is not None and at > datetime.combine(at.date(), start) + self.late_after:
+                session.late |= bit
+            return True
+
+    def _expected(self, day, subject_id, session):
+        classes = self.timetabled.get((subject_id, day.isoweekday())) or \
+            (session.classes_seen if session is not None else ())
+        bits = 0
+        for class_id in classes:
+            bits |= self.class_bits.get(class_id, 0)
+        return bits
+
+    def _scope(self, class_id):
+        return self.all_bits if class_id is None else self.class_bits.get(class_id, 0)
+
+    def session_bitmaps(self, day, subject_id, class_id=None):
+        """(expected, present, absent, late) bitmaps for one session, limited to a class if given"""
+        with self.lock:
+            session = self.sessions.get((day, subject_id))
+            scope = self._scope(class_id)
+            expected = self._expected(day, subject_id, session) & scope
+            present = session.present & scope if session is not None else 0
+            late = session.late & scope if session is not None else 0
+        return expected, present, expected & ~present, late
+
+    def prns_of(self, bits):
+        prns = self.prns
+        return [prns[ordinal] for ordinal in iter_bits(bits)]
+
+    def session_summary(self, day, subject_id, class_id=None):
+        expected, present, absent, late = self.session_bitmaps(day, subject_id, class_id)
+        return {'day': day.isoformat(), 'subject_id': subject_id, 'class_id': class_id,
+                'expected': expected.bit_count(), 'present': present.bit_count(),
+                'absent': absent.bit_count(), 'late': late.bit_count()}
+
+    def list_sessions(self, day=None, subject_id=None):
+        with self.lock:
+            keys = sorted(key for key in self.sessions
+                          if (day is None or key[0] == day) and (subject_id is None or key[1] == subject_id))
+        return keys
+
+    def absent_streak(self, subject_id, sessions=3, class_id=None, until=None):
+        """Students absent from each of the last `sessions` held sessions of a subject"""
+        until = until or date.today()
+        with self.lock:
+            days = sorted((day for day, subject in self.sessions
+                           if subject == subject_id and day <= until), reverse=True)[:sessions]
+        if len(days) < sessions:
+            return days, 0
+        streak = self._scope(class_id)
+        for day in days:
+            streak &= self.session_bitmaps(day, subject_id, class_id)[2]
+        return days, streak
+
+    def absent_all_day(self, day=None, class_id=None):
+        """Students with no attendance in any session of the day"""
+        day = day or date.today()
+        with self.lock:
+            attended = 0
+            for (session_day, _), session in self.sessions.items():
+                if session_day == day:
+                    attended |= session.present
+            return self._scope(class_id) & ~attended
+
+    def prune(self, before):
+        """Drop sessions older than `before`"""
+        with self.lock:
+            self._prune(before)
+
+    def _prune(self, before):
+        for key in [key for key in self.sessions if key[0] < before]:
+            del self.sessions[key]
+
+    def get_stats(self):
+        with self.lock:
+            return {'students': len(self.prns), 'classes': len(self.class_bits),
+                    'sessions': len(self.sessions),
+                    'bytes': sum((s.present.bit_length() + s.late.bit_length()) // 8
+                                 for s in self.sessions.values())}
@@ -1,13 +1,36 @@
 from typing import List, Optional
+import asyncio
+import csv
+import io
+import json
+import time
+import cv2
 import numpy as np
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
-from attendance_config import DB_CONFIG, FACE_RECOGNITION_CONFIG
+from attendance_config import (
+    CAMERA_CONFIG, DB_CONFIG, FACE_RECOGNITION_CONFIG, HEALTH_CONFIG, INGEST_CONFIG, LIVE_EVENTS_CONFIG,
+    OCCUPANCY_CONFIG, PREVIEW_CONFIG, RECOGNITION_API_CONFIG, ROSTER_CONFIG,
+)
 from database_manager import DatabaseManager
+from async_database_manager import AsyncDatabaseManager
 from face_recognition_engine import FaceRecognitionEngine
+from face_matcher import normalize_embedding, select_diverse_templates
+from attendance_reports import AttendanceReportEngine
+from attendance_ingest import AttendanceIngestor
+from micro_batcher import MicroBatcher
+from event_bus import EventBus
+from camera_pipeline import CameraWorker, RecognitionPipeline
+from frame_hub import FrameHub
+from occupancy import OccupancyTracker
+from roster_bitmaps import RosterBitmaps
+from perf_trace import BUCKET_BOUNDS_MS, tracer
+from health_checks import HealthChecker
+from metrics import CONTENT_TYPE, MetricsRegistry, RequestMetricsMiddleware, histogram_samples
 
 app = FastAPI(
     title="Attendance System API",
@@ -16,7 +39,39 @@ app = FastAPI(
 )
 
 db = DatabaseManager(DB_CONFIG)
+adb = AsyncDatabaseManager(db)
 face_engine = FaceRecognitionEngine(FACE_RECOGNITION_CONFIG)
+report_engine = AttendanceReportEngine(db)
+rosters = RosterBitmaps(ROSTER_CONFIG['late_after_minutes'], ROSTER_CONFIG['history_days'])
+ingestor = AttendanceIngestor(db, INGEST_CONFIG, rosters=rosters)
+recognition_batcher = MicroBatcher(
+    face_engine.recognize_batch,
+    max_batch_size=RECOGNITION_API_CONFIG['max_batch_size'],
+    max_wait_ms=RECOGNITION_API_CONFIG['max_wait_ms'],
+    max_queue=RECOGNITION_API_CONFIG['max_queue'],
+)
+event_bus = EventBus(queue_size=LIVE_EVENTS_CONFIG['subscriber_queue'])
+occupancy = OccupancyTracker(dict(OCCUPANCY_CONFIG, camera_rooms={
+    str(camera['camera_id']): camera['room'] for camera in LIVE_EVENTS_CONFIG['cameras'] if camera.get('room')
+}))
+pipeline = RecognitionPipeline(db, face_engine, event_bus, occupancy=occupancy, rosters=rosters)
+frame_hub = FrameHub(PREVIEW_CONFIG['tiers'])
+camera_workers = {}
+health = HealthChecker(db, face_engine, HEALTH_CONFIG, camera_workers)
+
+metrics_registry = MetricsRegistry()
+app.add_middleware(
+    RequestMetricsMiddleware,
+    requests=metrics_registry.counter('attendance_http_requests_total', 'HTTP requests served',
+                                      ('method', 'route', 'status')),
+    latency=metrics_registry.histogram('attendance_http_request_duration_seconds', 'HTTP request latency',
+                                       ('method', 'route')),
+)
+
+
+STUDENT_FIELDS = ["prn", "class_id", "roll_no", "name", "email"]
+ATTENDANCE_FIELDS = ["log_id", "prn", "subject_id", "timestamp", "status",
+                     "camera_id", "direction", "confidence"]
 
 
 class StudentRegistrationPayload(BaseModel):
@@ -38,6 +93,18 @@ class MultiPhotoEnrollmentPayload(BaseModel):
     face_encodings: List[List[float]]  # Multiple photos
 
 
+class FaceTemplatesPayload(BaseModel):
+    """Extra face encodings for an enrolled student."""
+    face_encodings: List[List[float]]
+
+
+def enrollment_templates(face_encodings):
+    """Normalize enrollment encodings and keep the most diverse max_templates of them."""
+    templates = np.vstack([normalize_embedding(enc) for enc in face_encodings])
+    keep = select_diverse_templates(templates, FACE_RECOGNITION_CONFIG.get('max_templates', 5))
+    return templates[keep]
+
+
 class AttendanceLogPayload(BaseModel):
     """Log attendance with optional direction (IN/OUT)."""
     prn: str
@@ -66,9 +133,38 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/health/live")
+async def liveness():
+    """The process is up and its event loop is responsive."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.sleep(0)
+    return dict(health.liveness(), loop_lag_ms=round((loop.time() - started) * 1000.0, 3))
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Database, models, a timed inference probe, gallery and camera freshness; 503 when any fails."""
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, health.readiness)
+    return JSONResponse(result, status_code=200 if result['status'] == 'ready' else 503)
+
+
+@app.get("/db/pool")
+async def pool_stats():
+    """Connection pool usage (in-use, waits, exhaustion)."""
+    return db.get_pool_stats()
+
+
+@app.get("/db/queries")
+async def query_stats():
+    """Per-statement call counts and latencies."""
+    return db.get_query_stats()
+
+
 @app.get("/classes")
 async def list_classes():
-    classes = db.get_all_classes()
+    classes = await adb.get_all_classes()
     return [
         {"id": class_id, "name": class_name}
         for class_name, class_id in classes.items()
@@ -77,19 +173,39 @@ async def list_classes():
 
 @app.get("/subjects")
 async def list_subjects():
-    subjects = db.get_all_subjects()
+    subjects = await adb.get_all_subjects()
     return [
         {"id": subject_id, "name": subject_name}
         for subject_name, subject_id in subjects.items()
     ]
 
 
+@app.get("/subjects/{subject_id}/classes")
+async def subject_classes(subject_id: int, day: Optional[date] = None):
+    """Classes timetabled for a subject (the gallery shards a session should load)."""
+    return {"subject_id": subject_id,
+            "class_ids": await adb.get_classes_for_subject(subject_id, day)}
+
+
+@app.get("/timetable/sessions")
+async def timetable_sessions(
+    at: Optional[datetime] = None,
+    lead_minutes: int = Query(0, ge=0, le=240),
+    room: Optional[str] = None,
+):
+    """Timetable slots running now (or at ``at``), or starting within ``lead_minutes``.
+
+    Edge devices poll this to preload the class shards for their next session.
+    """
+    return await adb.get_timetable_sessions(at, lead_minutes, room)
+
+
 @app.post("/register")
 async def register_student(payload: StudentRegistrationPayload):
     try:
         encoding_array = np.array(payload.face_encoding, dtype=np.float32)
 
-        success, message = db.register_student(
+        success, message = await adb.register_student(
             payload.prn,
             payload.class_id,
             payload.roll_no,
@@ -117,17 +233,16 @@ async def enroll_with_multiple_photos(payload: MultiPhotoEnrollmentPayload):
         if len(payload.face_encodings) > 5:
             raise HTTPException(status_code=400, detail="Maximum 5 photos per enrollment")
 
-        # Average multiple encodings for a more robust embedding
-        encodings = [np.array(enc, dtype=np.float32) for enc in payload.face_encodings]
-        averaged_encoding = np.mean(encodings, axis=0)
+        # Keep each photo as its own template; the matcher scores the best of them
+        templates = enrollment_templates(payload.face_encodings)
 
-        success, message = db.register_student(
+        success, message = await adb.register_student(
             payload.prn,
             payload.class_id,
             payload.roll_no,
             payload.name,
             payload.email,
-            averaged_encoding,
+            templates,
         )
 
         if not success:
@@ -136,34 +251,290 @@ async def enroll_with_multiple_photos(payload: MultiPhotoEnrollmentPayload):
         return {
             "detail": message,
             "photos_enrolled": len(payload.face_encodings),
+            "templates_stored": len(templates),
             "enrolled_at": datetime.now().isoformat()
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/students/{prn}/face-templates")
+async def add_face_templates(prn: str, payload: FaceTemplatesPayload):
+    """Add face templates (e.g. new photos) to an enrolled student."""
+    if not payload.face_encodings:
+        raise HTTPException(status_code=400, detail="At least one face encoding required")
+    templates = enrollment_templates(payload.face_encodings)
+    success, message = await adb.add_face_encodings(prn, templates)
+    if not success:
+        raise HTTPException(status_code=404, detail=message)
+    return {"detail": message, "templates_stored": len(templates)}
+
+
+def load_gallery():
+    """Load known faces into the engine (or attach the pgvector matcher)."""
+    if face_engine.uses_database_matcher and db.vector_search_enabled:
+        face_engine.attach_database_matcher(db)
+        return {"matcher": "pgvector"}
+    encodings, prns, class_ids = db.get_face_encodings_with_classes()
+    face_engine.load_known_faces(encodings, prns, class_ids)
+    return {"matcher": "memory", "students": len(face_engine.gallery),
+            "templates": face_engine.gallery.template_count}
+
+
+def decode_image(data):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+async def read_frame(upload: UploadFile):
+    """Read an uploaded JPEG/PNG and decode it off the event loop."""
+    data = await upload.read()
+    if not data:
+        raise HTTPException(status_code=400, detail=f"{upload.filename or 'image'} is empty")
+    if len(data) > RECOGNITION_API_CONFIG['max_image_bytes']:
+        raise HTTPException(status_code=413, detail=f"{upload.filename or 'image'} is too large")
+    frame = await asyncio.get_running_loop().run_in_executor(None, decode_image, data)
+    if frame is None:
+        raise HTTPException(status_code=400,
+                            detail=f"{upload.filename or 'image'} is not a JPEG/PNG image")
+    return frame
+
+
+async def recognize_frames(frames):
+    """Recognize faces in decoded frames through the shared micro-batcher."""
+    try:
+        results = await asyncio.gather(*(recognition_batcher.submit(frame) for frame in frames))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    names = await adb.get_student_names(face["prn"] for faces in results for face in faces)
+    for faces in results:
+        for face in faces:
+            face["name"] = names.get(face["prn"])
+    return results
+
+
+@app.post("/recognize")
+async def recognize(file: UploadFile = File(...)):
+    """Detect and recognize every face in one JPEG/PNG frame."""
+    started = time.perf_counter()
+    frame = await read_frame(file)
+    faces = (await recognize_frames([frame]))[0]
+    return {"faces": faces, "latency_ms": round((time.perf_counter() - started) * 1000.0, 2)}
+
+
+@app.post("/recognize/batch")
+async def recognize_many(files: List[UploadFile] = File(...)):
+    """Recognize faces in several frames; results are returned in upload order."""
+    if len(files) > RECOGNITION_API_CONFIG['max_images_per_request']:
+        raise HTTPException(status_code=400, detail=(
+            f"At most {RECOGNITION_API_CONFIG['max_images_per_request']} images per request"))
+    started = time.perf_counter()
+    frames = await asyncio.gather(*(read_frame(upload) for upload in files))
+    results = await recognize_frames(frames)
+    return {
+        "images": [{"filename": upload.filename, "faces": faces}
+                   for upload, faces in zip(files, results)],
+        "latency_ms": round((time.perf_counter() - started) * 1000.0, 2),
+    }
+
+
+@app.get("/recognize/stats")
+async def recognize_stats():
+    """Micro-batching counters: requests, batches, average batch size, queue depth."""
+    return recognition_batcher.get_stats()
+
+
+@app.post("/gallery/reload")
+async def reload_gallery():
+    """Reload known faces after enrollments."""
+    return await adb.run(load_gallery)
+
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+STREAM_CHUNK_ROWS = 1000
+
+
+def stream_rows(rows, fmt, columns):
+    """Encode an iterator of row dicts as NDJSON or CSV, one chunk per STREAM_CHUNK_ROWS rows."""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+
+    pending = 0
+    for row in rows:
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, separators=(",", ":")))
+            buffer.write("\n")
+        pending += 1
+        if pending >= STREAM_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def streaming_response(rows, fmt, columns, filename):
+    return StreamingResponse(
+        stream_rows(rows, fmt, columns),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
 @app.get("/students")
-async def get_students():
-    if not hasattr(db, "get_all_students"):
-        return {"message": "Student listing not implemented yet"}
-    return db.get_all_students()
+async def get_students(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    class_id: Optional[int] = None,
+    format: str = Query("json", pattern="^(json|ndjson|csv)$"),
+):
+    """Keyset-paginated students, or the full list streamed as NDJSON/CSV."""
+    try:
+        if cursor:
+            db.decode_page_cursor(cursor, db.STUDENT_CURSOR)
+        if format != "json":
+            rows = db.iter_students(class_id=class_id, cursor=cursor)
+            return streaming_response(rows, format, STUDENT_FIELDS, "students")
+        return await adb.get_students_page(limit=limit, cursor=cursor, class_id=class_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/students/{prn}/summary")
+async def get_student_summary(prn: str, start_date: Optional[date] = None,
+                              end_date: Optional[date] = None):
+    """Days attended per subject for one student (from the daily rollups)."""
+    return await adb.get_student_attendance_summary(prn, start_date, end_date)
+
+
+@app.get("/reports/daily")
+async def get_daily_report(day: Optional[date] = None, class_id: Optional[int] = None):
+    """Present/absent counts per class and subject for a day (default today)."""
+    return await adb.get_class_daily_attendance(day, class_id)
+
+
+async def report_response(kind, start_date, end_date, class_id, threshold, format):
+    """Build a report cube off the event loop and return it as JSON, CSV or Parquet."""
+    end_date = end_date or date.today()
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+
+    report = await adb.run(report_engine.build, start_date, end_date, class_id)
+    filename = f"{kind}_{start_date}_{end_date}"
+    if format == "csv":
+        return StreamingResponse(
+            report.iter_csv(kind, threshold),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+        )
+    if format == "parquet":
+        buffer = io.BytesIO()
+        try:
+            await adb.run(report.write_parquet, buffer, kind, threshold)
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        return Response(
+            buffer.getvalue(),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.parquet"'},
+        )
+    return {
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "timings": report.timings,
+        "rows": list(report.records(kind, threshold)),
+    }
+
+
+@app.get("/reports/percentages")
+async def percentages_report(
+    start_date: date,
+    end_date: Optional[date] = None,
+    class_id: Optional[int] = None,
+    format: str = Query("json", pattern="^(json|csv|parquet)$"),
+):
+    """Per-student attendance percentage, overall and per subject."""
+    return await report_response("percentages", start_date, end_date, class_id, 75.0, format)
+
+
+@app.get("/reports/defaulters")
+async def defaulters_report(
+    start_date: date,
+    end_date: Optional[date] = None,
+    class_id: Optional[int] = None,
+    threshold: float = Query(75.0, ge=0, le=100),
+    format: str = Query("json", pattern="^(json|csv|parquet)$"),
+):
+    """Students below the threshold overall or in any subject."""
+    return await report_response("defaulters", start_date, end_date, class_id, threshold, format)
+
+
+@app.get("/reports/monthly")
+async def monthly_report(
+    start_date: date,
+    end_date: Optional[date] = None,
+    class_id: Optional[int] = None,
+    format: str = Query("json", pattern="^(json|csv|parquet)$"),
+):
+    """Student x subject x month attendance percentage matrix."""
+    return await report_response("monthly", start_date, end_date, class_id, 75.0, format)
 
 
 @app.get("/attendance")
-async def get_attendance():
-    if not hasattr(db, "get_attendance_logs"):
-        return {"message": "Attendance logs not implemented yet"}
-    return db.get_attendance_logs()
+async def get_attendance(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    subject_id: Optional[int] = None,
+    class_id: Optional[int] = None,
+    prn: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson|csv)$"),
+    include_archived: bool = False,
+):
+    """Keyset-paginated attendance logs (newest first), or streamed as NDJSON/CSV.
+
+    Pass the returned ``next_cursor`` back as ``cursor`` to fetch the next page.
+    Streaming formats ignore ``limit`` and return every matching row; with
+    ``include_archived`` they also read months moved to the archive.
+    """
+    filters = dict(start_date=start_date, end_date=end_date, subject_id=subject_id,
+                   class_id=class_id, prn=prn)
+    try:
+        if cursor:
+            db.decode_page_cursor(cursor, db.ATTENDANCE_CURSOR)
+        if include_archived and (format == "json" or cursor):
+            raise ValueError("include_archived is only supported for ndjson/csv without a cursor")
+        if format != "json":
+            if include_archived:
+                rows = db.iter_historical_attendance(**filters)
+            else:
+                rows = db.iter_attendance_logs(cursor=cursor, **filters)
+            return streaming_response(rows, format, ATTENDANCE_FIELDS, "attendance")
+        return await adb.get_attendance_page(limit=limit, cursor=cursor, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/attendance/log")
 async def log_attendance(payload: AttendanceLogPayload):
     """Log attendance for a recognized person."""
     try:
-        success = db.log_attendance(payload.prn, payload.subject_id)
+        success = await adb.log_attendance(payload.prn, payload.subject_id, payload.camera_id,
+                                           payload.direction, payload.confidence)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to log attendance")
+        occupancy.observe(payload.prn, payload.direction, payload.camera_id)
+        rosters.mark(payload.prn, payload.subject_id)
 
         direction = payload.direction or "UNKNOWN"
         return {
@@ -178,6 +549,105 @@ async def log_attendance(payload: AttendanceLogPayload):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/attendance/bulk")
+async def bulk_log_attendance(request: Request):
+    """
+    Ingest a batch of attendance events from an edge device.
+
+    Body is NDJSON (application/x-ndjson) or the ATB1 binary encoding
+    (application/x-attendance-batch), optionally with Content-Encoding gzip.
+    Invalid events are counted and skipped; the rest are written in one transaction.
+    """
+    body = await request.body()
+    if len(body) > INGEST_CONFIG['max_body_bytes']:
+        raise HTTPException(status_code=413, detail="Batch too large")
+    try:
+        return await adb.run(ingestor.ingest, body, request.headers.get('content-type'),
+                             request.headers.get('content-encoding'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def rebuild_occupancy():
+    """Replay today's IN/OUT log entries into the occupancy tracker"""
+    return occupancy.rebuild(db.iter_direction_events(occupancy.day_start()))
+
+
+@app.get("/occupancy")
+async def current_occupancy():
+    """People inside now, in total and per room, from memory (no database query)."""
+    return occupancy.summary()
+
+
+@app.get("/occupancy/people")
+async def people_inside(room: Optional[str] = None):
+    """Everyone currently inside, optionally in one room."""
+    return {"room": room, "items": occupancy.people_inside(room)}
+
+
+@app.get("/occupancy/people/{prn}")
+async def person_presence(prn: str):
+    """Whether a person is inside now, where, and since when."""
+    presence = occupancy.presence(prn)
+    if presence is None:
+        raise HTTPException(status_code=404, detail="No IN/OUT events for this person today")
+    return presence
+
+
+@app.post("/occupancy/rebuild")
+async def rebuild_occupancy_endpoint():
+    """Rebuild occupancy from today's logged IN/OUT events (e.g. after a bulk upload)."""
+    events = await adb.run(rebuild_occupancy)
+    return {"events_replayed": events, **occupancy.summary(), "stats": occupancy.get_stats()}
+
+
+def rebuild_rosters():
+    """Reload students and the timetable and replay recent marks into the roster bitmaps"""
+    since = date.today() - timedelta(days=ROSTER_CONFIG['history_days'])
+    return rosters.rebuild(db.get_student_classes(), db.get_timetable_entries(), db.iter_first_marks(since))
+
+
+@app.get("/rosters/sessions")
+async def roster_sessions(day: Optional[date] = None, subject_id: Optional[int] = None,
+                          class_id: Optional[int] = None):
+    """Expected/present/absent/late counts for each session (subject and day) held."""
+    return [rosters.session_summary(session_day, session_subject, class_id)
+            for session_day, session_subject in rosters.list_sessions(day, subject_id)]
+
+
+@app.get("/rosters/sessions/{day}/{subject_id}")
+async def roster_session(day: date, subject_id: int, class_id: Optional[int] = None,
+                         kind: str = Query("absent", pattern="^(present|absent|late)$")):
+    """PRNs present, absent or late at one session."""
+    _, present, absent, late = rosters.session_bitmaps(day, subject_id, class_id)
+    bits = {"present": present, "absent": absent, "late": late}[kind]
+    return {**rosters.session_summary(day, subject_id, class_id), "kind": kind, "prns": rosters.prns_of(bits)}
+
+
+@app.get("/rosters/absent-streak")
+async def roster_absent_streak(subject_id: int, sessions: int = Query(3, ge=1, le=50),
+                               class_id: Optional[int] = None, until: Optional[date] = None):
+    """Students absent from each of the last N sessions of a subject."""
+    days, bits = rosters.absent_streak(subject_id, sessions, class_id, until)
+    return {"subject_id": subject_id, "sessions": [day.isoformat() for day in days],
+            "complete": len(days) == sessions, "prns": rosters.prns_of(bits)}
+
+
+@app.get("/rosters/absent-today")
+async def roster_absent_today(class_id: Optional[int] = None, day: Optional[date] = None):
+    """Students not marked in any session of the day."""
+    bits = rosters.absent_all_day(day, class_id)
+    return {"day": (day or date.today()).isoformat(), "class_id": class_id,
+            "count": bits.bit_count(), "prns": rosters.prns_of(bits)}
+
+
+@app.post("/rosters/rebuild")
+async def rebuild_rosters_endpoint():
+    """Rebuild roster bitmaps after enrollments or timetable changes."""
+    marks = await adb.run(rebuild_rosters)
+    return {"marks_replayed": marks, **rosters.get_stats()}
+
+
 @app.post("/cameras/config")
 async def configure_camera(payload: CameraConfigPayload):
     """Set camera direction (IN/OUT/BOTH) for IN-OUT tracking."""
@@ -205,5 +675,268 @@ async def get_camera_direction(camera_id: str):
     return {"camera_id": camera_id, "direction": direction}
 
 
+@app.websocket("/ws/detections")
+async def live_detections(websocket: WebSocket, camera_id: Optional[str] = None):
+    """Live detection/recognition events, optionally for one camera.
+
+    Each message is one compact JSON event (see camera_pipeline). Slow viewers
+    skip stale frames instead of delaying the pipeline or other viewers.
+    """
+    await websocket.accept()
+    subscription = event_bus.subscribe(camera_id)
+    # Viewers send nothing, but reading the socket notices a disconnect even while no events arrive
+    disconnected = asyncio.ensure_future(wait_for_disconnect(websocket))
+    try:
+        while True:
+            event = asyncio.ensure_future(subscription.get())
+            await asyncio.wait((event, disconnected), return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                event.cancel()
+                break
+            await websocket.send_text(event.result())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        disconnected.cancel()
+        event_bus.unsubscribe(subscription)
+
+
+async def wait_for_disconnect(websocket):
+    """Return once the client disconnects, discarding anything it sends"""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+    except (WebSocketDisconnect, RuntimeError):
+        return
+
+
+@app.get("/live/stats")
+async def live_stats():
+    """Event fan-out counters and the state of each headless camera worker."""
+    return {
+        "events": event_bus.get_stats(),
+        "cooldowns": pipeline.cooldowns.get_stats(),
+        "cameras": [worker.status() for worker in camera_workers.values()],
+    }
+
+
+MJPEG_BOUNDARY = "frame"
+
+
+def preview_tier(tier):
+    if tier not in PREVIEW_CONFIG['tiers']:
+        raise HTTPException(status_code=400, detail=(
+            f"Unknown tier '{tier}', expected one of {', '.join(PREVIEW_CONFIG['tiers'])}"))
+    return tier
+
+
+@app.get("/cameras/{camera_id}/preview.jpg")
+async def camera_snapshot(camera_id: str, tier: str = "full"):
+    """Latest annotated frame of a camera as a single JPEG."""
+    loop = asyncio.get_running_loop()
+    _, jpeg = await loop.run_in_executor(None, frame_hub.get_jpeg, camera_id, preview_tier(tier))
+    if jpeg is None:
+        raise HTTPException(status_code=404, detail=f"No frames from camera '{camera_id}'")
+    return Response(jpeg, media_type="image/jpeg", headers={"Cache-Control": "no-store"})
+
+
+@app.get("/cameras/{camera_id}/stream.mjpg")
+async def camera_stream(
+    camera_id: str,
+    tier: str = "full",
+    fps: float = Query(PREVIEW_CONFIG['default_fps'], gt=0, le=PREVIEW_CONFIG['max_fps']),
+):
+    """Annotated camera frames as an MJPEG stream, capped at ``fps`` for this viewer.
+
+    Frames are shared: each one is encoded once per tier however many viewers
+    are connected; viewers slower than the camera simply skip frames.
+    """
+    tier = preview_tier(tier)
+    if not frame_hub.latest_sequence(camera_id):
+        raise HTTPException(status_code=404, detail=f"No frames from camera '{camera_id}'")
+
+    async def frames():
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / fps
+        last_sequence = 0
+        frame_hub.viewer_joined(tier)
+        try:
+            while True:
+                started = loop.time()
+                if frame_hub.latest_sequence(camera_id) != last_sequence:
+                    sequence, jpeg = await loop.run_in_executor(None, frame_hub.get_jpeg, camera_id, tier)
+                    if jpeg is not None and sequence != last_sequence:
+                        last_sequence = sequence
+                        yield (f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                               f"Content-Length: {len(jpeg)}\r\n\r\n").encode() + jpeg + b"\r\n"
+                await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+        finally:
+            frame_hub.viewer_left(tier)
+
+    return StreamingResponse(frames(), media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+                             headers={"Cache-Control": "no-store"})
+
+
+@app.get("/perf/stages")
+async def stage_timings(camera_id: Optional[str] = None):
+    """Latency histogram summaries per camera and pipeline stage."""
+    return tracer.summary(camera_id)
+
+
+@app.post("/perf/trace/start")
+async def start_trace(max_events: int = Query(200000, ge=1000, le=5000000)):
+    """Start buffering stage samples for a Chrome trace."""
+    tracer.start_trace(max_events)
+    return {"detail": "Trace recording started", "max_events": max_events}
+
+
+@app.post("/perf/trace/stop")
+async def stop_trace():
+    """Stop recording and return the trace (open it in chrome://tracing or Perfetto)."""
+    return tracer.trace_events(tracer.stop_trace())
+
+
+@app.get("/preview/stats")
+async def preview_stats():
+    """Encodes, frames served, viewers and encode time per preview tier."""
+    return frame_hub.get_stats()
+
+
+def gauge(name, help_text, value, labels=None):
+    return (name, 'gauge', help_text, [('', labels or {}, value)])
+
+
+@metrics_registry.collector
+def database_metrics():
+    pool = db.get_pool_stats()
+    queries = db.get_query_stats()
+    return [
+        ('attendance_db_pool_connections', 'gauge', 'Database connections by state',
+         [('', {'state': 'in_use'}, pool['in_use']), ('', {'state': 'available'}, pool['available'])]),
+        gauge('attendance_db_pool_max_connections', 'Connection pool size', pool['max_connections']),
+        gauge('attendance_db_pool_waiting', 'Threads waiting for a connection', pool['waiting']),
+        ('attendance_db_pool_checkouts_total', 'counter', 'Connection checkouts',
+         [('', {}, pool['checkouts'])]),
+        ('attendance_db_pool_waited_checkouts_total', 'counter', 'Checkouts that had to wait',
+         [('', {}, pool['waited_checkouts'])]),
+        ('attendance_db_pool_exhausted_total', 'counter', 'Checkouts that timed out on a full pool',
+         [('', {}, pool['exhausted'])]),
+        ('attendance_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for connections',
+         [('', {}, pool['total_wait_ms'] / 1000.0)]),
+        ('attendance_db_queries_total', 'counter', 'Database statements executed',
+         [('', {'query': name}, stats['calls']) for name, stats in queries.items()]),
+        ('attendance_db_query_seconds_total', 'counter', 'Time spent in database statements',
+         [('', {'query': name}, stats['total_ms'] / 1000.0) for name, stats in queries.items()]),
+    ]
+
+
+# Every other tracer bucket (x2 apart) keeps the exposition compact; cumulative counts stay exact
+STAGE_BUCKET_INDEXES = range(0, len(BUCKET_BOUNDS_MS), 2)
+
+
+@metrics_registry.collector
+def stage_metrics():
+    samples = []
+    for camera, stage, counts, total_ms, count in tracer.snapshot():
+        cumulative, running, index = [], 0, 0
+        for bucket in STAGE_BUCKET_INDEXES:
+            while index <= bucket:
+                running += counts[index]
+                index += 1
+            cumulative.append(running)
+        samples.extend(histogram_samples(
+            [BUCKET_BOUNDS_MS[bucket] / 1000.0 for bucket in STAGE_BUCKET_INDEXES], cumulative,
+            total_ms / 1000.0, count, {'camera': camera if camera is not None else 'default', 'stage': stage}))
+    return [('attendance_stage_duration_seconds', 'histogram',
+             'Recognition pipeline stage latency (capture, detect, embed, match, db, ...)', samples)]
+
+
+@metrics_registry.collector
+def recognition_metrics():
+    with face_engine.lock:
+        recognized = dict(face_engine.recognition_stats)
+        identities, templates = len(face_engine.gallery), face_engine.gallery.template_count
+    batcher = recognition_batcher.get_stats()
+    events = event_bus.get_stats()
+    previews = frame_hub.get_stats()['tiers']
+    return [
+        ('attendance_faces_recognized_total', 'counter', 'Faces run through gallery matching',
+         [('', {}, recognized['faces'])]),
+        ('attendance_faces_matched_total', 'counter', 'Faces matched to an enrolled student',
+         [('', {}, recognized['matched'])]),
+        gauge('attendance_gallery_identities', 'Students in the recognition gallery', identities),
+        gauge('attendance_gallery_templates', 'Face templates in the recognition gallery', templates),
+        gauge('attendance_db_write_queue_depth', 'Database calls waiting for an API worker thread',
+              adb.queue_depth()),
+        gauge('attendance_recognition_queue_depth', 'Frames waiting for a recognition batch',
+              batcher['queue_depth']),
+        gauge('attendance_event_subscribers', 'Connected live event subscribers', events['subscribers']),
+        ('attendance_events_dropped_total', 'counter', 'Live events dropped for slow subscribers',
+         [('', {}, events['dropped'])]),
+        ('attendance_preview_viewers', 'gauge', 'Connected preview viewers per tier',
+         [('', {'tier': tier}, values['viewers']) for tier, values in previews.items()]),
+        gauge('attendance_cooldown_entries', 'Attendance cooldowns in force', len(pipeline.cooldowns)),
+        gauge('attendance_occupancy_total', 'People currently inside', occupancy.summary()['total']),
+        ('attendance_process_cpu_seconds_total', 'counter', 'CPU time used by the API process',
+         [('', {}, time.process_time())]),
+    ]
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
+
+
+def start_camera_workers():
+    if not LIVE_EVENTS_CONFIG['cameras']:
+        return
+    from camera_manager import CameraManager
+
+    camera_manager = CameraManager(CAMERA_CONFIG)
+    for camera in LIVE_EVENTS_CONFIG['cameras']:
+        worker = CameraWorker(
+            pipeline, camera_manager, camera['camera_id'], camera.get('source', 0),
+            subject_id=camera.get('subject_id'), room=camera.get('room'),
+            process_every_n_frames=LIVE_EVENTS_CONFIG['process_every_n_frames'],
+            frame_hub=frame_hub,
+        )
+        if camera.get('direction'):
+            face_engine.set_camera_direction(worker.camera_id, camera['direction'])
+        camera_workers[worker.camera_id] = worker
+        worker.start()
+
+
+@app.on_event("startup")
+async def startup():
+    try:
+        await adb.run(load_gallery)
+    except Exception as e:
+        print(f"⚠ Face gallery not loaded: {e}")
+    try:
+        print(f"✓ Occupancy rebuilt from {await adb.run(rebuild_occupancy)} IN/OUT events")
+    except Exception as e:
+        print(f"⚠ Occupancy not rebuilt: {e}")
+    try:
+        print(f"✓ Roster bitmaps rebuilt from {await adb.run(rebuild_rosters)} marks")
+    except Exception as e:
+        print(f"⚠ Roster bitmaps not rebuilt: {e}")
+    recognition_batcher.start()
+    event_bus.bind_loop(asyncio.get_running_loop())
+    start_camera_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for worker in camera_workers.values():
+        worker.stop()
+    pipeline.cooldowns.close()
+    await recognition_batcher.close()
+    adb.close()
+    db.close()
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Move closed months of AttendanceLog into the cold-storage archive.
+
+Usage: python scripts/archive_attendance.py --before YYYY-MM-DD [--dry-run] [--measure]
+       python scripts/archive_attendance.py --list
+
+Every whole month that ends on or before --before (e.g. the last day of a
+closed term) is exported to a compressed columnar file under the archive
+root (ARCHIVE_CONFIG), recorded in AttendanceArchive and removed from the
+live table. --measure also reports live vs archived size and the time to
+read each month from PostgreSQL vs from the archive.
+
+Rows that reach an already archived month later (e.g. offline uploads via
+/attendance/bulk) are merged into its archive file on the next run. A month
+that fails is reported and the run carries on with the next one.
+"""
+import os
+import sys
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_config import DB_CONFIG  # noqa: E402
+from database_manager import DatabaseManager  # noqa: E402
+from attendance_archive import archive_month  # noqa: E402
+
+
+def closed_months(db, before):
+    """Months with live rows that end on or before `before`"""
+    with db.get_connection(readonly=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT DISTINCT date_trunc('month', timestamp)::date
+                FROM AttendanceLog
+                WHERE timestamp < date_trunc('month', %s::date + 1)
+                ORDER BY 1
+            """, (before,))
+            return [row[0] for row in cur.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--before', type=date.fromisoformat,
+                        help='Archive whole months ending on or before this date')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--measure', action='store_true')
+    parser.add_argument('--list', action='store_true', help='List archived months and exit')
+    args = parser.parse_args()
+
+    if not args.list and not args.before:
+        parser.error("--before is required unless --list is given")
+
+    db = DatabaseManager(DB_CONFIG)
+    try:
+        if args.list:
+            for entry in db.get_archived_months():
+                print(f"{entry['month']:%Y-%m}  {entry['row_count']:>12,} rows  "
+                      f"{entry['file_bytes'] / 1e6:>9.1f} MB  {entry['file_path']}")
+            return 0
+
+        months = closed_months(db, args.before)
+        if not months:
+            print("Nothing to archive")
+            return 0
+        if args.dry_run:
+            print("Would archive: " + ", ".join(f"{m:%Y-%m}" for m in months))
+            return 0
+
+        totals = {'rows': 0, 'live_bytes': 0, 'archive_bytes': 0}
+        failed = []
+        for month in months:
+            try:
+                stats = archive_month(db, db.archive, month, measure=args.measure)
+            except Exception as exc:
+                failed.append(month)
+                print(f"✗ {month:%Y-%m}: {exc}")
+                continue
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+            if stats.get('merged'):
+                line = (f"✓ {month:%Y-%m}: merged {stats['rows']:,} late rows -> "
+                        f"{stats['archive_bytes'] / 1e6:.1f} MB")
+            else:
+                line = f"✓ {month:%Y-%m}: {stats['rows']:,} rows -> {stats['archive_bytes'] / 1e6:.1f} MB"
+            if args.measure:
+                line += (f" (live {stats.get('live_bytes', 0) / 1e6:.1f} MB; "
+                         f"scan live {stats['live_scan_ms']:.0f} ms, "
+                         f"archive {stats['archive_scan_ms']:.0f} ms load / "
+                         f"{stats['archive_rows_ms']:.0f} ms rows)")
+            print(line)
+
+        if args.measure and totals['archive_bytes']:
+            ratio = totals['live_bytes'] / totals['archive_bytes']
+            print(f"Total: {totals['rows']:,} rows, live {totals['live_bytes'] / 1e6:.1f} MB -> "
+                  f"archive {totals['archive_bytes'] / 1e6:.1f} MB ({ratio:.1f}x smaller)")
+        if failed:
+            print(f"⚠ {len(failed)} month(s) not archived: " + ", ".join(f"{m:%Y-%m}" for m in failed))
+            return 1
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Backfill or verify the daily attendance rollup tables.
+
+Usage: python scripts/attendance_rollups.py backfill [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+       python scripts/attendance_rollups.py check [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+
+`backfill` rebuilds AttendanceDailyRollup and ClassDailyRollup from the raw
+AttendanceLog for the date range (all dates by default). `check` compares
+them and exits with code 2 when they disagree.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_config import DB_CONFIG  # noqa: E402
+from database_manager import DatabaseManager  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=('backfill', 'check'))
+    parser.add_argument('--start', type=date.fromisoformat, help='First day (inclusive)')
+    parser.add_argument('--end', type=date.fromisoformat, help='Last day (inclusive)')
+    args = parser.parse_args()
+
+    db = DatabaseManager(DB_CONFIG)
+    try:
+        start = time.perf_counter()
+        if args.command == 'backfill':
+            result = db.backfill_attendance_rollups(args.start, args.end)
+            print(f"✓ Rebuilt {result['student_rows']} student and {result['class_rows']} class "
+                  f"rollup rows in {time.perf_counter() - start:.1f}s")
+            return 0
+
+        result = db.check_attendance_rollups(args.start, args.end)
+        if result['student_mismatches'] or result['class_mismatches']:
+            print(f"✗ Rollups differ from the raw log: {result['student_mismatches']} student, "
+                  f"{result['class_mismatches']} class mismatches")
+            print(json.dumps({k: result[k] for k in ('student_samples', 'class_samples')}, indent=2))
+            return 2
+        print(f"✓ Rollups match the raw log ({time.perf_counter() - start:.1f}s)")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Benchmark dashboard and per-student attendance queries on a large synthetic log.
+
+Usage: python scripts/bench_attendance_queries.py [--rows 50000000] [--students 20000]
+                                                  [--months 12] [--skip-load]
+
+Loads synthetic rows into an isolated `bench_attendance` schema (generated
+server-side with generate_series, in chunks) and times the hot read paths,
+including the old non-sargable DATE(timestamp) predicate for comparison.
+Use --skip-load to re-run the queries against an existing bench schema.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_config import DB_CONFIG  # noqa: E402
+from database_manager import DatabaseManager  # noqa: E402
+
+BENCH_SCHEMA = 'bench_attendance'
+CHUNK_ROWS = 1_000_000
+
+QUERIES = {
+    'dashboard_today_sargable': """
+        SELECT COUNT(DISTINCT prn_no) FROM AttendanceLog
+        WHERE timestamp >= CURRENT_DATE AND timestamp < CURRENT_DATE + 1
+    """,
+    'dashboard_today_date_fn': """
+        SELECT COUNT(DISTINCT prn_no) FROM AttendanceLog
+        WHERE DATE(timestamp) = CURRENT_DATE
+    """,
+    'student_last_30_days': """
+        SELECT timestamp, subject_id, status FROM AttendanceLog
+        WHERE prn_no = %(prn)s AND timestamp >= CURRENT_DATE - 30
+        ORDER BY timestamp DESC
+    """,
+    'subject_one_day': """
+        SELECT COUNT(DISTINCT prn_no) FROM AttendanceLog
+        WHERE subject_id = %(subject_id)s
+          AND timestamp >= CURRENT_DATE - 1 AND timestamp < CURRENT_DATE
+    """,
+    'latest_page': """
+        SELECT log_id, prn_no, subject_id, timestamp, status FROM AttendanceLog
+        ORDER BY timestamp DESC, log_id DESC LIMIT 100
+    """,
+}
+
+
+def load_data(db, rows, students, subjects, months):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE AttendanceLog, FaceEncodings, Students CASCADE")
+            cur.execute("SELECT class_id FROM Classes ORDER BY class_id LIMIT 1")
+            class_id = cur.fetchone()[0]
+            cur.execute("""
+                INSERT INTO Students (prn_no, class_id, roll_no, name)
+                SELECT 'S' || lpad(g::text, 8, '0'), %s, g, 'Student ' || g
+                FROM generate_series(0, %s - 1) AS g
+            """, (class_id, students))
+            cur.execute("""
+                INSERT INTO Subjects (subject_name, subject_code)
+                SELECT 'Bench Subject ' || g, 'BS' || g FROM generate_series(1, %s) AS g
+                ON CONFLICT (subject_name) DO NOTHING
+            """, (subjects,))
+
+    start_day = date.today() - timedelta(days=months * 30)
+    db.ensure_attendance_partitions(start_day, date.today())
+
+    loaded = 0
+    start = time.perf_counter()
+    while loaded < rows:
+        chunk = min(CHUNK_ROWS, rows - loaded)
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO AttendanceLog (prn_no, subject_id, timestamp, status)
+                    SELECT 'S' || lpad((floor(random() * %(students)s))::int::text, 8, '0'),
+                           (SELECT MIN(subject_id) FROM Subjects) + floor(random() * %(subjects)s)::int,
+                           CURRENT_TIMESTAMP - random() * make_interval(days => %(days)s),
+                           'present'
+                    FROM generate_series(1, %(chunk)s)
+                """, {'students': students, 'subjects': subjects, 'days': months * 30, 'chunk': chunk})
+        loaded += chunk
+        rate = loaded / (time.perf_counter() - start)
+        print(f"  loaded {loaded:,}/{rows:,} rows ({rate:,.0f} rows/s)")
+
+    # VACUUM cannot run inside a transaction; read-only connections use autocommit
+    with db.get_connection(readonly=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE AttendanceLog")
+
+
+def time_query(db, sql, params, repeats):
+    timings = []
+    with db.get_connection(readonly=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute("EXPLAIN " + sql, params)
+            plan = "\n".join(row[0] for row in cur.fetchall())
+            for _ in range(repeats):
+                start = time.perf_counter()
+                cur.execute(sql, params)
+                cur.fetchall()
+                timings.append((time.perf_counter() - start) * 1000.0)
+    timings = np.asarray(timings)
+    return {
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'uses_index': 'Index' in plan,
+        'partitions_scanned': plan.count(' on attendancelog_'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50_000_000)
+    parser.add_argument('--students', type=int, default=20_000)
+    parser.add_argument('--subjects', type=int, default=40)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    db = DatabaseManager(dict(DB_CONFIG, schema=BENCH_SCHEMA))
+    try:
+        if not args.skip_load:
+            load_data(db, args.rows, args.students, args.subjects, args.months)
+
+        with db.get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT MIN(subject_id) FROM Subjects")
+                params = {'prn': 'S00000042', 'subject_id': cur.fetchone()[0]}
+
+        results = {}
+        print(f"{'query':<28}{'p50 ms':>10}{'p95 ms':>10}  index  partitions")
+        for name, sql in QUERIES.items():
+            result = time_query(db, sql, params, args.repeats)
+            results[name] = result
+            print(f"{name:<28}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                  f"  {'yes' if result['uses_index'] else 'no':<5}  {result['partitions_scanned']}")
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as fh:
+                json.dump({'args': vars(args), 'results': results}, fh, indent=2)
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Measure recognition throughput with one to N engines on this host.
+
+Usage: python scripts/bench_engines.py [--engines 1 2 4 8] [--images 'frames/*.jpg' | --video gate.mp4]
+           [--duration 20] [--untuned] [--providers CPUExecutionProvider]
+           [--intra-threads N] [--graph-opt all] [--json out.json]
+
+For each engine count, that many processes each load a FaceRecognitionEngine
+with INFERENCE_RUNTIME_CONFIG (engines_per_host set to the count, so the
+cores are split between them), warm up, then start together and run
+detect_and_encode_face over the same frames for --duration seconds.
+
+The report shows total and per-engine frames/s, p50/p95 latency, and the
+speedup and scaling efficiency against the first engine count. --untuned
+runs with the library default thread counts instead, to show what
+oversubscription costs. Without --images or --video a synthetic frame is
+used, which measures detection only.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_config import FACE_RECOGNITION_CONFIG  # noqa: E402
+from health_checks import load_probe_frame  # noqa: E402
+
+
+def load_frames(args):
+    import cv2
+
+    if args.images:
+        paths = sorted(path for pattern in args.images for path in glob.glob(pattern))
+        frames = [frame for frame in (cv2.imread(path) for path in paths[:args.max_frames]) if frame is not None]
+    elif args.video:
+        capture = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < args.max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+    else:
+        frames = [load_probe_frame(None)]
+    if not frames:
+        raise SystemExit("✗ No frames could be read")
+    return frames
+
+
+def run_engine(config, frames, warmup, duration, barrier, results):
+    """One engine process: load, warm up, wait for the others, then run for duration seconds"""
+    try:
+        from face_recognition_engine import FaceRecognitionEngine
+
+        engine = FaceRecognitionEngine(config)
+        for i in range(warmup):
+            engine.detect_and_encode_face(frames[i % len(frames)])
+        barrier.wait()
+        latencies = []
+        started = time.perf_counter()
+        while time.perf_counter() - started < duration:
+            frame_start = time.perf_counter()
+            engine.detect_and_encode_face(frames[len(latencies) % len(frames)])
+            latencies.append((time.perf_counter() - frame_start) * 1000.0)
+        results.put({
+            'frames': len(latencies),
+            'elapsed_s': time.perf_counter() - started,
+            'latencies_ms': latencies,
+            'threads': engine.threads,
+            'providers': engine.model_status()['providers'].get('detection', []),
+        })
+    except threading.BrokenBarrierError:
+        results.put({'error': 'another engine failed to start'})
+    except Exception as exc:
+        barrier.abort()
+        results.put({'error': f"{type(exc).__name__}: {exc}"})
+
+
+def run_engines(count, config, frames, args):
+    context = multiprocessing.get_context('spawn')  # fresh thread pools per engine, like separate services
+    barrier = context.Barrier(count)
+    results = context.Queue()
+    processes = [context.Process(target=run_engine,
+                                 args=(config, frames, args.warmup, args.duration, barrier, results))
+                 for _ in range(count)]
+    for process in processes:
+        process.start()
+    engines = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    errors = [engine['error'] for engine in engines if 'error' in engine]
+    if errors:
+        raise RuntimeError(errors[0])
+    latencies = np.concatenate([engine['latencies_ms'] for engine in engines])
+    per_engine = [engine['frames'] / engine['elapsed_s'] for engine in engines]
+    return {
+        'engines': count,
+        'total_fps': float(sum(per_engine)),
+        'per_engine_fps': float(np.mean(per_engine)),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'threads': engines[0]['threads'],
+        'providers': engines[0]['providers'],
+    }
+
+
+def engine_config(count, args):
+    runtime = dict(FACE_RECOGNITION_CONFIG.get('runtime', {}), engines_per_host=1 if args.untuned else count)
+    if args.untuned:
+        runtime.update(intra_op_threads=0, inter_op_threads=0, torch_threads=None, opencv_threads=None)
+    if args.providers:
+        runtime['providers'] = args.providers
+    if args.intra_threads is not None:
+        runtime['intra_op_threads'] = args.intra_threads
+    if args.graph_opt:
+        runtime['graph_optimization'] = args.graph_opt
+    config = dict(FACE_RECOGNITION_CONFIG, runtime=runtime)
+    if args.use_yolo is not None:
+        config['use_yolo'] = bool(args.use_yolo)
+    return config
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_counts = [n for n in (1, 2, 4, 8, 16, 32) if n <= cores] or [1]
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--engines', type=int, nargs='+', default=default_counts,
+                        help='Engine counts to run (default: powers of two up to the core count)')
+    parser.add_argument('--images', nargs='+', help='Image files or glob patterns to use as frames')
+    parser.add_argument('--video', help='Video file to take frames from')
+    parser.add_argument('--max-frames', type=int, default=200, help='Frames loaded from --images/--video')
+    parser.add_argument('--duration', type=float, default=20.0, help='Timed seconds per engine count')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed frames per engine before the start')
+    parser.add_argument('--untuned', action='store_true', help='Keep library default thread counts')
+    parser.add_argument('--providers', nargs='+', help='ONNX Runtime providers, in order of preference')
+    parser.add_argument('--intra-threads', type=int, help='Fixed ONNX Runtime intra-op threads per engine')
+    parser.add_argument('--graph-opt', choices=('disable', 'basic', 'extended', 'all'))
+    parser.add_argument('--use-yolo', type=int, choices=(0, 1), help='Override use_yolo')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    print(f"✓ {len(frames)} frame(s), {cores} cores, engine counts {args.engines}"
+          + (" (untuned threads)" if args.untuned else ""))
+
+    rows = []
+    for count in args.engines:
+        try:
+            row = run_engines(count, engine_config(count, args), frames, args)
+        except RuntimeError as exc:
+            print(f"✗ {count} engine(s): {exc}")
+            return 1
+        base = rows[0] if rows else row
+        row['speedup'] = row['total_fps'] / base['total_fps']
+        row['efficiency'] = row['speedup'] / (count / base['engines'])
+        rows.append(row)
+        print(f"  {count:>3} engine(s): {row['total_fps']:7.1f} fps total, {row['per_engine_fps']:6.1f} per engine, "
+              f"p50 {row['p50_ms']:6.1f} ms, p95 {row['p95_ms']:6.1f} ms, x{row['speedup']:.2f} "
+              f"({row['efficiency']:.0%} efficiency, intra-op {row['threads']['intra_op'] or 'auto'})")
+
+    best = max(rows, key=lambda row: row['total_fps'])
+    print(f"✓ Best throughput: {best['engines']} engine(s), {best['total_fps']:.1f} fps "
+          f"on {', '.join(best['providers']) or 'default providers'}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump({'cores': cores, 'frames': len(frames), 'untuned': args.untuned,
+                       'duration_s': args.duration, 'results': rows}, fh, indent=2)
+        print(f"✓ Results written to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
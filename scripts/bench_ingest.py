@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Compare events/s of the single-event and bulk attendance endpoints.
+
+Usage: python scripts/bench_ingest.py [--base-url URL] [--events 20000] [--batch-size 5000]
+                                      [--concurrency 8] [--prn P001 --prn P002 ...] [--subject 1 ...]
+
+Sends the same number of synthetic events through POST /attendance/log
+(one request per event from N threads) and through POST /attendance/bulk as
+NDJSON, binary, and gzip-compressed binary. PRNs and subjects default to
+the first 1000 students and all subjects returned by the API.
+
+Events are spread over the last day with distinct timestamps so the
+dedupe step keeps most of them; every run adds real rows to AttendanceLog,
+so point it at a scratch database.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen, Request
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_ingest import encode_binary_batch  # noqa: E402
+
+
+def fetch_json(url, timeout=30):
+    with urlopen(Request(url), timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def post(url, body, content_type, content_encoding=None, timeout=120):
+    headers = {'Content-Type': content_type}
+    if content_encoding:
+        headers['Content-Encoding'] = content_encoding
+    with urlopen(Request(url, data=body, headers=headers, method='POST'), timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def make_events(count, prns, subjects, seed):
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    # Spread over 24h, at least the dedupe window apart per student on average
+    offsets = np.sort(rng.uniform(0, 86400, size=count))
+    return [{
+        'prn': prns[rng.integers(len(prns))],
+        'subject_id': int(subjects[rng.integers(len(subjects))]),
+        'timestamp': now - 86400 + float(offset),
+        'camera_id': f"gate-{rng.integers(4)}",
+        'direction': 'IN' if rng.random() < 0.5 else 'OUT',
+        'confidence': round(float(rng.uniform(60, 99)), 2),
+    } for offset in offsets]
+
+
+def bench_single(base_url, events, concurrency):
+    url = f"{base_url}/attendance/log"
+
+    def send(event):
+        payload = {key: event[key] for key in ('prn', 'subject_id', 'camera_id', 'direction', 'confidence')}
+        try:
+            post(url, json.dumps(payload).encode(), 'application/json')
+            return True
+        except OSError:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        ok = sum(pool.map(send, events))
+    return ok, time.perf_counter() - started, 0
+
+
+def bench_bulk(base_url, events, batch_size, mode):
+    url = f"{base_url}/attendance/bulk"
+    inserted, sent_bytes = 0, 0
+    started = time.perf_counter()
+    for start in range(0, len(events), batch_size):
+        chunk = events[start:start + batch_size]
+        encoding = None
+        if mode == 'ndjson':
+            body, content_type = '\n'.join(json.dumps(e) for e in chunk).encode(), 'application/x-ndjson'
+        else:
+            body, content_type = encode_binary_batch(chunk), 'application/x-attendance-batch'
+        if mode == 'binary+gzip':
+            body, encoding = gzip.compress(body, compresslevel=1), 'gzip'
+        sent_bytes += len(body)
+        inserted += post(url, body, content_type, encoding)['inserted']
+    return inserted, time.perf_counter() - started, sent_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--single-events', type=int, default=2000,
+                        help='Events for the single-event endpoint (it is much slower)')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--prn', action='append', help='PRN to use (repeatable)')
+    parser.add_argument('--subject', action='append', type=int, help='Subject id to use (repeatable)')
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    prns = args.prn or [s['prn'] for s in fetch_json(f"{base_url}/students?limit=1000")['items']]
+    subjects = args.subject or [s['id'] for s in fetch_json(f"{base_url}/subjects")]
+    if not prns or not subjects:
+        print("✗ Need at least one student and one subject")
+        return 1
+
+    rows = []
+    inserted, elapsed, _ = bench_single(base_url, make_events(args.single_events, prns, subjects, 1),
+                                        args.concurrency)
+    rows.append(('single', args.single_events, inserted, elapsed, 0))
+    for seed, mode in enumerate(('ndjson', 'binary', 'binary+gzip'), start=2):
+        inserted, elapsed, sent_bytes = bench_bulk(
+            base_url, make_events(args.events, prns, subjects, seed), args.batch_size, mode)
+        rows.append((mode, args.events, inserted, elapsed, sent_bytes))
+
+    print(f"{'mode':<13}{'events':>8}{'inserted':>10}{'seconds':>9}{'events/s':>11}{'bytes/event':>13}")
+    for mode, sent, inserted, elapsed, sent_bytes in rows:
+        per_event = f"{sent_bytes / sent:.1f}" if sent_bytes else '-'
+        print(f"{mode:<13}{sent:>8}{inserted:>10}{elapsed:>9.2f}{sent / elapsed:>11.0f}{per_event:>13}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Compare in-memory and pgvector face matching latency.
+
+Usage: python scripts/bench_matcher.py [--gallery-size N | --gallery FILE.npz] [--faces-per-frame F] [--pgvector]
+           [--classes C] [--templates T]
+
+Builds a synthetic gallery of random 512-d embeddings and times matching of
+F noisy probe faces per frame. With --pgvector the same gallery is loaded
+into an isolated `bench_matcher` schema and searched through the
+DatabaseManager ANN index, and recall against exact search is reported.
+With --classes the gallery is split into C class shards and matching a
+session's probes against one shard (with global fallback) is timed too.
+With --templates each identity gets T enrollment poses and probes are drawn
+from one of them; storing every pose with max / top-k mean scoring is
+compared against the old single averaged template.
+With --gallery the embeddings come from a gallery.npz written by
+scripts/generate_synthetic_data.py (clustered, several templates per
+student) instead of independent random vectors.
+"""
+import os
+import sys
+import io
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_matcher import InMemoryMatcher  # noqa: E402
+
+
+def make_gallery(size, dimension, seed):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((size, dimension)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    prns = [f"B{i:08d}" for i in range(size)]
+    return embeddings, prns
+
+
+def make_probes(embeddings, frames, faces_per_frame, noise, seed):
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.integers(0, len(embeddings), size=(frames, faces_per_frame))
+    probes = embeddings[picks] + noise * rng.standard_normal(
+        (frames, faces_per_frame, embeddings.shape[1])).astype(np.float32)
+    return picks, probes
+
+
+def summarize(name, timings, hits, total):
+    timings_ms = np.asarray(timings) * 1000.0
+    return {
+        'matcher': name,
+        'frames': len(timings),
+        'p50_ms': float(np.percentile(timings_ms, 50)),
+        'p95_ms': float(np.percentile(timings_ms, 95)),
+        'p99_ms': float(np.percentile(timings_ms, 99)),
+        'mean_ms': float(timings_ms.mean()),
+        'accuracy': hits / total if total else 0.0,
+    }
+
+
+def bench_memory(embeddings, prns, picks, probes, tolerance):
+    matcher = InMemoryMatcher(tolerance)
+    matcher.load(embeddings, prns)
+    timings, hits = [], 0
+    for frame_picks, frame_probes in zip(picks, probes):
+        start = time.perf_counter()
+        results = matcher.match(list(frame_probes))
+        timings.append(time.perf_counter() - start)
+        hits += sum(1 for (prn, _), idx in zip(results, frame_picks) if prn == prns[idx])
+    return summarize('memory', timings, hits, picks.size)
+
+
+def bench_sharded(embeddings, prns, picks, probes, tolerance, classes):
+    """Probes all come from class 0; search its shard first, then the whole gallery"""
+    gallery = InMemoryMatcher(tolerance)
+    gallery.load(embeddings, prns)
+    class_of_row = np.arange(len(prns)) % classes
+    shard = gallery.subset(np.flatnonzero(class_of_row == 0))
+
+    session_picks = (picks // classes) * classes  # remap every probe onto a class 0 student
+    session_probes = probes + (embeddings[session_picks] - embeddings[picks])
+
+    timings, hits = [], 0
+    for frame_picks, frame_probes in zip(session_picks, session_probes):
+        start = time.perf_counter()
+        results = shard.match(list(frame_probes))
+        misses = [i for i, (prn, _) in enumerate(results) if prn is None]
+        if misses:
+            for i, result in zip(misses, gallery.match([frame_probes[i] for i in misses])):
+                results[i] = result
+        timings.append(time.perf_counter() - start)
+        hits += sum(1 for (prn, _), idx in zip(results, frame_picks) if prn == prns[idx])
+    return summarize(f'memory-shard/{classes}', timings, hits, picks.size)
+
+
+def bench_templates(embeddings, prns, picks, noise, tolerance, templates, spread, seed):
+    """Each identity has T poses; probes are a random pose plus noise"""
+    rng = np.random.default_rng(seed + 2)
+    size, dimension = embeddings.shape
+    poses = embeddings[:, None, :] + spread * rng.standard_normal(
+        (size, templates, dimension)).astype(np.float32)
+    poses /= np.linalg.norm(poses, axis=2, keepdims=True)
+    pose_picks = rng.integers(0, templates, size=picks.shape)
+    probes = poses[picks, pose_picks] + noise * rng.standard_normal(
+        picks.shape + (dimension,)).astype(np.float32)
+
+    variants = [
+        ('single-mean', poses.mean(axis=1), prns, 'max'),
+        (f'multi{templates}-max', poses.reshape(-1, dimension), np.repeat(prns, templates), 'max'),
+        (f'multi{templates}-top2', poses.reshape(-1, dimension), np.repeat(prns, templates), 'topk_mean'),
+    ]
+    results = []
+    for name, rows, row_prns, aggregate in variants:
+        matcher = InMemoryMatcher(tolerance, max_templates=templates, aggregate=aggregate, top_k=2)
+        matcher.load(rows, [str(prn) for prn in row_prns])
+        timings, hits = [], 0
+        for frame_picks, frame_probes in zip(picks, probes):
+            start = time.perf_counter()
+            matched = matcher.match(list(frame_probes))
+            timings.append(time.perf_counter() - start)
+            hits += sum(1 for (prn, _), idx in zip(matched, frame_picks) if prn == prns[idx])
+        results.append(summarize(name, timings, hits, picks.size))
+    return results
+
+
+def load_pgvector_gallery(db, embeddings, prns):
+    """Bulk-load the synthetic gallery, then build the ANN index once."""
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE AttendanceLog, FaceEncodings, Students CASCADE")
+            cur.execute("DROP INDEX IF EXISTS faceencodings_embedding_hnsw_idx")
+            cur.execute("DROP INDEX IF EXISTS faceencodings_embedding_ivfflat_idx")
+            cur.execute("SELECT class_id FROM Classes ORDER BY class_id LIMIT 1")
+            class_id = cur.fetchone()[0]
+
+            students = io.StringIO()
+            for roll_no, prn in enumerate(dict.fromkeys(prns), start=1):
+                students.write(f"{prn}\t{class_id}\t{roll_no}\tBench {prn}\n")
+            students.seek(0)
+            cur.copy_from(students, 'students', columns=('prn_no', 'class_id', 'roll_no', 'name'))
+
+            encodings = io.StringIO()
+            for prn, embedding in zip(prns, embeddings):
+                literal = json.dumps(embedding.tolist())
+                encodings.write(f"{prn}\t{literal}\t{literal}\n")
+            encodings.seek(0)
+            cur.copy_from(encodings, 'faceencodings', columns=('prn_no', 'encoding_data', 'embedding'))
+
+            start = time.perf_counter()
+            db._create_vector_index(cur)
+            print(f"✓ Built {db.vector_config.get('index_type', 'hnsw')} index in "
+                  f"{time.perf_counter() - start:.1f}s")
+
+
+def bench_pgvector(embeddings, prns, picks, probes, tolerance, index_type):
+    from attendance_config import DB_CONFIG
+    from database_manager import DatabaseManager
+
+    config = dict(DB_CONFIG, schema='bench_matcher')
+    config['vector_search'] = dict(DB_CONFIG.get('vector_search', {}), enabled=True, index_type=index_type)
+    db = DatabaseManager(config)
+    try:
+        if not db.vector_search_enabled:
+            raise RuntimeError("pgvector extension is not available")
+        load_pgvector_gallery(db, embeddings, prns)
+
+        timings, hits = [], 0
+        for frame_picks, frame_probes in zip(picks, probes):
+            start = time.perf_counter()
+            results = db.match_face_embeddings(list(frame_probes), tolerance)
+            timings.append(time.perf_counter() - start)
+            hits += sum(1 for (prn, _), idx in zip(results, frame_picks) if prn == prns[idx])
+        return summarize(f'pgvector-{index_type}', timings, hits, picks.size)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--gallery-size', type=int, default=10000)
+    parser.add_argument('--gallery', help='Use the embeddings and PRNs of this gallery.npz')
+    parser.add_argument('--dimension', type=int, default=512)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--faces-per-frame', type=int, default=4)
+    parser.add_argument('--noise', type=float, default=0.02,
+                        help='Per-dimension probe noise added to gallery embeddings')
+    parser.add_argument('--tolerance', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--pgvector', action='store_true', help='Also benchmark the pgvector matcher')
+    parser.add_argument('--index-type', choices=('hnsw', 'ivfflat'), default='hnsw')
+    parser.add_argument('--classes', type=int, default=0,
+                        help='Also time matching against one of this many class shards')
+    parser.add_argument('--templates', type=int, default=0,
+                        help='Also compare T templates per identity against one averaged template')
+    parser.add_argument('--template-spread', type=float, default=0.03,
+                        help='Per-dimension noise between enrollment poses of one identity')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    if args.gallery:
+        with np.load(args.gallery) as data:
+            embeddings, prns = data['embeddings'].astype(np.float32), [str(prn) for prn in data['prns']]
+        args.gallery_size = len(embeddings)
+    else:
+        embeddings, prns = make_gallery(args.gallery_size, args.dimension, args.seed)
+    picks, probes = make_probes(embeddings, args.frames, args.faces_per_frame, args.noise, args.seed)
+
+    results = [bench_memory(embeddings, prns, picks, probes, args.tolerance)]
+    if args.classes > 1:
+        results.append(bench_sharded(embeddings, prns, picks, probes, args.tolerance, args.classes))
+    if args.templates > 1:
+        results.extend(bench_templates(embeddings, prns, picks, args.noise, args.tolerance,
+                                       args.templates, args.template_spread, args.seed))
+    if args.pgvector:
+        results.append(bench_pgvector(embeddings, prns, picks, probes, args.tolerance, args.index_type))
+
+    print(f"gallery={args.gallery_size} faces/frame={args.faces_per_frame} frames={args.frames}")
+    print(f"{'matcher':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'accuracy':>10}")
+    for row in results:
+        print(f"{row['matcher']:<18}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}"
+              f"{row['p99_ms']:>10.3f}{row['accuracy']:>10.3f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump({'args': vars(args), 'results': results}, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
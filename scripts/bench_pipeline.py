@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""Replay recorded video through the full recognition pipeline.
+
+Usage: python scripts/bench_pipeline.py VIDEO [VIDEO ...] --gallery gallery.npz
+           [--subject 1] [--direction IN] [--every 3] [--realtime] [--parallel]
+           [--truth appearances.csv] [--db-latency-ms 2] [--json out.json] [--compare base.json]
+
+Each video plays the part of one camera: frames are read, enhanced and every
+Nth one goes through RecognitionPipeline.process_frame (detect, embed,
+match, cooldown, attendance write), exactly as in the kiosk, without a GUI.
+Writes go to an in-memory stand-in database (optionally sleeping
+--db-latency-ms per call), so runs are repeatable and need no PostgreSQL.
+
+The gallery is an .npz with `embeddings` (N x 512), `prns` and optionally
+`class_ids` and `names` (scripts/generate_synthetic_data.py writes one), or
+--gallery-from-db reads it from the configured database.
+
+With --realtime frames are consumed at the video's frame rate and frames that
+go by while the pipeline is busy are skipped, like a live camera; otherwise
+every frame is read as fast as possible.
+
+Time to mark is measured per person from their appearance to the attendance
+write: appearance times come from --truth (CSV: prn,video,appears_s; video
+may be empty) or else from the first frame in which they were recognized.
+
+Results (throughput, stage percentiles per camera, time to mark, peak RSS)
+are printed and, with --json, written as JSON; --compare prints the change
+against an earlier run's JSON.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import platform
+import subprocess
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+
+from attendance_config import FACE_RECOGNITION_CONFIG  # noqa: E402
+from camera_pipeline import RecognitionPipeline  # noqa: E402
+from dedup_store import CooldownStore  # noqa: E402
+from face_recognition_engine import FaceRecognitionEngine  # noqa: E402
+from perf_trace import tracer  # noqa: E402
+
+
+class ReplayDatabase:
+    """Stand-in for DatabaseManager covering the calls RecognitionPipeline makes"""
+
+    def __init__(self, names=None, latency_ms=0.0):
+        self.names = names or {}
+        self.latency_s = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.local = threading.local()  # frame being processed on this thread
+        self.marks = []
+
+    def _round_trip(self, name):
+        with tracer.stage('db', f"db:{name}"):
+            if self.latency_s:
+                time.sleep(self.latency_s)
+
+    def get_student_names(self, prns):
+        self._round_trip('get_student_names')
+        return {prn: self.names.get(prn, prn) for prn in prns if prn}
+
+    def log_attendance(self, prn_no, subject_id, camera_id=None, direction=None, confidence=None):
+        self._round_trip('log_attendance')
+        video, position_s, captured_at = self.local.frame
+        with self.lock:
+            self.marks.append({
+                'prn': prn_no, 'subject_id': subject_id, 'camera_id': camera_id, 'direction': direction,
+                'confidence': round(float(confidence), 2), 'video': video, 'position_s': round(position_s, 3),
+                'latency_ms': round((time.perf_counter() - captured_at) * 1000.0, 2),
+            })
+        return True
+
+
+def load_gallery_npz(path):
+    with np.load(path, allow_pickle=False) as data:
+        embeddings = data['embeddings'].astype(np.float32)
+        prns = [str(prn) for prn in data['prns']]
+        class_ids = data['class_ids'].tolist() if 'class_ids' in data else None
+        names = dict(zip(prns, (str(name) for name in data['names']))) if 'names' in data else {}
+    return embeddings, prns, class_ids, names
+
+
+def load_gallery_db():
+    from attendance_config import DB_CONFIG
+    from database_manager import DatabaseManager
+
+    db = DatabaseManager(DB_CONFIG)
+    try:
+        encodings, prns, class_ids = db.get_face_encodings_with_classes()
+        return np.asarray(encodings, dtype=np.float32), prns, class_ids, db.get_student_names(prns)
+    finally:
+        db.close()
+
+
+def read_truth(path):
+    """{(video stem or '', prn): appears_s}"""
+    truth = {}
+    with open(path, newline='', encoding='utf-8') as fh:
+        for row in csv.DictReader(fh):
+            video = os.path.splitext(os.path.basename(row.get('video') or ''))[0]
+            truth[(video, row['prn'].strip())] = float(row['appears_s'])
+    return truth
+
+
+def replay(pipeline, db, path, args):
+    """Play one video as one camera; returns its counters"""
+    camera_id = os.path.splitext(os.path.basename(path))[0]
+    pipeline.face_engine.set_camera_direction(camera_id, args.direction)
+    tracer.set_camera(camera_id)
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    stats = {'video': path, 'camera_id': camera_id, 'fps': fps, 'frames_read': 0, 'frames_skipped': 0,
+             'frames_processed': 0, 'faces': 0, 'recognized': 0}
+    first_seen = {}
+    index = -1
+    started = time.perf_counter()
+    try:
+        while args.max_frames is None or stats['frames_read'] < args.max_frames:
+            with tracer.stage('capture'):
+                if args.realtime:
+                    # A live camera keeps running while we work: skip what went by meanwhile
+                    target = int((time.perf_counter() - started) * fps)
+                    while index + 1 < target and cap.grab():
+                        index += 1
+                        stats['frames_skipped'] += 1
+                captured_at = time.perf_counter()
+                ok, frame = cap.read()
+            if not ok:
+                break
+            index += 1
+            stats['frames_read'] += 1
+            frame = pipeline.face_engine.enhance_image_quality(frame)
+            if stats['frames_read'] % args.every:
+                continue
+
+            position_s = index / fps
+            db.local.frame = (camera_id, position_s, captured_at)
+            faces = pipeline.process_frame(frame, args.subject, camera_id)
+            stats['frames_processed'] += 1
+            stats['faces'] += len(faces)
+            for face in faces:
+                if face['prn']:
+                    stats['recognized'] += 1
+                    first_seen.setdefault(face['prn'], position_s)
+    finally:
+        cap.release()
+        tracer.set_camera(None)
+    stats['wall_s'] = time.perf_counter() - started
+    stats['first_seen'] = first_seen
+    return stats
+
+
+def warm_up(pipeline, path, frames):
+    """Run a few frames without logging so lazy model initialisation stays out of the timings"""
+    cap = cv2.VideoCapture(path)
+    try:
+        for _ in range(frames):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            pipeline.process_frame(pipeline.face_engine.enhance_image_quality(frame))
+    finally:
+        cap.release()
+    tracer.reset()
+
+
+def time_to_mark(marks, runs, truth):
+    first_seen = {(run['camera_id'], prn): at for run in runs for prn, at in run['first_seen'].items()}
+    people = []
+    for mark in marks:
+        appears = truth.get((mark['video'], mark['prn']), truth.get(('', mark['prn'])))
+        source = 'truth'
+        if appears is None:
+            appears, source = first_seen.get((mark['video'], mark['prn']), mark['position_s']), 'first_seen'
+        people.append(dict(mark, appears_s=appears, appearance_source=source,
+                           time_to_mark_s=round(mark['position_s'] - appears + mark['latency_ms'] / 1000.0, 3)))
+    marked = {(person['video'], person['prn']) for person in people} | {('', person['prn']) for person in people}
+    missed = sorted(f"{video}/{prn}" if video else prn for video, prn in truth if (video, prn) not in marked)
+    values = np.asarray([person['time_to_mark_s'] for person in people]) if people else np.zeros(1)
+    return {
+        'marked': len(people),
+        'missed': missed,
+        'p50_s': float(np.percentile(values, 50)),
+        'p95_s': float(np.percentile(values, 95)),
+        'max_s': float(values.max()),
+        'people': people,
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if platform.system() == 'Darwin' else peak / 1024.0
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(previous, current):
+    """Print relative changes of throughput and stage p50/p95 against an earlier run"""
+    def change(old, new):
+        return f"{(new - old) / old * 100.0:+.1f}%" if old else "n/a"
+
+    print(f"\nCompared with {previous.get('commit') or 'previous run'}:")
+    for key in ('processed_fps', 'faces_per_s'):
+        print(f"  {key:<22} {previous[key]:>9.2f} -> {current[key]:>9.2f}  {change(previous[key], current[key])}")
+    for camera, stages in current['stages'].items():
+        for stage, values in stages.items():
+            old = previous['stages'].get(camera, {}).get(stage)
+            if old:
+                print(f"  {camera}/{stage:<14} p50 {change(old['p50_ms'], values['p50_ms']):>8}"
+                      f"  p95 {change(old['p95_ms'], values['p95_ms']):>8}")
+    if previous.get('time_to_mark') and current['time_to_mark']['marked']:
+        print(f"  time to mark p50       {previous['time_to_mark']['p50_s']:.2f}s -> "
+              f"{current['time_to_mark']['p50_s']:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('videos', nargs='+', help='Video files, one camera each')
+    parser.add_argument('--gallery', help='Gallery .npz (embeddings, prns[, class_ids, names])')
+    parser.add_argument('--gallery-from-db', action='store_true', help='Load the gallery from the database')
+    parser.add_argument('--subject', type=int, default=1, help='Subject id attendance is logged for')
+    parser.add_argument('--direction', choices=('IN', 'OUT', 'BOTH'), default='BOTH')
+    parser.add_argument('--every', type=int, default=3, help='Process every Nth frame (the kiosk uses 3)')
+    parser.add_argument('--realtime', action='store_true', help='Pace at the video frame rate, skipping frames')
+    parser.add_argument('--parallel', action='store_true', help='Replay all videos at once, a thread each')
+    parser.add_argument('--max-frames', type=int, help='Stop each video after this many frames')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed frames run before the replay')
+    parser.add_argument('--cooldown', type=float, default=300, help='Attendance cooldown in seconds')
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help='Simulated database round trip')
+    parser.add_argument('--truth', help='CSV of prn,video,appears_s for time to mark')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Earlier --json result to compare against')
+    args = parser.parse_args()
+
+    if not args.gallery and not args.gallery_from_db:
+        parser.error('pass --gallery FILE.npz or --gallery-from-db')
+    args.every = max(1, args.every)
+
+    embeddings, prns, class_ids, names = (load_gallery_npz(args.gallery) if args.gallery
+                                          else load_gallery_db())
+    engine = FaceRecognitionEngine(dict(FACE_RECOGNITION_CONFIG, matcher='memory'))
+    engine.load_known_faces(list(embeddings), prns, class_ids)
+    db = ReplayDatabase(names, args.db_latency_ms)
+    pipeline = RecognitionPipeline(db, engine, cooldowns=CooldownStore(ttl=args.cooldown))
+    truth = read_truth(args.truth) if args.truth else {}
+
+    if args.warmup:
+        warm_up(pipeline, args.videos[0], args.warmup)
+
+    started = time.perf_counter()
+    if args.parallel:
+        runs, errors = [None] * len(args.videos), []
+
+        def run(i, path):
+            try:
+                runs[i] = replay(pipeline, db, path, args)
+            except Exception as e:
+                errors.append(f"{path}: {e}")
+
+        threads = [threading.Thread(target=run, args=(i, path), name=f"replay-{i}")
+                   for i, path in enumerate(args.videos)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            print('\n'.join(f"✗ {error}" for error in errors))
+            return 1
+    else:
+        runs = [replay(pipeline, db, path, args) for path in args.videos]
+    wall_s = time.perf_counter() - started
+
+    processed = sum(run['frames_processed'] for run in runs)
+    faces = sum(run['faces'] for run in runs)
+    result = {
+        'commit': git_commit(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('json', 'compare')},
+        'gallery': {'identities': len(engine.gallery), 'templates': engine.gallery.template_count},
+        'wall_s': round(wall_s, 3),
+        'frames_read': sum(run['frames_read'] for run in runs),
+        'frames_skipped': sum(run['frames_skipped'] for run in runs),
+        'frames_processed': processed,
+        'faces': faces,
+        'recognized': sum(run['recognized'] for run in runs),
+        'processed_fps': processed / wall_s if wall_s else 0.0,
+        'faces_per_s': faces / wall_s if wall_s else 0.0,
+        'stages': tracer.summary(),
+        'time_to_mark': time_to_mark(db.marks, runs, truth),
+        'peak_rss_mb': peak_rss_mb(),
+        'cooldowns': pipeline.cooldowns.get_stats(),
+        'videos': [{key: value for key, value in run.items() if key != 'first_seen'} for run in runs],
+    }
+
+    print(f"✓ {result['frames_read']} frames read, {processed} processed in {wall_s:.1f}s "
+          f"({result['processed_fps']:.1f} processed frames/s, {result['faces_per_s']:.1f} faces/s)")
+    for camera, stages in result['stages'].items():
+        for stage, values in stages.items():
+            print(f"  {camera}/{stage:<14} n={values['count']:<6} p50 {values['p50_ms']:8.2f} ms  "
+                  f"p95 {values['p95_ms']:8.2f} ms  p99 {values['p99_ms']:8.2f} ms")
+    marks = result['time_to_mark']
+    print(f"✓ {marks['marked']} marks, time to mark p50 {marks['p50_s']:.2f}s p95 {marks['p95_s']:.2f}s"
+          + (f", {len(marks['missed'])} expected people never marked" if marks['missed'] else ""))
+    if result['peak_rss_mb'] is not None:
+        print(f"✓ Peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(result, fh, indent=2)
+        print(f"✓ Results written to {args.json}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            compare(json.load(fh), result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
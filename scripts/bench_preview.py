@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Measure CPU cost of camera preview viewers.
+
+Usage: python scripts/bench_preview.py [--viewers 1,10,50,200] [--tier full|thumb]
+                                       [--fps 5] [--camera-fps 30] [--duration 10]
+
+A synthetic 1280x720 camera publishes frames (with a few face boxes) into a
+FrameHub while N viewer threads pull JPEGs at the per-viewer fps cap, the
+way the MJPEG endpoint does. Reports process CPU for each viewer count,
+once through the shared hub and once with every viewer encoding its own
+copy (--no-naive skips the latter), so the box can be sized per viewer.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_hub import FrameHub, annotate_frame  # noqa: E402
+from attendance_config import PREVIEW_CONFIG  # noqa: E402
+
+FACES = [
+    {'box': (120, 420, 380, 200), 'prn': 'P0001', 'name': 'Student One', 'status': 'marked', 'confidence': 92.0},
+    {'box': (150, 900, 400, 700), 'prn': None, 'name': None, 'status': 'unknown', 'confidence': 31.0},
+]
+
+
+def camera(hub, stop, camera_fps, width, height):
+    rng = np.random.default_rng(1)
+    base = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    index = 0
+    while not stop.is_set():
+        frame = np.roll(base, index * 8, axis=1)  # moving content so JPEGs differ
+        hub.publish('bench', frame, FACES)
+        index += 1
+        time.sleep(1.0 / camera_fps)
+
+
+def viewer(hub, stop, tier, fps, naive, served):
+    import cv2
+
+    last_sequence = 0
+    quality = int(PREVIEW_CONFIG['tiers'][tier].get('quality', 80))
+    while not stop.is_set():
+        started = time.perf_counter()
+        if naive:
+            camera_state = hub.cameras.get('bench')
+            if camera_state is not None and camera_state.sequence != last_sequence:
+                last_sequence = camera_state.sequence
+                image = annotate_frame(camera_state.frame, camera_state.faces)
+                width = PREVIEW_CONFIG['tiers'][tier].get('width')
+                if width:
+                    image = cv2.resize(image, (width, int(image.shape[0] * width / image.shape[1])))
+                cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                served[0] += 1
+        elif hub.latest_sequence('bench') != last_sequence:
+            last_sequence, _ = hub.get_jpeg('bench', tier)
+            served[0] += 1
+        time.sleep(max(0.0, 1.0 / fps - (time.perf_counter() - started)))
+
+
+def run(viewers, tier, fps, camera_fps, duration, naive, width, height):
+    hub = FrameHub(PREVIEW_CONFIG['tiers'])
+    stop = threading.Event()
+    served = [0]
+    threads = [threading.Thread(target=camera, args=(hub, stop, camera_fps, width, height), daemon=True)]
+    threads += [threading.Thread(target=viewer, args=(hub, stop, tier, fps, naive, served), daemon=True)
+                for _ in range(viewers)]
+
+    for thread in threads:
+        thread.start()
+    time.sleep(1.0)  # warm-up
+    cpu_start, wall_start, served_start = time.process_time(), time.perf_counter(), served[0]
+    time.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    frames = served[0] - served_start
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=2.0)
+
+    encodes = hub.get_stats()['tiers'][tier]['encodes']
+    return {
+        'mode': 'naive' if naive else 'hub',
+        'viewers': viewers,
+        'cpu_pct': cpu / wall * 100.0,
+        'cpu_ms_per_viewer_s': cpu / wall * 1000.0 / viewers,
+        'frames_per_viewer_s': frames / wall / viewers,
+        'encodes': encodes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--viewers', default='1,10,50,200')
+    parser.add_argument('--tier', choices=sorted(PREVIEW_CONFIG['tiers']), default='full')
+    parser.add_argument('--fps', type=float, default=5.0, help='Per-viewer frame-rate cap')
+    parser.add_argument('--camera-fps', type=float, default=30.0)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--no-naive', action='store_true', help='Skip the encode-per-viewer baseline')
+    args = parser.parse_args()
+
+    rows = []
+    for count in [int(v) for v in args.viewers.split(',')]:
+        rows.append(run(count, args.tier, args.fps, args.camera_fps, args.duration, False,
+                        args.width, args.height))
+        if not args.no_naive:
+            rows.append(run(count, args.tier, args.fps, args.camera_fps, args.duration, True,
+                            args.width, args.height))
+
+    print(f"tier={args.tier} fps/viewer={args.fps} camera fps={args.camera_fps}")
+    print(f"{'mode':<7}{'viewers':>8}{'cpu %':>9}{'cpu ms/viewer/s':>17}{'fps/viewer':>12}{'hub encodes':>13}")
+    for row in rows:
+        print(f"{row['mode']:<7}{row['viewers']:>8}{row['cpu_pct']:>9.1f}"
+              f"{row['cpu_ms_per_viewer_s']:>17.2f}{row['frames_per_viewer_s']:>12.1f}{row['encodes']:>13}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Enroll students in bulk from a roster CSV and a folder of photos.
+
+Usage: python scripts/bulk_enroll.py ROSTER.csv PHOTO_DIR [--workers N] [--chunk-size 200]
+                                     [--report rejects.csv] [--limit N]
+
+The roster needs prn, roll_no and name columns, class_id or class (the
+class name), and optionally email. Photos are found as PHOTO_DIR/<prn>/*.jpg
+or PHOTO_DIR/<prn>.jpg / PHOTO_DIR/<prn>_<n>.jpg (jpg, jpeg, png).
+
+Worker processes decode the photos, detect and align faces and run
+check_face_quality; each worker embeds all accepted crops of its task in
+one forward pass. The best templates per student (max_templates, pruned
+for diversity) are written with COPY, chunk-size students per transaction.
+
+Students already in the database are skipped, so an interrupted run can be
+restarted with the same arguments. Every rejected photo or roster row is
+appended to the report with the reason.
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_config import DB_CONFIG, FACE_RECOGNITION_CONFIG  # noqa: E402
+from database_manager import DatabaseManager  # noqa: E402
+from face_matcher import select_diverse_templates  # noqa: E402
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+REPORT_FIELDS = ['prn', 'photo', 'reason', 'detail']
+
+_engine = None  # per worker process
+
+
+def index_photos(photo_dir):
+    """prn -> sorted photo paths, from per-student folders or <prn>[_n].ext file names"""
+    photos = {}
+    for entry in os.scandir(photo_dir):
+        if entry.is_dir():
+            paths = [os.path.join(entry.path, name) for name in os.listdir(entry.path)
+                     if name.lower().endswith(PHOTO_EXTENSIONS)]
+            photos.setdefault(entry.name, []).extend(paths)
+        elif entry.name.lower().endswith(PHOTO_EXTENSIONS):
+            prn = os.path.splitext(entry.name)[0].rsplit('_', 1)[0]
+            photos.setdefault(prn, []).append(entry.path)
+    return {prn: sorted(paths) for prn, paths in photos.items()}
+
+
+def read_roster(path, class_ids):
+    """Valid (prn, class_id, roll_no, name, email) rows and report rows for the rest.
+
+    class_ids maps class names to ids; a class_id column must name one of those ids.
+    """
+    students, rejects, seen = [], [], set()
+    known_ids = set(class_ids.values())
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        for line_number, row in enumerate(csv.DictReader(fh), start=2):
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            prn = row.get('prn') or row.get('prn_no', '')
+            class_id = row.get('class_id') or class_ids.get(row.get('class', ''))
+            problem = None
+            if not prn or not row.get('name') or not row.get('roll_no', '').isdigit():
+                problem = 'missing prn, name or numeric roll_no'
+            elif len(prn) > 20:
+                problem = 'prn longer than 20 characters'
+            elif prn in seen:
+                problem = 'duplicate prn in roster'
+            elif not str(class_id or '').isdigit() or int(class_id) not in known_ids:
+                problem = f"unknown class {row.get('class') or row.get('class_id') or ''!r}"
+            if problem:
+                rejects.append({'prn': prn, 'photo': '', 'reason': 'bad_roster_row',
+                                'detail': f"line {line_number}: {problem}"})
+                continue
+            seen.add(prn)
+            students.append((prn, int(class_id), int(row['roll_no']), row['name'], row.get('email') or None))
+    return students, rejects
+
+
+def _init_worker(config, workers):
+    global _engine
+    from face_recognition_engine import FaceRecognitionEngine
+
+    # parallelism comes from the process pool: OpenCV single-threaded, cores split for ONNX Runtime
+    runtime = dict(config.get('runtime', {}), engines_per_host=workers, opencv_threads=1)
+    _engine = FaceRecognitionEngine(dict(config, use_yolo=False, runtime=runtime))
+
+
+def _load_photo(path, max_side):
+    import cv2
+
+    frame = cv2.imread(path, cv2.IMREAD_COLOR)
+    if frame is not None and max_side and max(frame.shape[:2]) > max_side:
+        factor = max_side / max(frame.shape[:2])
+        frame = cv2.resize(frame, (0, 0), fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def _clip(location, frame):
+    top, right, bottom, left = location
+    height, width = frame.shape[:2]
+    return max(0, top), min(width, right), min(height, bottom), max(0, left)
+
+
+def process_students(tasks, max_side):
+    """Worker: [(prn, paths)] -> [(prn, embeddings, rejects)], one embedding batch per call"""
+    crops, owners, direct = [], [], []
+    rejects = {prn: [] for prn, _ in tasks}
+    for prn, paths in tasks:
+        for path in paths:
+            frame = _load_photo(path, max_side)
+            if frame is None:
+                rejects[prn].append({'prn': prn, 'photo': path, 'reason': 'unreadable', 'detail': ''})
+                continue
+            if _engine.supports_aligned_batches:
+                faces = _engine.detect_aligned_faces(frame)
+            else:
+                locations, encodings = _engine.detect_and_encode_face(frame, for_registration=True)
+                faces = list(zip(locations, encodings))
+            if len(faces) != 1:
+                reason = 'no_face' if not faces else 'multiple_faces'
+                rejects[prn].append({'prn': prn, 'photo': path, 'reason': reason,
+                                     'detail': f"{len(faces)} faces" if faces else ''})
+                continue
+            location, payload = faces[0]
+            ok, quality = _engine.check_face_quality(frame, _clip(location, frame))
+            if not ok:
+                rejects[prn].append({'prn': prn, 'photo': path, 'reason': 'low_quality',
+                                     'detail': ' '.join(f"{k}={v}" for k, v in quality.items())})
+                continue
+            if _engine.supports_aligned_batches:
+                crops.append(payload)
+                owners.append(prn)
+            else:
+                direct.append((prn, payload))
+
+    embeddings = {prn: [] for prn, _ in tasks}
+    for prn, feature in zip(owners, _engine.embed_aligned_faces(crops)):
+        embeddings[prn].append(feature)
+    for prn, feature in direct:
+        embeddings[prn].append(feature)
+    return [(prn, np.asarray(embeddings[prn], dtype=np.float32), rejects[prn]) for prn, _ in tasks]
+
+
+class RejectReport:
+    def __init__(self, path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.handle = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.handle, fieldnames=REPORT_FIELDS)
+        if new_file:
+            self.writer.writeheader()
+        self.count = 0
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.handle.flush()
+        self.count += len(rows)
+
+    def close(self):
+        self.handle.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('roster', help='CSV with prn, class_id or class, roll_no, name[, email]')
+    parser.add_argument('photos', help='Directory of student photos')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--task-size', type=int, default=8, help='Students per worker task (one embedding batch)')
+    parser.add_argument('--chunk-size', type=int, default=200, help='Students per COPY transaction')
+    parser.add_argument('--max-side', type=int, default=1600, help='Downscale larger photos before detection')
+    parser.add_argument('--report', default='enrollment_rejects.csv')
+    parser.add_argument('--limit', type=int, help='Enroll at most this many students')
+    args = parser.parse_args()
+
+    db = DatabaseManager(DB_CONFIG)
+    report = RejectReport(args.report)
+    try:
+        students, roster_rejects = read_roster(args.roster, db.get_all_classes())
+        report.write(roster_rejects)
+        photos = index_photos(args.photos)
+        enrolled = db.get_enrolled_prns()
+
+        pending_students = []
+        for student in students:
+            if student[0] in enrolled:
+                continue
+            if not photos.get(student[0]):
+                report.write([{'prn': student[0], 'photo': '', 'reason': 'no_photos', 'detail': ''}])
+                continue
+            pending_students.append(student)
+        if args.limit:
+            pending_students = pending_students[:args.limit]
+        skipped = len(students) - len(pending_students)
+        print(f"✓ {len(students) + len(roster_rejects)} roster rows, {len(enrolled)} already enrolled, "
+              f"{len(pending_students)} to enroll with {args.workers} worker(s)")
+        if not pending_students:
+            return 0
+
+        by_prn = {student[0]: student for student in pending_students}
+        max_templates = int(FACE_RECOGNITION_CONFIG.get('max_templates', 5))
+        batch_students, batch_encodings = [], {}
+        inserted_total, done = 0, 0
+        started = time.perf_counter()
+
+        def flush():
+            nonlocal inserted_total
+            if not batch_students:
+                return
+            inserted = db.bulk_register_students(batch_students, batch_encodings)
+            report.write([{'prn': s[0], 'photo': '', 'reason': 'conflict',
+                           'detail': 'prn, email or roll number already in use'}
+                          for s in batch_students if s[0] not in inserted])
+            inserted_total += len(inserted)
+            batch_students.clear()
+            batch_encodings.clear()
+            elapsed = time.perf_counter() - started
+            print(f"  {done}/{len(pending_students)} processed, {inserted_total} enrolled "
+                  f"({done / elapsed:.1f} students/s)")
+
+        tasks = [[(s[0], photos[s[0]]) for s in pending_students[i:i + args.task_size]]
+                 for i in range(0, len(pending_students), args.task_size)]
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(FACE_RECOGNITION_CONFIG, args.workers)) as pool:
+            futures = [pool.submit(process_students, task, args.max_side) for task in tasks]
+            for future in as_completed(futures):
+                for prn, embeddings, rejects in future.result():
+                    done += 1
+                    report.write(rejects)
+                    if not len(embeddings):
+                        report.write([{'prn': prn, 'photo': '', 'reason': 'no_usable_photos', 'detail': ''}])
+                        continue
+                    keep = select_diverse_templates(embeddings, max_templates)
+                    batch_students.append(by_prn[prn])
+                    batch_encodings[prn] = embeddings[keep]
+                if len(batch_students) >= args.chunk_size:
+                    flush()
+        flush()
+
+        elapsed = time.perf_counter() - started
+        print(f"✓ Enrolled {inserted_total} students in {elapsed:.1f}s "
+              f"({len(pending_students) / elapsed:.1f} students/s); {skipped} skipped, "
+              f"{report.count} report rows in {args.report}")
+        return 0
+    except KeyboardInterrupt:
+        print("⚠ Interrupted; completed chunks are saved, rerun to resume")
+        return 130
+    finally:
+        report.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
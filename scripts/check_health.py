@@ -1,29 +1,79 @@
 #!/usr/bin/env python3
-"""Simple health-check script for the Attendance API.
+"""Health-check script for the Attendance API.
 
-Usage: python scripts/check_health.py [--url URL]
-Exits with code 0 when health endpoint returns status OK, otherwise non-zero.
+Usage: python scripts/check_health.py [--url URL] [--live] [--max-db-ms MS] ...
+
+Queries /health/ready (or /health/live with --live) and checks the reported
+measurements against latency SLOs. Exit codes:
+  0  ready and every SLO met
+  2  not ready, or an SLO was breached
+  3  API unreachable
+  4  unexpected error
 """
 import sys
+import json
 import argparse
 from urllib.request import urlopen
 from urllib.error import URLError, HTTPError
 
 
+def fetch(url, timeout):
+    """(HTTP status, JSON body); a 503 from /health/ready still carries the checks"""
+    try:
+        with urlopen(url, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read().decode('utf-8'))
+    except HTTPError as e:
+        body = e.read().decode('utf-8', errors='replace')
+        try:
+            return e.code, json.loads(body)
+        except ValueError:
+            raise e
+
+
+def slo_breaches(checks, args):
+    """Messages for measurements beyond the thresholds given on the command line"""
+    breaches = []
+    database = checks.get('database', {})
+    inference = checks.get('inference', {})
+    gallery = checks.get('gallery', {})
+    limits = [
+        (args.max_db_ms, database.get('latency_ms'), 'database latency {:.1f} ms > {} ms'),
+        (args.max_inference_ms, inference.get('total_ms'), 'inference {:.1f} ms > {} ms'),
+    ]
+    for limit, value, message in limits:
+        if limit is not None and value is not None and value > limit:
+            breaches.append(message.format(value, limit))
+    if args.min_gallery is not None and gallery.get('identities', args.min_gallery) < args.min_gallery:
+        breaches.append(f"gallery has {gallery['identities']} identities < {args.min_gallery}")
+    if args.max_frame_age_s is not None:
+        for camera_id, camera in checks.get('cameras', {}).get('cameras', {}).items():
+            age = camera.get('frame_age_s')
+            if age is None or age > args.max_frame_age_s:
+                breaches.append(f"camera {camera_id} last frame {age} s ago > {args.max_frame_age_s} s")
+    return breaches
+
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--url', default='http://127.0.0.1:8000/health')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='API base URL')
+    parser.add_argument('--live', action='store_true', help='only check liveness (/health/live)')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--max-db-ms', type=float, help='database round-trip SLO')
+    parser.add_argument('--max-inference-ms', type=float, help='probe inference SLO')
+    parser.add_argument('--max-frame-age-s', type=float, help='camera frame freshness SLO')
+    parser.add_argument('--min-gallery', type=int, help='minimum known faces')
+    parser.add_argument('--json', action='store_true', help='print the full response')
     args = parser.parse_args()
 
+    base = args.url.rstrip('/')
+    for suffix in ('/health/ready', '/health/live', '/health'):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+            break
+    url = base + ('/health/live' if args.live else '/health/ready')
+
     try:
-        with urlopen(args.url, timeout=3) as resp:
-            body = resp.read().decode('utf-8')
-            if 'ok' in body.lower():
-                print('healthy')
-                return 0
-            else:
-                print('unhealthy:', body)
-                return 2
+        status, body = fetch(url, args.timeout)
     except HTTPError as e:
         print('http error:', e)
         return 3
@@ -34,6 +84,33 @@ def main():
         print('error:', e)
         return 4
 
+    if args.json:
+        print(json.dumps(body, indent=2))
+
+    if args.live:
+        if status == 200:
+            print(f"alive (uptime {body.get('uptime_s')} s, loop lag {body.get('loop_lag_ms')} ms)")
+            return 0
+        print('not alive:', body)
+        return 2
+
+    checks = body.get('checks', {})
+    for name, check in checks.items():
+        details = ', '.join(f"{key}={value}" for key, value in check.items() if key not in ('ok', 'cameras'))
+        print(f"{'✓' if check.get('ok') else '✗'} {name}: {details}")
+        for camera_id, camera in check.get('cameras', {}).items():
+            print(f"  {'✓' if camera.get('ok') else '✗'} {camera_id}: last frame {camera.get('frame_age_s')} s ago")
+
+    breaches = slo_breaches(checks, args)
+    for breach in breaches:
+        print(f"✗ SLO breached: {breach}")
+
+    if status == 200 and body.get('status') == 'ready' and not breaches:
+        print('healthy')
+        return 0
+    print('unhealthy:', ', '.join(body.get('failed', [])) or 'SLO breached')
+    return 2
+
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""Generate a synthetic institution for database and matcher benchmarks.
+
+Usage: python scripts/generate_synthetic_data.py [--classes 40] [--students 10000] [--years 2]
+           [--schema synthetic] [--reset] [--out synthetic] [--files-only] [--seed 7]
+
+Creates classes, subjects and a weekly timetable, students with clustered
+512-d face embeddings, and a multi-year attendance log, then bulk-loads them
+with COPY into an isolated schema (`--schema public` loads into the main
+tables). Everything is derived from --seed, so the same arguments give the
+same data on any machine.
+
+- Embeddings: identities are drawn around --clusters centroids (faces of
+  similar people sit close together, as real embeddings do); each student
+  gets --templates enrollment templates near their identity, and probes.npz
+  holds noisy probe faces of known students for matcher accuracy checks.
+- Attendance: school days exclude weekends, winter and summer breaks and a
+  few random holidays. Each student has an attendance propensity (a minority
+  attend poorly); Mondays and Fridays are weaker. Attended sessions log an
+  IN event near the start (some late) and, with --out-events, an OUT event
+  near the end, from the room's cameras.
+
+The rollup trigger is disabled while the log is copied, then the daily
+rollups are rebuilt in one pass with backfill_attendance_rollups.
+
+Writes gallery.npz (embeddings, prns, class_ids, names), probes.npz
+(probes, prns) and manifest.json to --out; gallery.npz is what
+scripts/bench_pipeline.py and scripts/bench_matcher.py --gallery read.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST_NAMES = ('Aarav', 'Aditi', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Neha', 'Omkar', 'Pooja',
+               'Rahul', 'Riya', 'Rohan', 'Sakshi', 'Sanjay', 'Shreya', 'Tanvi', 'Varun', 'Yash', 'Zara')
+LAST_NAMES = ('Badgujar', 'Deshmukh', 'Gupta', 'Iyer', 'Joshi', 'Kulkarni', 'Mehta', 'Nair', 'Patil',
+              'Rao', 'Shah', 'Sharma', 'Singh', 'Verma')
+SLOT_HOURS = (9, 10, 11, 13, 14, 15, 16)  # lecture start hours; each runs 50 minutes
+LECTURE_MINUTES = 50
+WEEKDAY_FACTOR = {1: 0.95, 2: 1.0, 3: 1.0, 4: 0.99, 5: 0.92}  # ISO weekday -> attendance multiplier
+CHUNK_STUDENTS = 10000
+
+
+def prn_of(ordinal, prefix):
+    return f"{prefix}{ordinal:07d}"
+
+
+def plan_institution(args, rng):
+    """Classes, their student ranges, subjects and the weekly timetable (by index, not database id)"""
+    sizes = rng.multinomial(args.students - args.classes, np.full(args.classes, 1.0 / args.classes)) + 1
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    subjects = max(args.subjects_per_class, args.subjects or args.classes * args.subjects_per_class // 2)
+    class_subjects = [rng.choice(subjects, size=min(args.subjects_per_class, subjects), replace=False)
+                      for _ in range(args.classes)]
+
+    timetable = []  # (class index, subject index, iso weekday, slot)
+    for class_index, own_subjects in enumerate(class_subjects):
+        for weekday in range(1, 6):
+            for slot in range(args.sessions_per_day):
+                subject = own_subjects[(weekday * args.sessions_per_day + slot) % len(own_subjects)]
+                timetable.append((class_index, int(subject), weekday, slot))
+
+    return {
+        'class_names': [f"Synthetic Class {i + 1:04d}" for i in range(args.classes)],
+        'class_bounds': bounds,
+        'subject_names': [f"Synthetic Subject {i + 1:04d}" for i in range(subjects)],
+        'subject_codes': [f"SYN{i + 1:05d}" for i in range(subjects)],
+        'timetable': timetable,
+    }
+
+
+def student_classes(plan):
+    """Class index of every student ordinal"""
+    bounds = plan['class_bounds']
+    return np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+
+
+def student_name(ordinal):
+    return f"{FIRST_NAMES[ordinal % len(FIRST_NAMES)]} {LAST_NAMES[(ordinal // 7) % len(LAST_NAMES)]}"
+
+
+def make_centroids(args):
+    rng = np.random.default_rng([args.seed, 1])
+    centroids = rng.standard_normal((args.clusters, args.dimension)).astype(np.float32)
+    return centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+
+def _unit_rows(rows):
+    return rows / np.linalg.norm(rows, axis=-1, keepdims=True)
+
+
+def identity_embeddings(args, centroids, start, stop):
+    """Identity vectors of students [start, stop): a cluster centroid plus personal variation"""
+    rng = np.random.default_rng([args.seed, 2, start])
+    clusters = rng.integers(0, len(centroids), size=stop - start)
+    personal = rng.standard_normal((stop - start, args.dimension)).astype(np.float32)
+    personal *= args.cluster_spread / np.sqrt(args.dimension)
+    return _unit_rows(centroids[clusters] + personal)
+
+
+def template_embeddings(args, identities, start):
+    """(students, templates, dim) enrollment templates around each identity"""
+    rng = np.random.default_rng([args.seed, 3, start])
+    noise = rng.standard_normal((len(identities), args.templates, args.dimension)).astype(np.float32)
+    return _unit_rows(identities[:, None, :] + noise * (args.template_spread / np.sqrt(args.dimension)))
+
+
+def iter_embedding_chunks(args, centroids):
+    for start in range(0, args.students, CHUNK_STUDENTS):
+        stop = min(start + CHUNK_STUDENTS, args.students)
+        yield start, stop, template_embeddings(args, identity_embeddings(args, centroids, start, stop), start)
+
+
+def make_probes(args, centroids):
+    rng = np.random.default_rng([args.seed, 4])
+    picks = np.sort(rng.integers(0, args.students, size=args.probes))
+    probes = np.empty((len(picks), args.dimension), dtype=np.float32)
+    for start in range(0, args.students, CHUNK_STUDENTS):
+        stop = min(start + CHUNK_STUDENTS, args.students)
+        mask = (picks >= start) & (picks < stop)
+        if mask.any():
+            identities = identity_embeddings(args, centroids, start, stop)[picks[mask] - start]
+            noise = rng.standard_normal(identities.shape).astype(np.float32)
+            probes[mask] = _unit_rows(identities + noise * (args.probe_spread / np.sqrt(args.dimension)))
+    return probes, [prn_of(i, args.prn_prefix) for i in picks]
+
+
+def write_gallery(args, centroids, plan, class_ids):
+    """gallery.npz with every template row; built through a memory-mapped .npy to bound memory"""
+    rows = args.students * args.templates
+    temp_path = os.path.join(args.out, 'gallery_embeddings.tmp.npy')
+    embeddings = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32,
+                                           shape=(rows, args.dimension))
+    for start, stop, templates in iter_embedding_chunks(args, centroids):
+        embeddings[start * args.templates:stop * args.templates] = templates.reshape(-1, args.dimension)
+    embeddings.flush()
+
+    ordinals = np.repeat(np.arange(args.students), args.templates)
+    classes = student_classes(plan)[ordinals]
+    path = os.path.join(args.out, 'gallery.npz')
+    np.savez(path, embeddings=embeddings,
+             prns=np.array([prn_of(i, args.prn_prefix) for i in ordinals]),
+             class_ids=np.asarray(class_ids)[classes] if class_ids is not None else classes + 1,
+             names=np.array([student_name(i) for i in ordinals]))
+    del embeddings
+    os.remove(temp_path)
+    return path
+
+
+def school_days(start, end, holiday_rate, seed):
+    """Weekdays in [start, end] outside the winter and summer breaks and random holidays"""
+    rng = np.random.default_rng([seed, 5])
+    days = []
+    day = start
+    while day <= end:
+        on_break = (day.month == 12 and day.day >= 22) or (day.month == 1 and day.day <= 3) or \
+            ((5, 20) <= (day.month, day.day) <= (7, 10))
+        if day.isoweekday() <= 5 and not on_break and rng.random() >= holiday_rate:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def attendance_propensity(args):
+    """Per-student probability of coming in on a given day; a minority attend poorly"""
+    rng = np.random.default_rng([args.seed, 6])
+    propensity = rng.beta(9.0, 1.5, size=args.students)
+    poor = rng.random(args.students) < args.poor_attenders
+    propensity[poor] = rng.beta(3.0, 3.0, size=int(poor.sum()))
+    return propensity
+
+
+def day_sessions(args, plan, day, propensity):
+    """Attended sessions of one day as column arrays, one dict per timetabled session"""
+    rng = np.random.default_rng([args.seed, 7, day.toordinal()])
+    weekday = day.isoweekday()
+    bounds = plan['class_bounds']
+    sessions = [entry for entry in plan['timetable'] if entry[2] == weekday]
+    present_today = {}
+    for class_index, subject_index, _, slot in sessions:
+        lo, hi = bounds[class_index], bounds[class_index + 1]
+        if class_index not in present_today:
+            class_mood = rng.normal(1.0, 0.03)  # weather, events, exam weeks
+            present_today[class_index] = rng.random(hi - lo) < propensity[lo:hi] * WEEKDAY_FACTOR[weekday] * class_mood
+        attended = np.flatnonzero(present_today[class_index] & (rng.random(hi - lo) < args.session_attendance))
+        if not len(attended):
+            continue
+
+        start_s = SLOT_HOURS[slot % len(SLOT_HOURS)] * 3600
+        session = {
+            'class_index': class_index, 'subject_index': subject_index, 'ordinals': attended + lo,
+            'arrive_s': start_s + np.clip(rng.normal(-240, 300, len(attended)), -900, 2400).astype(np.int64),
+            'confidence': np.round(rng.uniform(70, 99, len(attended)), 2),
+        }
+        if args.out_events:
+            session['leave_s'] = start_s + LECTURE_MINUTES * 60 + np.clip(
+                rng.normal(120, 180, len(attended)), -600, 900).astype(np.int64)
+        yield session
+
+
+def session_csv(args, day, session, subject_ids):
+    """CSV text of a session's AttendanceLog rows, formatted column-wise with numpy:
+    prn, subject_id, timestamp, status, camera_id, direction, confidence"""
+    prefix = np.char.add(args.prn_prefix, np.char.zfill(session['ordinals'].astype(str), 7)).astype(object)
+    confidence = np.char.mod('%.2f', session['confidence']).astype(object)
+    head = f",{subject_ids[session['subject_index']]},"
+    room = f"R{session['class_index'] + 1:04d}"
+    midnight = np.datetime64(day, 's')
+    lines = []
+    for key, camera, direction in (('arrive_s', 'in', 'IN'), ('leave_s', 'out', 'OUT')):
+        if key not in session:
+            continue
+        timestamps = (midnight + session[key].astype('timedelta64[s]')).astype(str).astype(object)
+        lines.append(prefix + head + timestamps + f",present,{room}-{camera},{direction}," + confidence)
+    rows = np.concatenate(lines)
+    return '\n'.join(rows.tolist()) + '\n', len(rows)
+
+
+class CsvStream:
+    """Readable file object over an iterator of CSV text chunks, for COPY ... FROM STDIN"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = ''
+        self.offset = 0
+
+    def read(self, size=-1):
+        parts = []
+        wanted = size if size >= 0 else float('inf')
+        while wanted > 0:
+            if self.offset >= len(self.pending):
+                self.pending, self.offset = next(self.chunks, ''), 0
+                if not self.pending:
+                    break
+            part = self.pending[self.offset:self.offset + wanted] if size >= 0 else self.pending[self.offset:]
+            self.offset += len(part)
+            wanted -= len(part)
+            parts.append(part)
+        return ''.join(parts)
+
+
+def estimate_log_rows(args, days):
+    return int(len(days) * args.students * args.sessions_per_day * 0.8 * args.session_attendance
+               * (2 if args.out_events else 1))
+
+
+def load_institution(db, args, plan):
+    """Insert classes, subjects and timetable; returns (class ids, subject ids) by index"""
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO Classes (class_name) SELECT unnest(%s::text[]) RETURNING class_id, class_name",
+                        (plan['class_names'],))
+            class_map = {name: class_id for class_id, name in cur.fetchall()}
+            cur.execute("""
+                INSERT INTO Subjects (subject_name, subject_code)
+                SELECT unnest(%s::text[]), unnest(%s::text[])
+                RETURNING subject_id, subject_name
+            """, (plan['subject_names'], plan['subject_codes']))
+            subject_map = {name: subject_id for subject_id, name in cur.fetchall()}
+            class_ids = [class_map[name] for name in plan['class_names']]
+            subject_ids = [subject_map[name] for name in plan['subject_names']]
+
+            entries = []
+            for class_index, subject_index, weekday, slot in plan['timetable']:
+                start = datetime.min + timedelta(hours=SLOT_HOURS[slot % len(SLOT_HOURS)])
+                end = start + timedelta(minutes=LECTURE_MINUTES)
+                entries.append((class_ids[class_index], subject_ids[subject_index], weekday,
+                                start.time(), end.time(), f"R{class_index + 1:04d}"))
+            cur.copy_expert("COPY Timetable (class_id, subject_id, day_of_week, start_time, end_time, room) "
+                            "FROM STDIN WITH (FORMAT csv)", db._csv_buffer(entries))
+    return class_ids, subject_ids
+
+
+def load_students(db, args, plan, class_ids, centroids):
+    classes = student_classes(plan)
+    bounds = plan['class_bounds']
+    columns = "prn_no, encoding_data, embedding" if db.vector_search_enabled else "prn_no, encoding_data"
+    for start, stop, templates in iter_embedding_chunks(args, centroids):
+        students = []
+        for ordinal in range(start, stop):
+            prn = prn_of(ordinal, args.prn_prefix)
+            class_index = classes[ordinal]
+            students.append((prn, class_ids[class_index], ordinal - bounds[class_index] + 1, student_name(ordinal),
+                             f"{prn.lower()}@synthetic.example.edu"))
+        encodings = []
+        if not args.skip_encodings:
+            for ordinal, rows in zip(range(start, stop), templates):
+                prn = prn_of(ordinal, args.prn_prefix)
+                for row in rows:
+                    encoding = [prn, json.dumps(np.round(row, 6).tolist())]
+                    if db.vector_search_enabled:
+                        encoding.append(db._vector_literal(row))
+                    encodings.append(encoding)
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.copy_expert("COPY Students (prn_no, class_id, roll_no, name, email) FROM STDIN WITH (FORMAT csv)",
+                                db._csv_buffer(students))
+                if encodings:
+                    cur.copy_expert(f"COPY FaceEncodings ({columns}) FROM STDIN WITH (FORMAT csv)",
+                                    db._csv_buffer(encodings))
+        print(f"  students {stop}/{args.students}", end='\r', flush=True)
+    print()
+
+
+def load_attendance(db, args, plan, days, class_ids, subject_ids):
+    """Stream the log into COPY a month at a time with the rollup trigger off, then backfill the rollups"""
+    propensity = attendance_propensity(args)
+    db.ensure_attendance_partitions(days[0], days[-1])
+    total = 0
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("ALTER TABLE AttendanceLog DISABLE TRIGGER attendancelog_rollup")
+    try:
+        month_days = {}
+        for day in days:
+            month_days.setdefault((day.year, day.month), []).append(day)
+        for (year, month), chunk in sorted(month_days.items()):
+            counted = [0]
+
+            def month_csv():
+                # one session of CSV in memory at a time, however large the institution
+                for day in chunk:
+                    for session in day_sessions(args, plan, day, propensity):
+                        text, rows = session_csv(args, day, session, subject_ids)
+                        counted[0] += rows
+                        yield text
+
+            with db.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.copy_expert("COPY AttendanceLog (prn_no, subject_id, timestamp, status, camera_id, "
+                                    "direction, confidence) FROM STDIN WITH (FORMAT csv)",
+                                    CsvStream(month_csv()), size=1 << 20)
+            total += counted[0]
+            print(f"  attendance {year}-{month:02d}: {counted[0]} rows ({total} total)", flush=True)
+    finally:
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("ALTER TABLE AttendanceLog ENABLE TRIGGER attendancelog_rollup")
+
+    started = time.perf_counter()
+    result = db.backfill_attendance_rollups(days[0], days[-1])
+    print(f"✓ Rebuilt {result['student_rows']} student and {result['class_rows']} class rollup rows "
+          f"in {time.perf_counter() - started:.1f}s")
+    return total
+
+
+def reset_tables(db):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE AttendanceLog, AttendanceDailyRollup, ClassDailyRollup, AttendanceArchive, "
+                        "FaceEncodings, Timetable, Students, Subjects, Classes RESTART IDENTITY CASCADE")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--classes', type=int, default=40)
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--subjects', type=int, help='Subjects in total (default: half of classes x per class)')
+    parser.add_argument('--subjects-per-class', type=int, default=6)
+    parser.add_argument('--sessions-per-day', type=int, default=4)
+    parser.add_argument('--years', type=float, default=2.0, help='Length of the attendance history')
+    parser.add_argument('--end', type=date.fromisoformat, default=date.today(), help='Last day of the log')
+    parser.add_argument('--session-attendance', type=float, default=0.95,
+                        help='Chance a student present that day attends each of their sessions')
+    parser.add_argument('--poor-attenders', type=float, default=0.1, help='Share of students who attend poorly')
+    parser.add_argument('--holiday-rate', type=float, default=0.03, help='Share of weekdays that are holidays')
+    parser.add_argument('--out-events', action=argparse.BooleanOptionalAction, default=True,
+                        help='Also log an OUT event at the end of every attended session')
+    parser.add_argument('--dimension', type=int, default=512)
+    parser.add_argument('--clusters', type=int, default=64, help='Embedding clusters identities are drawn around')
+    parser.add_argument('--cluster-spread', type=float, default=1.0, help='Identity spread around its centroid')
+    parser.add_argument('--templates', type=int, default=3, help='Enrollment templates per student')
+    parser.add_argument('--template-spread', type=float, default=0.35)
+    parser.add_argument('--probes', type=int, default=2000, help='Probe faces written to probes.npz')
+    parser.add_argument('--probe-spread', type=float, default=0.45)
+    parser.add_argument('--prn-prefix', default='S')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--schema', default='synthetic', help="Database schema ('public' for the main tables)")
+    parser.add_argument('--reset', action='store_true', help="Empty the schema's tables first")
+    parser.add_argument('--skip-encodings', action='store_true', help='Do not load FaceEncodings')
+    parser.add_argument('--files-only', action='store_true', help='Only write the gallery and probe files')
+    parser.add_argument('--out', default='synthetic', help='Directory for gallery.npz, probes.npz, manifest.json')
+    args = parser.parse_args()
+
+    if args.students < args.classes:
+        parser.error('--students must be at least --classes')
+    if not 1 <= args.sessions_per_day <= len(SLOT_HOURS):
+        parser.error(f'--sessions-per-day must be between 1 and {len(SLOT_HOURS)}')
+    os.makedirs(args.out, exist_ok=True)
+
+    started = time.perf_counter()
+    plan = plan_institution(args, np.random.default_rng([args.seed, 0]))
+    centroids = make_centroids(args)
+    days = school_days(args.end - timedelta(days=int(args.years * 365.25)), args.end, args.holiday_rate, args.seed)
+    print(f"✓ Planned {args.classes} classes, {len(plan['subject_names'])} subjects, {args.students} students, "
+          f"{len(days)} school days (~{estimate_log_rows(args, days):,} attendance rows)")
+
+    manifest = {'args': {key: str(value) if isinstance(value, date) else value for key, value in vars(args).items()},
+                'school_days': len(days), 'first_day': days[0].isoformat() if days else None,
+                'last_day': days[-1].isoformat() if days else None}
+    class_ids = None
+    if not args.files_only:
+        from attendance_config import DB_CONFIG
+        from database_manager import DatabaseManager
+
+        db = DatabaseManager(dict(DB_CONFIG, schema=None if args.schema == 'public' else args.schema))
+        try:
+            if args.reset:
+                reset_tables(db)
+            class_ids, subject_ids = load_institution(db, args, plan)
+            print(f"✓ Loaded classes, subjects and {len(plan['timetable'])} timetable entries")
+
+            vector_index = db.vector_search_enabled and not args.skip_encodings
+            if vector_index:
+                with db.get_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("DROP INDEX IF EXISTS faceencodings_embedding_hnsw_idx")
+                        cur.execute("DROP INDEX IF EXISTS faceencodings_embedding_ivfflat_idx")
+            load_students(db, args, plan, class_ids, centroids)
+            if vector_index:
+                with db.get_connection() as conn:
+                    with conn.cursor() as cur:
+                        db._create_vector_index(cur)
+            print(f"✓ Loaded {args.students} students"
+                  + ("" if args.skip_encodings else f" and {args.students * args.templates} face templates"))
+
+            manifest['attendance_rows'] = load_attendance(db, args, plan, days, class_ids, subject_ids) if days else 0
+            with db.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("ANALYZE")
+        finally:
+            db.close()
+
+    gallery_path = write_gallery(args, centroids, plan, class_ids)
+    probes, probe_prns = make_probes(args, centroids)
+    np.savez(os.path.join(args.out, 'probes.npz'), probes=probes, prns=np.array(probe_prns))
+    manifest['elapsed_s'] = round(time.perf_counter() - started, 1)
+    with open(os.path.join(args.out, 'manifest.json'), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2)
+    print(f"✓ Wrote {gallery_path}, probes.npz and manifest.json in {manifest['elapsed_s']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
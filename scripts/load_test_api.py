@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Concurrent load test for the Attendance API.
+
+Usage: python scripts/load_test_api.py [--base-url URL] [--concurrency N] [--requests N]
+                                       [--path /classes] [--json out.json] [--compare before.json]
+                                       [--image frame.jpg]
+
+Fires GET requests from N worker threads and reports throughput and latency
+percentiles. Save a run with --json before a change and pass it to
+--compare afterwards to print the difference. With --image the requests are
+multipart uploads to /recognize (repeat --image to rotate frames) and the
+server's micro-batching counters are reported too.
+"""
+import os
+import sys
+import json
+import uuid
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen, Request
+from urllib.error import URLError, HTTPError
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def multipart_body(path, field='file'):
+    """Encode one image file as a multipart/form-data request body"""
+    boundary = uuid.uuid4().hex
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    content_type = 'image/png' if path.lower().endswith('.png') else 'image/jpeg'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+            f'filename="{os.path.basename(path)}"\r\nContent-Type: {content_type}\r\n\r\n').encode() \
+        + data + f'\r\n--{boundary}--\r\n'.encode()
+    return f'multipart/form-data; boundary={boundary}', body
+
+
+def fetch_json(url, timeout):
+    try:
+        with urlopen(Request(url), timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except (HTTPError, URLError, OSError, ValueError):
+        return None
+
+
+def run_load(base_url, paths, concurrency, total_requests, timeout, uploads=None):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            url = base_url.rstrip('/') + paths[index % len(paths)]
+            request = Request(url)
+            if uploads:
+                content_type, body = uploads[index % len(uploads)]
+                request = Request(url, data=body, headers={'Content-Type': content_type}, method='POST')
+            start = time.perf_counter()
+            try:
+                with urlopen(request, timeout=timeout) as resp:
+                    resp.read()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except (HTTPError, URLError, OSError) as e:
+                with lock:
+                    errors.append(str(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'paths': paths,
+        'concurrency': concurrency,
+        'requests': total_requests,
+        'errors': len(errors),
+        'duration_s': duration,
+        'throughput_rps': len(latencies) / duration if duration else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000.0,
+        'p95_ms': percentile(latencies, 0.95) * 1000.0,
+        'p99_ms': percentile(latencies, 0.99) * 1000.0,
+        'max_ms': (latencies[-1] * 1000.0) if latencies else 0.0,
+        'sample_errors': errors[:5],
+    }
+
+
+def print_report(result, label):
+    print(f"[{label}] {result['requests']} requests, concurrency={result['concurrency']}, "
+          f"errors={result['errors']}")
+    print(f"  throughput: {result['throughput_rps']:.1f} req/s")
+    print(f"  latency ms: p50={result['p50_ms']:.1f} p95={result['p95_ms']:.1f} "
+          f"p99={result['p99_ms']:.1f} max={result['max_ms']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='Endpoint path to hit (repeatable, default /classes)')
+    parser.add_argument('--image', action='append', dest='images',
+                        help='POST this JPEG/PNG as a multipart upload (repeatable, default path /recognize)')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--label', default='run')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Previous --json result to compare against')
+    args = parser.parse_args()
+
+    uploads = [multipart_body(path) for path in args.images] if args.images else None
+    paths = args.paths or (['/recognize'] if uploads else ['/classes'])
+    stats_url = args.base_url.rstrip('/') + '/recognize/stats'
+    before_stats = fetch_json(stats_url, args.timeout) if uploads else None
+
+    result = run_load(args.base_url, paths, args.concurrency, args.requests, args.timeout, uploads)
+    result['label'] = args.label
+    print_report(result, args.label)
+
+    after_stats = fetch_json(stats_url, args.timeout) if uploads else None
+    if before_stats and after_stats:
+        batches = after_stats['batches'] - before_stats['batches']
+        frames = after_stats['requests'] - before_stats['requests']
+        result['server_batches'] = batches
+        result['server_avg_batch'] = frames / batches if batches else 0.0
+        print(f"  server batching: {frames} frames in {batches} batches "
+              f"(avg {result['server_avg_batch']:.1f}, max {after_stats['max_batch']})")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            before = json.load(fh)
+        print_report(before, before.get('label', 'before'))
+        if before.get('throughput_rps'):
+            change = (result['throughput_rps'] / before['throughput_rps'] - 1.0) * 100.0
+            print(f"  throughput change: {change:+.1f}%")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(result, fh, indent=2)
+
+    return 1 if result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
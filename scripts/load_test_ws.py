@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Connect many viewers to the live detections WebSocket and measure delivery.
+
+Usage: python scripts/load_test_ws.py [--url ws://127.0.0.1:8000/ws/detections]
+                                      [--viewers 200] [--duration 30] [--slow 10]
+
+Each viewer counts events and the delay between the event timestamp and
+its arrival; --slow viewers sleep between reads to check that they only
+drop stale frames without holding back everyone else. Needs the
+`websockets` package and camera workers configured on the API
+(ATTENDANCE_LIVE_CAMERAS).
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+
+async def viewer(url, duration, delay_s, latencies, counts, index):
+    import websockets
+
+    deadline = time.monotonic() + duration
+    async with websockets.connect(url, max_queue=4) as ws:
+        while time.monotonic() < deadline:
+            try:
+                message = await asyncio.wait_for(ws.recv(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            event = json.loads(message)
+            latencies.append(time.time() - event['ts'])
+            counts[index] += 1
+            if delay_s:
+                await asyncio.sleep(delay_s)
+
+
+async def run(args):
+    fast_latencies, slow_latencies = [], []
+    counts = [0] * args.viewers
+    tasks = []
+    for index in range(args.viewers):
+        slow = index < args.slow
+        tasks.append(viewer(args.url, args.duration, args.slow_delay if slow else 0.0,
+                            slow_latencies if slow else fast_latencies, counts, index))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    return fast_latencies, slow_latencies, counts, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='ws://127.0.0.1:8000/ws/detections')
+    parser.add_argument('--viewers', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--slow', type=int, default=10, help='Viewers that read slowly')
+    parser.add_argument('--slow-delay', type=float, default=0.5)
+    args = parser.parse_args()
+
+    fast, slow, counts, errors = asyncio.run(run(args))
+    fast_counts = counts[args.slow:] or [0]
+    print(f"{args.viewers} viewers for {args.duration:.0f}s, errors={len(errors)}")
+    print(f"  events per fast viewer: min={min(fast_counts)} max={max(fast_counts)}")
+    for label, latencies in (('fast', fast), ('slow', slow)):
+        if latencies:
+            ms = np.asarray(latencies) * 1000.0
+            print(f"  {label} delay ms: p50={np.percentile(ms, 50):.1f} "
+                  f"p99={np.percentile(ms, 99):.1f} max={ms.max():.1f}")
+    if errors:
+        print(f"  first error: {errors[0]}")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Convert a legacy (unpartitioned) AttendanceLog into the monthly-partitioned layout.
+
+Usage: python scripts/migrate_attendance_partitions.py [--keep-legacy]
+
+The old table is renamed to AttendanceLog_legacy, the partitioned table is
+created from the bundled schema, partitions are created for the full date
+range of the existing rows and the rows are copied across in one
+transaction. Safe to re-run: exits early when the table is already
+partitioned.
+"""
+import os
+import sys
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_config import DB_CONFIG  # noqa: E402
+from database_manager import DatabaseManager  # noqa: E402
+
+LEGACY_RENAMES = [
+    "ALTER TABLE AttendanceLog RENAME TO AttendanceLog_legacy",
+    "ALTER TABLE AttendanceLog_legacy RENAME CONSTRAINT attendancelog_pkey TO attendancelog_legacy_pkey",
+    "ALTER SEQUENCE IF EXISTS attendancelog_log_id_seq RENAME TO attendancelog_legacy_log_id_seq",
+    "ALTER INDEX IF EXISTS attendancelog_timestamp_idx RENAME TO attendancelog_legacy_timestamp_idx",
+    "ALTER INDEX IF EXISTS attendancelog_prn_timestamp_idx RENAME TO attendancelog_legacy_prn_timestamp_idx",
+    "ALTER INDEX IF EXISTS attendancelog_subject_timestamp_idx RENAME TO attendancelog_legacy_subject_timestamp_idx",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--keep-legacy', action='store_true',
+                        help='Keep AttendanceLog_legacy after copying instead of dropping it')
+    args = parser.parse_args()
+
+    db = DatabaseManager(DB_CONFIG)
+    try:
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT c.relkind FROM pg_class c
+                    WHERE c.oid = to_regclass('attendancelog')
+                """)
+                row = cur.fetchone()
+                if row is None:
+                    print("✗ AttendanceLog table not found")
+                    return 1
+                if row[0] == 'p':
+                    print("✓ AttendanceLog is already partitioned")
+                    return 0
+
+                cur.execute("LOCK TABLE AttendanceLog IN ACCESS EXCLUSIVE MODE")
+                for statement in LEGACY_RENAMES:
+                    cur.execute(statement)
+
+                # Recreate AttendanceLog (partitioned) and its indexes from the bundled schema
+                cur.execute(db.schema_path.read_text(encoding='utf-8'))
+
+                cur.execute("SELECT MIN(timestamp)::date, MAX(timestamp)::date, COUNT(*) "
+                            "FROM AttendanceLog_legacy")
+                first_day, last_day, row_count = cur.fetchone()
+                today = date.today()
+                cur.execute("SELECT ensure_attendance_partitions(%s, %s)",
+                            (min(first_day or today, today), max(last_day or today, today)))
+                print(f"✓ Created {cur.fetchone()[0]} partition(s) for {row_count} rows")
+
+                # Legacy tables predate the camera metadata columns
+                cur.execute("""
+                    ALTER TABLE AttendanceLog_legacy
+                        ADD COLUMN IF NOT EXISTS camera_id VARCHAR(50),
+                        ADD COLUMN IF NOT EXISTS direction VARCHAR(3),
+                        ADD COLUMN IF NOT EXISTS confidence REAL
+                """)
+                cur.execute("""
+                    INSERT INTO AttendanceLog (log_id, prn_no, subject_id, timestamp, status,
+                                               camera_id, direction, confidence)
+                    SELECT log_id, prn_no, subject_id, COALESCE(timestamp, CURRENT_TIMESTAMP), status,
+                           camera_id, direction, confidence
+                    FROM AttendanceLog_legacy
+                """)
+                cur.execute("""
+                    SELECT setval(pg_get_serial_sequence('attendancelog', 'log_id'),
+                                  COALESCE(MAX(log_id), 0) + 1, false)
+                    FROM AttendanceLog
+                """)
+
+                if not args.keep_legacy:
+                    cur.execute("DROP TABLE AttendanceLog_legacy")
+
+        db.ensure_attendance_partitions()
+        # Copied rows fired the rollup trigger again; rebuild the rollups from scratch
+        db.backfill_attendance_rollups()
+        cleanup = "kept AttendanceLog_legacy" if args.keep_legacy else "dropped legacy table"
+        print(f"✓ AttendanceLog migrated to monthly partitions ({cleanup})")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
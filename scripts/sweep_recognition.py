@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""Sweep detector and recognizer settings for accuracy against latency.
+
+Usage: python scripts/sweep_recognition.py (--dataset DIR | --labels labels.csv)
+           (--gallery gallery.npz | --gallery-from-db | --enroll DIR)
+           [--det-size 320 480 640] [--detection-scale 0.5 1.0] [--det-thresh 0.4 0.5]
+           [--use-yolo 0 1] [--yolo-confidence 0.3] [--tolerance 0.7 0.8 0.9]
+           [--budget-ms 80] [--max-false-accept 0.01] [--json sweep.json] [--csv sweep.csv]
+
+Runs a labelled image/video set through FaceRecognitionEngine for every
+combination of the given settings (each defaults to FACE_RECOGNITION_CONFIG)
+and records per-frame latency (enhance + detect + embed + match), detection
+recall, identification rate and false accepts. Detection runs once per
+detector setting; every --tolerance is then scored on the same embeddings.
+
+Labelled sets:
+- --dataset DIR: one sub-folder per PRN holding images or videos of that
+  student alone; `_unknown` holds people who are not enrolled (one face
+  each) and `_empty` frames without faces.
+- --labels CSV: columns path, prns (';'-separated, may be empty) and
+  optionally faces (face count, when strangers are in the frame too) and
+  frame (a single video frame index).
+Videos contribute every --video-every'th frame, up to --max-video-frames.
+
+The report lists every setting, sorted by latency, and marks the Pareto
+front: settings no other setting beats on both latency and identification
+rate. Settings over --max-false-accept are left off the front. With
+--budget-ms the most accurate front setting within the budget is printed as
+a profile for FACE_RECOGNITION_CONFIG.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+
+from attendance_config import FACE_RECOGNITION_CONFIG  # noqa: E402
+from face_recognition_engine import FaceRecognitionEngine  # noqa: E402
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+DETECTOR_KEYS = ('det_size', 'det_thresh', 'detection_scale', 'use_yolo', 'yolo_confidence')
+
+
+class Sample:
+    __slots__ = ('name', 'frame', 'prns', 'faces')
+
+    def __init__(self, name, frame, prns, faces):
+        self.name = name
+        self.frame = frame
+        self.prns = frozenset(prns)
+        self.faces = faces  # expected face count, None when unknown
+
+
+def parse_det_size(value):
+    width, _, height = value.lower().partition('x')
+    return (int(width), int(height or width))
+
+
+def read_media(path, args, frame_index=None):
+    """[(name, frame)] for an image, one video frame, or sampled video frames"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        frame = cv2.imread(path)
+        return [(path, frame)] if frame is not None else []
+    if extension not in VIDEO_EXTENSIONS:
+        return []
+
+    cap = cv2.VideoCapture(path)
+    frames = []
+    try:
+        if frame_index is not None:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            ok, frame = cap.read()
+            return [(f"{path}#{frame_index}", frame)] if ok else []
+        index = 0
+        while len(frames) < args.max_video_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if index % args.video_every == 0:
+                frames.append((f"{path}#{index}", frame))
+            index += 1
+    finally:
+        cap.release()
+    return frames
+
+
+def load_dataset(root, args):
+    samples = []
+    for label in sorted(os.listdir(root)):
+        folder = os.path.join(root, label)
+        if not os.path.isdir(folder):
+            continue
+        prns, faces = ((), 0) if label == '_empty' else ((), 1) if label == '_unknown' else ((label,), 1)
+        for filename in sorted(os.listdir(folder)):
+            for name, frame in read_media(os.path.join(folder, filename), args):
+                samples.append(Sample(name, frame, prns, faces))
+    return samples
+
+
+def load_labels(path, args):
+    base = os.path.dirname(os.path.abspath(path))
+    samples = []
+    with open(path, newline='', encoding='utf-8') as fh:
+        for row in csv.DictReader(fh):
+            prns = [prn.strip() for prn in (row.get('prns') or '').split(';') if prn.strip()]
+            faces = int(row['faces']) if row.get('faces') else len(prns)
+            frame_index = int(row['frame']) if row.get('frame') else None
+            for name, frame in read_media(os.path.join(base, row['path']), args, frame_index):
+                samples.append(Sample(name, frame, prns, faces))
+    return samples
+
+
+def load_gallery(args, engine):
+    if args.gallery:
+        with np.load(args.gallery) as data:
+            return list(data['embeddings'].astype(np.float32)), [str(prn) for prn in data['prns']]
+    if args.gallery_from_db:
+        from attendance_config import DB_CONFIG
+        from database_manager import DatabaseManager
+
+        db = DatabaseManager(DB_CONFIG)
+        try:
+            return db.get_all_face_encodings()
+        finally:
+            db.close()
+
+    # Enrollment photos: the largest face of each, at the engine's configured settings
+    encodings, prns = [], []
+    for prn in sorted(os.listdir(args.enroll)):
+        folder = os.path.join(args.enroll, prn)
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            for _, frame in read_media(os.path.join(folder, filename), args):
+                locations, faces = engine.detect_and_encode_face(frame, for_registration=True)
+                if faces:
+                    areas = [(bottom - top) * (right - left) for top, right, bottom, left in locations]
+                    encodings.append(faces[int(np.argmax(areas))])
+                    prns.append(prn)
+    return encodings, prns
+
+
+def detector_grid(args):
+    """Detector settings to try; yolo_confidence only varies when YOLO is on"""
+    seen, grid = set(), []
+    for det_size, det_thresh, scale, use_yolo, yolo_confidence in itertools.product(
+            args.det_size, args.det_thresh, args.detection_scale, args.use_yolo, args.yolo_confidence):
+        settings = {'det_size': det_size, 'det_thresh': det_thresh, 'detection_scale': scale,
+                    'use_yolo': bool(use_yolo), 'yolo_confidence': yolo_confidence if use_yolo else None}
+        key = tuple(settings.values())
+        if key not in seen:
+            seen.add(key)
+            grid.append(settings)
+    return grid
+
+
+def run_detector(engine, samples, settings, enhance):
+    """Detect and embed every sample; returns [(encodings, detect seconds)]"""
+    engine.apply_detection_settings(**{key: value for key, value in settings.items() if value is not None})
+    if samples:
+        engine.detect_and_encode_face(samples[0].frame)  # warm up after re-preparing the models
+    detections = []
+    for sample in samples:
+        start = time.perf_counter()
+        frame = engine.enhance_image_quality(sample.frame) if enhance else sample.frame
+        _, encodings = engine.detect_and_encode_face(frame)
+        detections.append((encodings, time.perf_counter() - start))
+    return detections
+
+
+def score(engine, samples, detections, tolerance):
+    engine.apply_detection_settings(recognition_tolerance=tolerance)
+    latencies = []
+    expected_faces = detected_expected = extra = 0
+    expected_ids = identified = false_accepts = detected_total = 0
+    for sample, (encodings, detect_s) in zip(samples, detections):
+        start = time.perf_counter()
+        matches = engine.recognize_faces(encodings) if encodings else []
+        latencies.append((detect_s + time.perf_counter() - start) * 1000.0)
+
+        matched = {prn for prn, _ in matches if prn is not None}
+        detected_total += len(encodings)
+        if sample.faces is not None:
+            expected_faces += sample.faces
+            detected_expected += min(len(encodings), sample.faces)
+            extra += max(0, len(encodings) - sample.faces)
+        expected_ids += len(sample.prns)
+        identified += len(matched & sample.prns)
+        false_accepts += sum(1 for prn, _ in matches if prn is not None and prn not in sample.prns)
+
+    latencies = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'mean_ms': float(latencies.mean()),
+        'detection_recall': detected_expected / expected_faces if expected_faces else None,
+        'extra_detections_per_frame': extra / len(samples) if samples else 0.0,
+        'identification_rate': identified / expected_ids if expected_ids else 0.0,
+        'false_accept_rate': false_accepts / detected_total if detected_total else 0.0,
+    }
+
+
+def pareto_front(results, latency_key, max_false_accept):
+    """Indices of eligible results not beaten on both latency and identification rate"""
+    eligible = [i for i, result in enumerate(results) if result['false_accept_rate'] <= max_false_accept]
+    front = []
+    for i in eligible:
+        a = results[i]
+        dominated = any(
+            b[latency_key] <= a[latency_key] and b['identification_rate'] >= a['identification_rate'] and
+            (b[latency_key] < a[latency_key] or b['identification_rate'] > a['identification_rate'])
+            for b in (results[j] for j in eligible if j != i))
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def profile(result):
+    """FACE_RECOGNITION_CONFIG entries for a result"""
+    settings = {key: result[key] for key in DETECTOR_KEYS if result.get(key) is not None}
+    settings['det_size'] = tuple(settings['det_size'])
+    settings['recognition_tolerance'] = result['recognition_tolerance']
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--dataset', help='Folder of <prn>/, _unknown/ and _empty/ sub-folders')
+    source.add_argument('--labels', help='CSV with path, prns[, faces, frame]')
+    gallery = parser.add_mutually_exclusive_group(required=True)
+    gallery.add_argument('--gallery', help='Gallery .npz (embeddings, prns)')
+    gallery.add_argument('--gallery-from-db', action='store_true')
+    gallery.add_argument('--enroll', help='Folder of <prn>/ enrollment photos')
+    config = FACE_RECOGNITION_CONFIG
+    parser.add_argument('--det-size', nargs='+', type=parse_det_size,
+                        default=[tuple(config.get('det_size', (640, 640)))], help='e.g. 320 480 640x480')
+    parser.add_argument('--det-thresh', nargs='+', type=float, default=[config.get('det_thresh', 0.5)])
+    parser.add_argument('--detection-scale', nargs='+', type=float, default=[config.get('detection_scale', 1.0)])
+    parser.add_argument('--use-yolo', nargs='+', type=int, choices=(0, 1), default=[int(config.get('use_yolo', False))])
+    parser.add_argument('--yolo-confidence', nargs='+', type=float, default=[config.get('yolo_confidence', 0.3)])
+    parser.add_argument('--tolerance', nargs='+', type=float, default=[config.get('recognition_tolerance', 0.8)])
+    parser.add_argument('--no-enhance', action='store_true', help='Skip enhance_image_quality (the kiosk runs it)')
+    parser.add_argument('--video-every', type=int, default=5)
+    parser.add_argument('--max-video-frames', type=int, default=200)
+    parser.add_argument('--latency', choices=('p50_ms', 'p95_ms', 'mean_ms'), default='p95_ms',
+                        help='Latency statistic used for the front and the budget')
+    parser.add_argument('--max-false-accept', type=float, default=0.01)
+    parser.add_argument('--budget-ms', type=float, help='Recommend the best front setting within this latency')
+    parser.add_argument('--json', help='Write all results to this JSON file')
+    parser.add_argument('--csv', help='Write all results to this CSV file')
+    args = parser.parse_args()
+    args.video_every = max(1, args.video_every)
+
+    engine = FaceRecognitionEngine(dict(config, matcher='memory'))
+    samples = load_dataset(args.dataset, args) if args.dataset else load_labels(args.labels, args)
+    if not samples:
+        print('✗ No labelled images or video frames found')
+        return 1
+    encodings, prns = load_gallery(args, engine)
+    engine.load_known_faces(encodings, prns)
+    print(f"✓ {len(samples)} labelled frames, gallery of {len(engine.gallery)} students")
+
+    grid = detector_grid(args)
+    results = []
+    for number, settings in enumerate(grid, start=1):
+        started = time.perf_counter()
+        detections = run_detector(engine, samples, settings, not args.no_enhance)
+        for tolerance in args.tolerance:
+            result = dict(settings, det_size=list(settings['det_size']), recognition_tolerance=tolerance)
+            result.update(score(engine, samples, detections, tolerance))
+            results.append(result)
+        print(f"  [{number}/{len(grid)}] {settings} in {time.perf_counter() - started:.1f}s", flush=True)
+
+    front = set(pareto_front(results, args.latency, args.max_false_accept))
+    order = sorted(range(len(results)), key=lambda i: results[i][args.latency])
+    print(f"\n{'':2}{'det_size':>10}{'thresh':>7}{'scale':>6}{'yolo':>6}{'tol':>6}"
+          f"{args.latency:>9}{'recall':>8}{'ident':>8}{'FAR':>7}")
+    for i in order:
+        r = results[i]
+        yolo = f"{r['yolo_confidence']:.2f}" if r['use_yolo'] else 'off'
+        recall = f"{r['detection_recall']:.3f}" if r['detection_recall'] is not None else 'n/a'
+        print(f"{'*' if i in front else ' ':2}{'x'.join(map(str, r['det_size'])):>10}{r['det_thresh']:>7.2f}"
+              f"{r['detection_scale']:>6.2f}{yolo:>6}{r['recognition_tolerance']:>6.2f}{r[args.latency]:>9.1f}"
+              f"{recall:>8}{r['identification_rate']:>8.3f}{r['false_accept_rate']:>7.3f}")
+    print("* Pareto front (latency vs identification rate, "
+          f"false accept rate <= {args.max_false_accept})")
+
+    recommended = None
+    if args.budget_ms is not None:
+        within = [i for i in front if results[i][args.latency] <= args.budget_ms]
+        if within:
+            best = max(within, key=lambda i: (results[i]['identification_rate'], -results[i][args.latency]))
+            recommended = profile(results[best])
+            print(f"✓ Best within {args.budget_ms:g} ms ({args.latency}): {recommended}")
+        else:
+            print(f"⚠ No front setting meets {args.budget_ms:g} ms ({args.latency})")
+
+    for i, result in enumerate(results):
+        result['pareto'] = i in front
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump({'args': {key: value for key, value in vars(args).items()}, 'frames': len(samples),
+                       'results': [results[i] for i in order], 'recommended': recommended}, fh, indent=2)
+        print(f"✓ Results written to {args.json}")
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(results[0]))
+            writer.writeheader()
+            for i in order:
+                writer.writerow(dict(results[i], det_size='x'.join(map(str, results[i]['det_size']))))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())